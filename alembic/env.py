@@ -10,7 +10,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
 from sms_remarketing.database import Base
 from sms_remarketing.config import settings
-from sms_remarketing.models import Client, Lead, Template, Message, Trigger
+from sms_remarketing.models import Client, Lead, Template, Message, Trigger, MessageBatch, OutboxEntry, IdempotencyKey, CreditLedgerEntry, CreditSnapshot
 
 config = context.config
 
@@ -0,0 +1,108 @@
+"""Partition messages by month
+
+Revision ID: 1076f499ccc8
+Revises: 71ad307a1fd3
+Create Date: 2026-10-17 19:02:37.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1076f499ccc8'
+down_revision: Union[str, None] = '71ad307a1fd3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Indexes shared by the partitioned table and the legacy partition
+INDEXES = (
+    'ix_messages_lead_id',
+    'ix_messages_batch_id',
+    'ix_messages_client_id_created_at_id',
+    'ix_messages_pending_created_at',
+)
+
+# Monthly partitions created after the legacy one; the worker keeps
+# message_partitions_ahead months ahead from then on
+PARTITIONS_AHEAD = 3
+
+
+def legacy_name(index: str) -> str:
+    return index.replace('messages', 'messages_legacy', 1)
+
+
+def upgrade() -> None:
+    # The partition key can't be NULL
+    op.execute("UPDATE messages SET created_at = COALESCE(sent_at, now()) WHERE created_at IS NULL")
+    op.alter_column('messages', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=False, existing_server_default=sa.text('now()'))
+
+    # The existing table becomes the partition holding everything up to the
+    # end of this month, so no rows are copied. Its indexes are renamed out of
+    # the way and the ones matching the new table's get attached to them.
+    op.rename_table('messages', 'messages_legacy')
+    for index in INDEXES:
+        op.execute(f'ALTER INDEX {index} RENAME TO {legacy_name(index)}')
+    # Unique constraints on a partitioned table must include the partition key
+    op.drop_constraint('messages_pkey', 'messages_legacy', type_='primary')
+    op.create_primary_key('messages_legacy_pkey', 'messages_legacy', ['id', 'created_at'])
+    op.drop_constraint('messages_twilio_sid_key', 'messages_legacy', type_='unique')
+    op.create_index(legacy_name('ix_messages_twilio_sid'), 'messages_legacy', ['twilio_sid'], unique=False)
+
+    op.execute('CREATE TABLE messages (LIKE messages_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)')
+    op.execute('ALTER SEQUENCE messages_id_seq OWNED BY messages.id')
+    op.create_primary_key('messages_pkey', 'messages', ['id', 'created_at'])
+    op.create_foreign_key('messages_client_id_fkey', 'messages', 'clients', ['client_id'], ['id'])
+    op.create_foreign_key('messages_lead_id_fkey', 'messages', 'leads', ['lead_id'], ['id'])
+    op.create_foreign_key('messages_template_id_fkey', 'messages', 'templates', ['template_id'], ['id'])
+    op.create_foreign_key('messages_batch_id_fkey', 'messages', 'message_batches', ['batch_id'], ['id'])
+    op.create_index(op.f('ix_messages_lead_id'), 'messages', ['lead_id'], unique=False)
+    op.create_index(op.f('ix_messages_batch_id'), 'messages', ['batch_id'], unique=False)
+    op.create_index(op.f('ix_messages_twilio_sid'), 'messages', ['twilio_sid'], unique=False)
+    op.create_index('ix_messages_client_id_created_at_id', 'messages', ['client_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_messages_pending_created_at', 'messages', ['created_at'], unique=False, postgresql_where=sa.text("status IN ('PENDING', 'QUEUED')"))
+
+    # Month bounds in UTC, computed by the server so offline SQL works too
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            next_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '1 month';
+            month_start timestamp;
+        BEGIN
+            EXECUTE format(
+                'ALTER TABLE messages ATTACH PARTITION messages_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+                next_month AT TIME ZONE 'UTC'
+            );
+            FOR i IN 0..{PARTITIONS_AHEAD - 1} LOOP
+                month_start := next_month + i * interval '1 month';
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_' || to_char(month_start, 'YYYY_MM'),
+                    month_start AT TIME ZONE 'UTC',
+                    (month_start + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END
+        $$
+        """
+    )
+
+
+def downgrade() -> None:
+    # Rows of partitions already archived are not brought back
+    op.execute('ALTER TABLE messages DETACH PARTITION messages_legacy')
+    op.execute('INSERT INTO messages_legacy SELECT * FROM messages')
+    op.execute('ALTER SEQUENCE messages_id_seq OWNED BY messages_legacy.id')
+    op.drop_table('messages')
+
+    op.rename_table('messages_legacy', 'messages')
+    op.drop_index(legacy_name('ix_messages_twilio_sid'), table_name='messages')
+    op.create_unique_constraint('messages_twilio_sid_key', 'messages', ['twilio_sid'])
+    op.drop_constraint('messages_legacy_pkey', 'messages', type_='primary')
+    op.create_primary_key('messages_pkey', 'messages', ['id'])
+    for index in INDEXES:
+        op.execute(f'ALTER INDEX {legacy_name(index)} RENAME TO {index}')
+    op.alter_column('messages', 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True, existing_server_default=sa.text('now()'))
@@ -0,0 +1,30 @@
+"""Add message origin
+
+Revision ID: 1f8ab48ff692
+Revises: f4230b8734de
+Create Date: 2026-10-17 11:40:02.913554
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f8ab48ff692'
+down_revision: Union[str, None] = 'f4230b8734de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+message_origin = sa.Enum('API', 'WEBHOOK', 'NEW_LEAD', 'LEAD_AGE', 'CAMPAIGN', name='messageorigin')
+
+
+def upgrade() -> None:
+    message_origin.create(op.get_bind(), checkfirst=True)
+    op.add_column('messages', sa.Column('origin', message_origin, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'origin')
+    message_origin.drop(op.get_bind(), checkfirst=True)
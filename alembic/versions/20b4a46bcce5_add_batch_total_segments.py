@@ -0,0 +1,28 @@
+"""Add batch total_segments
+
+Revision ID: 20b4a46bcce5
+Revises: 5580e5b2ca74
+Create Date: 2026-10-17 21:12:09.507841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20b4a46bcce5'
+down_revision: Union[str, None] = '5580e5b2ca74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Earlier batches were not measured and keep 0
+    op.add_column('message_batches', sa.Column('total_segments', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('message_batches', 'total_segments', server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column('message_batches', 'total_segments')
@@ -0,0 +1,63 @@
+"""Add credit ledger
+
+Revision ID: 259f1db676fd
+Revises: cfae22a664d4
+Create Date: 2026-10-17 14:41:09.916652
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '259f1db676fd'
+down_revision: Union[str, None] = 'cfae22a664d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+credit_entry_kind = sa.Enum('GRANT', 'RESERVATION', 'REFUND', name='creditentrykind')
+
+
+def upgrade() -> None:
+    op.create_table('credit_ledger',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('kind', credit_entry_kind, nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('batch_id', sa.Integer(), nullable=True),
+    sa.Column('message_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_credit_ledger_client_id_id', 'credit_ledger', ['client_id', 'id'], unique=False)
+    op.create_table('credit_snapshots',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('balance', sa.Integer(), nullable=False),
+    sa.Column('last_entry_id', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+
+    # Open the ledger with each client's current balance
+    op.execute(
+        "INSERT INTO credit_ledger (client_id, kind, amount) "
+        "SELECT id, 'GRANT', credits FROM clients WHERE credits <> 0"
+    )
+    op.drop_column('clients', 'credits')
+
+
+def downgrade() -> None:
+    op.add_column('clients', sa.Column('credits', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE clients SET credits = COALESCE("
+        "(SELECT SUM(amount) FROM credit_ledger WHERE credit_ledger.client_id = clients.id), 0)"
+    )
+    op.alter_column('clients', 'credits', server_default=None)
+    op.drop_table('credit_snapshots')
+    op.drop_index('ix_credit_ledger_client_id_id', table_name='credit_ledger')
+    op.drop_table('credit_ledger')
+    credit_entry_kind.drop(op.get_bind(), checkfirst=True)
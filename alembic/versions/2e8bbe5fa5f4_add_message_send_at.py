@@ -0,0 +1,28 @@
+"""Add message send_at
+
+Revision ID: 2e8bbe5fa5f4
+Revises: 433a6a323013
+Create Date: 2026-10-17 13:52:37.581204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e8bbe5fa5f4'
+down_revision: Union[str, None] = '433a6a323013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('send_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('sms_outbox', sa.Column('send_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('sms_outbox', 'send_at')
+    op.drop_column('messages', 'send_at')
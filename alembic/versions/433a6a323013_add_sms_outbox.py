@@ -0,0 +1,37 @@
+"""Add sms outbox
+
+Revision ID: 433a6a323013
+Revises: 6e16357ac057
+Create Date: 2026-10-17 13:31:12.408215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '433a6a323013'
+down_revision: Union[str, None] = '6e16357ac057'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Created by 1f8ab48ff692
+message_origin = postgresql.ENUM('API', 'WEBHOOK', 'NEW_LEAD', 'LEAD_AGE', 'CAMPAIGN', name='messageorigin', create_type=False)
+
+
+def upgrade() -> None:
+    op.create_table('sms_outbox',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('message_id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('origin', message_origin, nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sms_outbox')
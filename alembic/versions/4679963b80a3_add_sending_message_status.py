@@ -0,0 +1,29 @@
+"""Add sending message status
+
+Revision ID: 4679963b80a3
+Revises: 20b4a46bcce5
+Create Date: 2026-10-18 09:14:27.660512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4679963b80a3'
+down_revision: Union[str, None] = '20b4a46bcce5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ADD VALUE can't be used in the transaction that adds it
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE messagestatus ADD VALUE IF NOT EXISTS 'SENDING'")
+
+
+def downgrade() -> None:
+    # Postgres can't drop an enum value; claimed messages go back to the queue
+    op.execute("UPDATE messages SET status = 'QUEUED' WHERE status = 'SENDING'")
@@ -0,0 +1,43 @@
+"""Tune message and lead indexes
+
+Revision ID: 54aa9b33b764
+Revises: 74b7f4852d0a
+Create Date: 2026-10-17 17:24:51.093384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '54aa9b33b764'
+down_revision: Union[str, None] = '74b7f4852d0a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Built and dropped concurrently so messages stays writable
+    with op.get_context().autocommit_block():
+        op.create_index('ix_messages_pending_created_at', 'messages', ['created_at'], unique=False, postgresql_where=sa.text("status IN ('PENDING', 'QUEUED')"), postgresql_concurrently=True)
+        op.create_index('ix_triggers_active_client_id_trigger_type', 'triggers', ['client_id', 'trigger_type'], unique=False, postgresql_where=sa.text('is_active'), postgresql_concurrently=True)
+        # Full status index: low selectivity, and rewritten on every status change
+        op.drop_index('ix_messages_status', table_name='messages', postgresql_concurrently=True)
+        # Duplicates of the primary keys and prefixes of the (client_id, created_at, id) indexes
+        op.drop_index('ix_messages_id', table_name='messages', postgresql_concurrently=True)
+        op.drop_index('ix_messages_client_id', table_name='messages', postgresql_concurrently=True)
+        op.drop_index('ix_leads_id', table_name='leads', postgresql_concurrently=True)
+        op.drop_index('ix_leads_client_id', table_name='leads', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_leads_client_id', 'leads', ['client_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_leads_id', 'leads', ['id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_messages_client_id', 'messages', ['client_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_messages_id', 'messages', ['id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_messages_status', 'messages', ['status'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_triggers_active_client_id_trigger_type', table_name='triggers', postgresql_concurrently=True)
+        op.drop_index('ix_messages_pending_created_at', table_name='messages', postgresql_concurrently=True)
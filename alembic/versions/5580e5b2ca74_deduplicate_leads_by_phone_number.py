@@ -0,0 +1,89 @@
+"""Deduplicate leads by normalized phone number
+
+Revision ID: 5580e5b2ca74
+Revises: eeccb04296b6
+Create Date: 2026-10-17 20:31:44.918305
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+from sms_remarketing.phone import normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5580e5b2ca74'
+down_revision: Union[str, None] = 'eeccb04296b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def backfill_phone_normalized() -> None:
+    # Numbers that don't parse stay NULL and are not deduplicated
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text('SELECT id, phone_number FROM leads WHERE id > :last_id ORDER BY id LIMIT :limit'),
+            {'last_id': last_id, 'limit': BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for lead_id, phone_number in rows:
+            try:
+                updates.append({'id': lead_id, 'phone': normalize_phone(phone_number)})
+            except ValueError:
+                continue
+        if updates:
+            conn.execute(sa.text('UPDATE leads SET phone_normalized = :phone WHERE id = :id'), updates)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column('leads', sa.Column('phone_normalized', sa.String(), nullable=True))
+    if context.is_offline_mode():
+        op.execute('-- phone_normalized is backfilled in Python, run this revision online to fill it')
+    else:
+        backfill_phone_normalized()
+
+    # The oldest lead of each client and number is kept. It takes over the
+    # messages of the others and fills its empty fields from the newest one.
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE lead_duplicates AS
+        SELECT id, first_value(id) OVER (PARTITION BY client_id, phone_normalized ORDER BY id) AS keep_id
+        FROM leads
+        WHERE phone_normalized IS NOT NULL
+        """
+    )
+    op.execute('DELETE FROM lead_duplicates WHERE id = keep_id')
+    op.execute(
+        """
+        UPDATE leads SET
+            first_name = COALESCE(leads.first_name, newest.first_name),
+            last_name = COALESCE(leads.last_name, newest.last_name),
+            email = COALESCE(leads.email, newest.email)
+        FROM (
+            SELECT DISTINCT ON (d.keep_id) d.keep_id, l.first_name, l.last_name, l.email
+            FROM lead_duplicates d JOIN leads l ON l.id = d.id
+            ORDER BY d.keep_id, d.id DESC
+        ) AS newest
+        WHERE leads.id = newest.keep_id
+        """
+    )
+    op.execute('UPDATE messages SET lead_id = d.keep_id FROM lead_duplicates d WHERE messages.lead_id = d.id')
+    op.execute('DELETE FROM leads USING lead_duplicates d WHERE leads.id = d.id')
+    op.execute('DROP TABLE lead_duplicates')
+
+    op.create_index('ix_leads_client_id_phone_normalized', 'leads', ['client_id', 'phone_normalized'], unique=True)
+
+
+def downgrade() -> None:
+    # Merged duplicates are not split up again
+    op.drop_index('ix_leads_client_id_phone_normalized', table_name='leads')
+    op.drop_column('leads', 'phone_normalized')
@@ -0,0 +1,26 @@
+"""Add client queue weight
+
+Revision ID: 6e16357ac057
+Revises: 1f8ab48ff692
+Create Date: 2026-10-17 13:05:44.120987
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e16357ac057'
+down_revision: Union[str, None] = '1f8ab48ff692'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('clients', sa.Column('queue_weight', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('clients', 'queue_weight')
@@ -0,0 +1,42 @@
+"""Add trigger webhook_key
+
+Revision ID: 71ad307a1fd3
+Revises: 54aa9b33b764
+Create Date: 2026-10-17 18:10:12.661907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '71ad307a1fd3'
+down_revision: Union[str, None] = '54aa9b33b764'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('triggers', sa.Column('webhook_key', sa.String(), nullable=True))
+    # Keys were not unique before; an active trigger (then the oldest) keeps it
+    op.execute(
+        """
+        UPDATE triggers SET webhook_key = keyed.webhook_key
+        FROM (
+            SELECT DISTINCT ON (config->>'webhook_key')
+                id, config->>'webhook_key' AS webhook_key
+            FROM triggers
+            WHERE trigger_type = 'WEBHOOK' AND config->>'webhook_key' IS NOT NULL
+            ORDER BY config->>'webhook_key', is_active DESC, id
+        ) AS keyed
+        WHERE triggers.id = keyed.id
+        """
+    )
+    op.create_index(op.f('ix_triggers_webhook_key'), 'triggers', ['webhook_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_triggers_webhook_key'), table_name='triggers')
+    op.drop_column('triggers', 'webhook_key')
@@ -0,0 +1,40 @@
+"""Add keyset pagination indexes
+
+Revision ID: 74b7f4852d0a
+Revises: 259f1db676fd
+Create Date: 2026-10-17 16:02:37.418210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '74b7f4852d0a'
+down_revision: Union[str, None] = '259f1db676fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index, table, columns) backing the (created_at, id) order of list endpoints
+INDEXES = [
+    ('ix_clients_created_at_id', 'clients', ['created_at', 'id']),
+    ('ix_leads_client_id_created_at_id', 'leads', ['client_id', 'created_at', 'id']),
+    ('ix_messages_client_id_created_at_id', 'messages', ['client_id', 'created_at', 'id']),
+    ('ix_templates_client_id_created_at_id', 'templates', ['client_id', 'created_at', 'id']),
+    ('ix_triggers_client_id_created_at_id', 'triggers', ['client_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # Built concurrently so large tables (messages) stay writable
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
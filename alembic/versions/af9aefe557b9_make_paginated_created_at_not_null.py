@@ -0,0 +1,47 @@
+"""Make created_at of paginated tables not null
+
+Revision ID: af9aefe557b9
+Revises: e48e4a0b2d5b
+Create Date: 2026-10-18 12:47:33.051962
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'af9aefe557b9'
+down_revision: Union[str, None] = 'e48e4a0b2d5b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tables listed by (created_at, id) keyset pagination; messages already is
+TABLES = ('clients', 'leads', 'templates', 'triggers')
+
+
+def check_name(table: str) -> str:
+    return f'{table}_created_at_not_null'
+
+
+def upgrade() -> None:
+    # Rows from before the server default get their last update, or now
+    for table in TABLES:
+        op.execute(f"UPDATE {table} SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {check_name(table)} CHECK (created_at IS NOT NULL) NOT VALID')
+
+    # Validating only takes a SHARE UPDATE EXCLUSIVE lock, and lets SET NOT
+    # NULL skip its scan under ACCESS EXCLUSIVE
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check_name(table)}')
+
+    for table in TABLES:
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(timezone=True), nullable=False, existing_server_default=sa.text('now()'))
+        op.drop_constraint(check_name(table), table, type_='check')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(timezone=True), nullable=True, existing_server_default=sa.text('now()'))
@@ -0,0 +1,30 @@
+"""Cascade idempotency keys on client delete
+
+Revision ID: e48e4a0b2d5b
+Revises: e713c7e44ecd
+Create Date: 2026-10-18 12:20:51.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e48e4a0b2d5b'
+down_revision: Union[str, None] = 'e713c7e44ecd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases that ran cfae22a664d4 before it declared ON DELETE CASCADE
+    # lack the cascade; recreating the key gives every database the same one
+    op.drop_constraint('idempotency_keys_client_id_fkey', 'idempotency_keys', type_='foreignkey')
+    op.create_foreign_key('idempotency_keys_client_id_fkey', 'idempotency_keys', 'clients', ['client_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.drop_constraint('idempotency_keys_client_id_fkey', 'idempotency_keys', type_='foreignkey')
+    op.create_foreign_key('idempotency_keys_client_id_fkey', 'idempotency_keys', 'clients', ['client_id'], ['id'])
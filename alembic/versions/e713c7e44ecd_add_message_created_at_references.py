@@ -0,0 +1,36 @@
+"""Add message created_at to outbox and idempotency keys
+
+Revision ID: e713c7e44ecd
+Revises: 4679963b80a3
+Create Date: 2026-10-18 11:42:05.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e713c7e44ecd'
+down_revision: Union[str, None] = '4679963b80a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tables pointing at messages by id only
+TABLES = ('sms_outbox', 'idempotency_keys')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('message_created_at', sa.DateTime(timezone=True), nullable=True))
+        # Both only hold recent rows (relayed entries are deleted, keys expire)
+        op.execute(
+            f"UPDATE {table} SET message_created_at = messages.created_at "
+            f"FROM messages WHERE messages.id = {table}.message_id"
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, 'message_created_at')
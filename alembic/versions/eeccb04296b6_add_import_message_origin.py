@@ -0,0 +1,29 @@
+"""Add import message origin
+
+Revision ID: eeccb04296b6
+Revises: 1076f499ccc8
+Create Date: 2026-10-17 19:48:05.203117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eeccb04296b6'
+down_revision: Union[str, None] = '1076f499ccc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ADD VALUE can't be used in the transaction that adds it
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE messageorigin ADD VALUE IF NOT EXISTS 'IMPORT'")
+
+
+def downgrade() -> None:
+    # Postgres can't drop an enum value; the unused value is left in place
+    pass
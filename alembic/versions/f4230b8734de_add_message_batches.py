@@ -0,0 +1,45 @@
+"""Add message batches
+
+Revision ID: f4230b8734de
+Revises: 6c446228cb4b
+Create Date: 2026-10-17 09:12:31.482113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4230b8734de'
+down_revision: Union[str, None] = '6c446228cb4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('message_batches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('template_id', sa.Integer(), nullable=True),
+    sa.Column('total_messages', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.ForeignKeyConstraint(['template_id'], ['templates.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_message_batches_client_id'), 'message_batches', ['client_id'], unique=False)
+    op.create_index(op.f('ix_message_batches_id'), 'message_batches', ['id'], unique=False)
+    op.add_column('messages', sa.Column('batch_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_messages_batch_id'), 'messages', ['batch_id'], unique=False)
+    op.create_foreign_key('messages_batch_id_fkey', 'messages', 'message_batches', ['batch_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('messages_batch_id_fkey', 'messages', type_='foreignkey')
+    op.drop_index(op.f('ix_messages_batch_id'), table_name='messages')
+    op.drop_column('messages', 'batch_id')
+    op.drop_index(op.f('ix_message_batches_id'), table_name='message_batches')
+    op.drop_index(op.f('ix_message_batches_client_id'), table_name='message_batches')
+    op.drop_table('message_batches')
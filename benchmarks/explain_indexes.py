@@ -0,0 +1,201 @@
+"""
+Show EXPLAIN ANALYZE plans of the hot query shapes with the original
+indexes and with the current ones.
+
+Run this with: uv run python benchmarks/explain_indexes.py [--messages N]
+
+Everything happens on temporary copies of the tables (which shadow the real
+ones for this session) inside a transaction that is rolled back, so it is
+safe to point at any database migrated to head; nothing is left behind.
+"""
+import argparse
+from sqlalchemy import text
+from sms_remarketing.database import engine
+
+TABLES = ("clients", "leads", "templates", "triggers", "messages")
+
+# Indexes as created by the initial migration
+BEFORE = [
+    "CREATE INDEX ON leads (client_id)",
+    "CREATE INDEX ON messages (client_id)",
+    "CREATE INDEX ON messages (status)",
+    "CREATE INDEX ON messages (batch_id)",
+    "CREATE UNIQUE INDEX ON messages (twilio_sid)",
+    "CREATE INDEX ON triggers (client_id)",
+    "CREATE INDEX ON triggers (trigger_type)",
+]
+
+# Indexes at head, see the models' __table_args__ (partitioning is not reproduced)
+AFTER = [
+    "CREATE INDEX ON leads (client_id, created_at, id)",
+    "CREATE INDEX ON messages (client_id, created_at, id)",
+    "CREATE INDEX ON messages (created_at) WHERE status IN ('PENDING', 'QUEUED')",
+    "CREATE INDEX ON messages (batch_id)",
+    "CREATE INDEX ON messages (twilio_sid)",
+    "CREATE INDEX ON triggers (client_id)",
+    "CREATE INDEX ON triggers (trigger_type)",
+    "CREATE INDEX ON triggers (client_id, trigger_type) WHERE is_active",
+]
+
+# (name, SQL) of the queries the API and workers run
+QUERIES = [
+    (
+        "Twilio status callback",
+        "SELECT * FROM messages WHERE twilio_sid = 'SM' || (:messages / 2 + 1)",
+    ),
+    (
+        "List messages, deep page",
+        """
+        SELECT * FROM messages
+        WHERE client_id = 1 AND (created_at, id) > (:after_created_at, :after_id)
+        ORDER BY created_at, id LIMIT 101
+        """,
+    ),
+    (
+        "List messages, deep page with OFFSET (before keyset pagination)",
+        "SELECT * FROM messages WHERE client_id = 1 OFFSET :deep_offset LIMIT 100",
+    ),
+    (
+        "LEAD_AGE trigger leads",
+        """
+        SELECT * FROM leads
+        WHERE client_id = 1
+          AND created_at >= now() - interval '8 days'
+          AND created_at < now() - interval '7 days'
+        """,
+    ),
+    (
+        "Batch progress",
+        "SELECT status, count(id) FROM messages WHERE batch_id = 1 GROUP BY status",
+    ),
+    (
+        "Oldest unsent messages",
+        """
+        SELECT id FROM messages
+        WHERE status IN ('PENDING', 'QUEUED')
+        ORDER BY created_at LIMIT 1000
+        """,
+    ),
+    (
+        "NEW_LEAD triggers",
+        """
+        SELECT * FROM triggers
+        WHERE client_id = 1 AND trigger_type = 'NEW_LEAD' AND is_active
+        """,
+    ),
+]
+
+SEED = [
+    """
+    INSERT INTO clients (id, name, email, api_key, is_active, queue_weight)
+    SELECT g, 'client ' || g, 'client' || g || '@example.com', 'sk_' || g, true, 1
+    FROM generate_series(1, :clients) g
+    """,
+    """
+    INSERT INTO leads (id, client_id, phone_number, created_at)
+    SELECT g, 1 + g % :clients, '+1555' || lpad(g::text, 7, '0'),
+           now() - (g % 90) * interval '1 day' - (g % 86400) * interval '1 second'
+    FROM generate_series(1, :leads) g
+    """,
+    """
+    INSERT INTO templates (id, client_id, name, content, is_active)
+    SELECT g, g, 'welcome', 'Hi {first_name}', true
+    FROM generate_series(1, :clients) g
+    """,
+    """
+    INSERT INTO triggers (id, client_id, template_id, name, trigger_type, is_active)
+    SELECT g, 1 + g % :clients, 1 + g % :clients, 'trigger ' || g,
+           (ARRAY['NEW_LEAD', 'LEAD_AGE', 'WEBHOOK'])[1 + g % 3]::triggertype,
+           g % 4 <> 0
+    FROM generate_series(1, :clients * 6) g
+    """,
+    """
+    INSERT INTO messages (id, client_id, lead_id, batch_id, to_number, content,
+                          status, twilio_sid, created_at)
+    SELECT g, 1 + g % :clients, 1 + g % :leads, 1 + g / 10000, '+15550000000', 'Hi',
+           CASE WHEN g % 200 = 0 THEN 'QUEUED'
+                WHEN g % 50 = 0 THEN 'FAILED'
+                ELSE 'DELIVERED' END::messagestatus,
+           CASE WHEN g % 200 = 0 THEN NULL ELSE 'SM' || g END,
+           now() - (:messages - g) * interval '1 second'
+    FROM generate_series(1, :messages) g
+    """,
+]
+
+
+def explain(conn, params) -> None:
+    for name, sql in QUERIES:
+        plan = conn.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}"), params
+        ).scalars()
+        print(f"-- {name}")
+        for line in plan:
+            print(f"   {line}")
+        print()
+
+
+def create_indexes(conn, statements) -> None:
+    for statement in statements:
+        conn.execute(text(statement))
+    for table in TABLES:
+        conn.execute(text(f"ANALYZE {table}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--leads", type=int, default=200_000)
+    parser.add_argument("--messages", type=int, default=2_000_000)
+    args = parser.parse_args()
+    params = vars(args)
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            # Temporary tables are searched before the real ones
+            for table in TABLES:
+                conn.execute(
+                    text(
+                        f"CREATE TEMPORARY TABLE {table} "
+                        f"(LIKE public.{table} INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                )
+                conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id)"))
+            print(f"Seeding {args.messages} messages, {args.leads} leads...")
+            for statement in SEED:
+                conn.execute(text(statement), params)
+
+            # Cursor of a deep page of client 1's messages
+            params["deep_offset"] = args.messages // args.clients * 3 // 4
+            params["after_created_at"], params["after_id"] = conn.execute(
+                text(
+                    "SELECT created_at, id FROM messages WHERE client_id = 1 "
+                    "ORDER BY created_at, id OFFSET :deep_offset LIMIT 1"
+                ),
+                params,
+            ).one()
+
+            print("\n==== Before (initial migration indexes) ====\n")
+            create_indexes(conn, BEFORE)
+            explain(conn, params)
+
+            for table in TABLES:
+                for (index,) in conn.execute(
+                    text(
+                        "SELECT indexname FROM pg_indexes "
+                        "WHERE tablename = :table AND indexname NOT LIKE '%pkey' "
+                        "AND schemaname LIKE 'pg_temp%'"
+                    ),
+                    {"table": table},
+                ).all():
+                    conn.execute(text(f"DROP INDEX pg_temp.{index}"))
+
+            print("==== After (current indexes) ====\n")
+            create_indexes(conn, AFTER)
+            explain(conn, params)
+        finally:
+            transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()
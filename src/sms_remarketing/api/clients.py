@@ -1,18 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from typing import List, Optional
+import asyncio
+from ..database import get_async_db
 from ..models import Client
 from ..schemas import ClientCreate, ClientResponse, ClientUpdate
 from ..middleware.auth import verify_admin
+from .pagination import paginate
+from ..services import credit_service, credit_cache, auth_cache, webhook_cache
 
 router = APIRouter()
 
 
 @router.post("/", response_model=ClientResponse, status_code=status.HTTP_201_CREATED)
-def create_client(
+async def create_client(
     client_data: ClientCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _admin: bool = Depends(verify_admin),
 ):
     """
@@ -21,7 +26,7 @@ def create_client(
     Requires admin authentication via X-Admin-API-Key header.
     """
     # Check if email already exists
-    existing = db.query(Client).filter(Client.email == client_data.email).first()
+    existing = await db.scalar(select(Client).where(Client.email == client_data.email))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
@@ -32,38 +37,55 @@ def create_client(
         name=client_data.name,
         email=client_data.email,
         api_key=Client.generate_api_key(),
-        credits=client_data.initial_credits,
+        queue_weight=client_data.queue_weight,
     )
     db.add(client)
-    db.commit()
-    db.refresh(client)
+    await db.flush()
+    if client_data.initial_credits:
+        await db.run_sync(credit_service.add, client.id, client_data.initial_credits)
+    await db.commit()
+    await db.refresh(client, ["created_at", "updated_at", "credits"])
     return client
 
 
 @router.get("/", response_model=List[ClientResponse])
-def list_clients(
+async def list_clients(
+    response: Response,
+    after: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    limit: int = Query(100, ge=1),
+    db: AsyncSession = Depends(get_async_db),
     _admin: bool = Depends(verify_admin),
 ):
     """
-    List all clients.
+    List all clients, oldest first.
+    Pass a page's X-Next-Cursor header as `after` to get the next page.
     Requires admin authentication via X-Admin-API-Key header.
     """
-    clients = db.query(Client).offset(skip).limit(limit).all()
-    return clients
+    return await paginate(
+        db,
+        select(Client).options(undefer(Client.credits)),
+        Client,
+        response,
+        after,
+        skip,
+        limit,
+    )
 
 
 @router.get("/{client_id}", response_model=ClientResponse)
-def get_client(
-    client_id: int, db: Session = Depends(get_db), _admin: bool = Depends(verify_admin)
+async def get_client(
+    client_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    _admin: bool = Depends(verify_admin),
 ):
     """
     Get a specific client.
     Requires admin authentication via X-Admin-API-Key header.
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.scalar(
+        select(Client).options(undefer(Client.credits)).where(Client.id == client_id)
+    )
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
@@ -72,17 +94,17 @@ def get_client(
 
 
 @router.put("/{client_id}", response_model=ClientResponse)
-def update_client(
+async def update_client(
     client_id: int,
     client_data: ClientUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _admin: bool = Depends(verify_admin),
 ):
     """
     Update a client.
     Requires admin authentication via X-Admin-API-Key header.
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
@@ -92,24 +114,31 @@ def update_client(
     for field, value in update_data.items():
         setattr(client, field, value)
 
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    await db.refresh(client, ["updated_at", "credits"])
+    await asyncio.to_thread(auth_cache.invalidate, client.id)
+    await asyncio.to_thread(webhook_cache.invalidate_client, client.id)
     return client
 
 
 @router.delete("/{client_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_client(
-    client_id: int, db: Session = Depends(get_db), _admin: bool = Depends(verify_admin)
+async def delete_client(
+    client_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    _admin: bool = Depends(verify_admin),
 ):
     """
     Delete a client.
     Requires admin authentication via X-Admin-API-Key header.
     """
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await db.get(Client, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Client not found"
         )
 
-    db.delete(client)
-    db.commit()
+    await db.delete(client)
+    await db.commit()
+    await asyncio.to_thread(auth_cache.invalidate, client_id)
+    await asyncio.to_thread(webhook_cache.invalidate_client, client_id)
+    await asyncio.to_thread(credit_cache.forget, client_id)
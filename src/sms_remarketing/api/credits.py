@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+from ..database import get_async_db
 from ..models import Client
 from ..middleware import get_current_client
+from ..services import credit_service, credit_cache
 
 router = APIRouter()
 
@@ -17,22 +19,25 @@ class AddCreditsRequest(BaseModel):
 
 
 @router.get("/balance", response_model=CreditBalance)
-def get_credit_balance(client: Client = Depends(get_current_client)):
+async def get_credit_balance(
+    client: Client = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db),
+):
     """Get current credit balance"""
-    return CreditBalance(credits=client.credits)
+    return CreditBalance(credits=await credit_cache.balance_async(client.id))
 
 
 @router.post("/add", response_model=CreditBalance)
-def add_credits(
+async def add_credits(
     request: AddCreditsRequest,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Add credits to client account.
     Note: In production, this should be protected and integrated with a payment system.
     """
-    client.credits += request.amount
-    db.commit()
-    db.refresh(client)
-    return CreditBalance(credits=client.credits)
+    await db.run_sync(credit_service.add, client.id, request.amount)
+    await db.commit()
+    await asyncio.to_thread(credit_cache.invalidate, client.id)
+    return CreditBalance(credits=await credit_cache.balance_async(client.id))
@@ -1,32 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import logging
-from ..database import get_db
+from ..database import get_async_db, get_read_db
 from ..models import Client, Lead
-from ..schemas import LeadCreate, LeadResponse, LeadUpdate
+from ..schemas import LeadCreate, LeadResponse, LeadUpdate, LeadImportResponse
+from ..services import lead_import_service, UnsupportedImportFormat
 from ..middleware import get_current_client
+from .pagination import paginate
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
 @router.post("/", response_model=LeadResponse, status_code=status.HTTP_201_CREATED)
-def create_lead(
+async def create_lead(
     lead_data: LeadCreate,
+    response: Response,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Create a new lead and trigger NEW_LEAD automation"""
-    lead = Lead(**lead_data.model_dump(), client_id=client.id)
-    db.add(lead)
-    db.commit()
-    db.refresh(lead)
+    """
+    Create a new lead and trigger NEW_LEAD automation.
+    If the client already has a lead with this phone number, the fields sent
+    are written to it instead and it is returned with 200, without triggers.
+    """
+    # phone_number is already in E.164 form, see LeadCreate
+    statement = insert(Lead).values(
+        **lead_data.model_dump(),
+        client_id=client.id,
+        phone_normalized=lead_data.phone_number,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[Lead.client_id, Lead.phone_normalized],
+        set_={
+            **{
+                field: statement.excluded[field]
+                for field in lead_data.model_fields_set
+            },
+            "updated_at": func.now(),
+        },
+    ).returning(Lead, literal_column("xmax = 0"))
+    # xmax is only set on rows that already existed
+    lead, created = (await db.execute(statement)).one()
+    await db.commit()
+    await db.refresh(lead)
+
+    if not created:
+        response.status_code = status.HTTP_200_OK
+        return lead
 
     # Process NEW_LEAD triggers
     from ..workers import process_new_lead_triggers
     try:
-        process_new_lead_triggers(lead.id)
+        # Runs on the sync engine, keep it off the event loop
+        await run_in_threadpool(process_new_lead_triggers, lead.id)
         logger.info(f"Processed NEW_LEAD triggers for lead {lead.id}")
     except Exception as e:
         logger.error(f"Failed to process NEW_LEAD triggers for lead {lead.id}: {e}", exc_info=True)
@@ -34,33 +75,85 @@ def create_lead(
     return lead
 
 
+@router.post("/import", response_model=LeadImportResponse)
+async def import_leads(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    run_triggers: bool = False,
+    client: Client = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Bulk import leads from a CSV (text/csv, with a header row) or NDJSON
+    (application/x-ndjson) request body, streamed straight into the database.
+    CSV columns other than the lead fields become custom fields.
+    Leads the client already has (by normalized phone number) are updated
+    with the non-empty fields; a number repeated in the file is taken from
+    its last row. Invalid rows are counted and the first ones reported back.
+    Set 'run_triggers' to send NEW_LEAD triggers to the imported leads, as
+    one campaign batch per trigger after the response.
+    """
+    try:
+        result = await lead_import_service.import_leads(
+            db,
+            client.id,
+            request.stream(),
+            request.headers.get("content-type", ""),
+        )
+    except UnsupportedImportFormat as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e)
+        )
+
+    triggers_scheduled = run_triggers and result.imported > 0
+    if triggers_scheduled:
+        from ..workers import process_imported_lead_triggers
+        background_tasks.add_task(
+            process_imported_lead_triggers,
+            client.id,
+            result.first_id,
+            result.last_id,
+            result.imported_at,
+        )
+
+    return LeadImportResponse(
+        received=result.received,
+        imported=result.imported,
+        updated=result.updated,
+        unchanged=result.unchanged,
+        duplicates=result.duplicates,
+        invalid=result.invalid,
+        errors=result.errors,
+        triggers_scheduled=triggers_scheduled,
+    )
+
+
 @router.get("/", response_model=List[LeadResponse])
-def list_leads(
+async def list_leads(
+    response: Response,
+    after: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List all leads for the authenticated client"""
-    leads = (
-        db.query(Lead)
-        .filter(Lead.client_id == client.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return leads
+    """
+    List all leads for the authenticated client, oldest first.
+    Pass a page's X-Next-Cursor header as `after` to get the next page.
+    """
+    query = select(Lead).where(Lead.client_id == client.id)
+    return await paginate(db, query, Lead, response, after, skip, limit)
 
 
 @router.get("/{lead_id}", response_model=LeadResponse)
-def get_lead(
+async def get_lead(
     lead_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Get a specific lead"""
-    lead = (
-        db.query(Lead).filter(Lead.id == lead_id, Lead.client_id == client.id).first()
+    lead = await db.scalar(
+        select(Lead).where(Lead.id == lead_id, Lead.client_id == client.id)
     )
 
     if not lead:
@@ -72,15 +165,15 @@ def get_lead(
 
 
 @router.put("/{lead_id}", response_model=LeadResponse)
-def update_lead(
+async def update_lead(
     lead_id: int,
     lead_data: LeadUpdate,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a lead"""
-    lead = (
-        db.query(Lead).filter(Lead.id == lead_id, Lead.client_id == client.id).first()
+    lead = await db.scalar(
+        select(Lead).where(Lead.id == lead_id, Lead.client_id == client.id)
     )
 
     if not lead:
@@ -93,20 +186,27 @@ def update_lead(
     for field, value in update_data.items():
         setattr(lead, field, value)
 
-    db.commit()
-    db.refresh(lead)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Another lead already has this phone number",
+        )
+    await db.refresh(lead)
     return lead
 
 
 @router.delete("/{lead_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_lead(
+async def delete_lead(
     lead_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Delete a lead"""
-    lead = (
-        db.query(Lead).filter(Lead.id == lead_id, Lead.client_id == client.id).first()
+    lead = await db.scalar(
+        select(Lead).where(Lead.id == lead_id, Lead.client_id == client.id)
     )
 
     if not lead:
@@ -114,5 +214,5 @@ def delete_lead(
             status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found"
         )
 
-    db.delete(lead)
-    db.commit()
+    await db.delete(lead)
+    await db.commit()
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..models import Client, Lead, Template, Message
-from ..schemas import SendSMSRequest, MessageResponse
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ..database import get_async_db, get_read_db
+from ..models import Client, Lead, Template, Message, MessageBatch
+from ..schemas import (
+    SendSMSRequest,
+    MessageResponse,
+    SendBatchRequest,
+    MessageBatchResponse,
+)
 from ..middleware import get_current_client
-from ..services import sms_service
+from ..services import sms_service, queue_service
+from .pagination import paginate
 
 router = APIRouter()
 
@@ -13,20 +20,21 @@ router = APIRouter()
 @router.post(
     "/send", response_model=MessageResponse, status_code=status.HTTP_201_CREATED
 )
-def send_sms(
+async def send_sms(
     request: SendSMSRequest,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """
     Send an SMS to a lead.
     Either provide 'content' directly OR provide 'template_id' with optional 'variables'.
+    Set 'send_at' to schedule the message for a later time.
+    Retries carrying the same Idempotency-Key header return the original message.
     """
     # Get lead
-    lead = (
-        db.query(Lead)
-        .filter(Lead.id == request.lead_id, Lead.client_id == client.id)
-        .first()
+    lead = await db.scalar(
+        select(Lead).where(Lead.id == request.lead_id, Lead.client_id == client.id)
     )
 
     if not lead:
@@ -37,14 +45,12 @@ def send_sms(
     # Determine content
     template = None
     if request.template_id:
-        template = (
-            db.query(Template)
-            .filter(
+        template = await db.scalar(
+            select(Template).where(
                 Template.id == request.template_id,
                 Template.client_id == client.id,
                 Template.is_active == True,
             )
-            .first()
         )
 
         if not template:
@@ -65,43 +71,153 @@ def send_sms(
 
     # Send SMS
     try:
-        message = sms_service.send_sms(
-            db=db, client=client, lead=lead, content=content, template=template
+        message = await sms_service.send_sms_async(
+            db=db,
+            client=client,
+            lead=lead,
+            content=content,
+            template=template,
+            send_at=request.send_at,
+            idempotency_key=idempotency_key,
         )
         return message
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post(
+    "/send-batch",
+    response_model=MessageBatchResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def send_batch(
+    request: SendBatchRequest,
+    client: Client = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Send a templated SMS campaign to many leads.
+    Provide either 'lead_ids' or a 'lead_filter' (an empty filter matches all leads).
+    Set 'send_at' to start later and 'spread_seconds' to pace sends over a window.
+    Returns a batch that can be polled via GET /messages/batches/{batch_id}.
+    """
+    if request.lead_ids is None and request.lead_filter is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Either 'lead_ids' or 'lead_filter' must be provided",
+        )
+
+    if not queue_service.is_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Message queue is unavailable",
+        )
+
+    template = await db.scalar(
+        select(Template).where(
+            Template.id == request.template_id,
+            Template.client_id == client.id,
+            Template.is_active == True,
+        )
+    )
+
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found or inactive",
+        )
+
+    # Build lead selection
+    leads = select(Lead).where(Lead.client_id == client.id)
+    if request.lead_ids is not None:
+        leads = leads.where(Lead.id.in_(request.lead_ids))
+    if request.lead_filter is not None:
+        if request.lead_filter.created_after:
+            leads = leads.where(Lead.created_at >= request.lead_filter.created_after)
+        if request.lead_filter.created_before:
+            leads = leads.where(Lead.created_at < request.lead_filter.created_before)
+
+    try:
+        batch = await sms_service.send_batch_async(
+            db=db,
+            client=client,
+            template=template,
+            leads=leads.order_by(Lead.id),
+            variables=request.variables,
+            send_at=request.send_at,
+            spread_seconds=request.spread_seconds,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return await _batch_response(db, batch)
+
+
+@router.get("/batches/{batch_id}", response_model=MessageBatchResponse)
+async def get_batch(
+    batch_id: int,
+    client: Client = Depends(get_current_client),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Get progress of a batch send"""
+    batch = await db.scalar(
+        select(MessageBatch).where(
+            MessageBatch.id == batch_id, MessageBatch.client_id == client.id
+        )
+    )
+
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found"
+        )
+
+    return await _batch_response(db, batch)
+
+
+async def _batch_response(
+    db: AsyncSession, batch: MessageBatch
+) -> MessageBatchResponse:
+    """Build a batch response with per-status message counts"""
+    counts = await db.execute(
+        select(Message.status, func.count(Message.id))
+        .where(
+            Message.batch_id == batch.id,
+            # Inserted in the batch's transaction; skips older partitions
+            Message.created_at >= batch.created_at,
+        )
+        .group_by(Message.status)
+    )
+    response = MessageBatchResponse.model_validate(batch)
+    response.status_counts = {status_: count for status_, count in counts}
+    return response
+
+
 @router.get("/", response_model=List[MessageResponse])
-def list_messages(
+async def list_messages(
+    response: Response,
+    after: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List all messages for the authenticated client"""
-    messages = (
-        db.query(Message)
-        .filter(Message.client_id == client.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return messages
+    """
+    List all messages for the authenticated client, oldest first.
+    Pass a page's X-Next-Cursor header as `after` to get the next page.
+    """
+    query = select(Message).where(Message.client_id == client.id)
+    return await paginate(db, query, Message, response, after, skip, limit)
 
 
 @router.get("/{message_id}", response_model=MessageResponse)
-def get_message(
+async def get_message(
     message_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Get a specific message"""
-    message = (
-        db.query(Message)
-        .filter(Message.id == message_id, Message.client_id == client.id)
-        .first()
+    message = await db.scalar(
+        select(Message).where(Message.id == message_id, Message.client_id == client.id)
     )
 
     if not message:
@@ -0,0 +1,77 @@
+"""
+Keyset pagination for list endpoints.
+Rows are returned in (created_at, id) order and the next page starts after
+the last row returned, so every page is a range scan on a
+(..., created_at, id) index instead of skipping over the earlier pages.
+"""
+from datetime import datetime
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional, Tuple
+import base64
+import json
+
+# Response header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(row: Any) -> str:
+    """Opaque cursor pointing just after a row"""
+    raw = json.dumps([row.created_at.isoformat(), row.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Get the (created_at, id) a cursor points after"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model: Any,
+    response: Response,
+    after: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[Any]:
+    """
+    Run one page of a list query.
+
+    Args:
+        db: Database session
+        query: Statement selecting `model` rows, without ordering
+        model: Mapped class with `created_at` and `id` columns
+        response: Response to set the next page's cursor header on
+        after: Cursor from a previous page's X-Next-Cursor header
+        skip: Offset into the results, only used without a cursor
+        limit: Page size
+
+    Returns:
+        The rows of the page
+    """
+    query = query.order_by(model.created_at, model.id)
+    if after:
+        created_at, row_id = decode_cursor(after)
+        # The plain created_at bound lets partitioned tables skip older partitions
+        query = query.where(
+            tuple_(model.created_at, model.id) > (created_at, row_id),
+            model.created_at >= created_at,
+        )
+    elif skip:
+        query = query.offset(skip)
+
+    # One extra row tells whether there is a next page
+    rows = (await db.scalars(query.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1])
+    return rows
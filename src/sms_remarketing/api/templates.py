@@ -1,57 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+from ..database import get_async_db, get_read_db
 from ..models import Client, Template
 from ..schemas import TemplateCreate, TemplateResponse, TemplateUpdate
 from ..middleware import get_current_client
+from ..services import webhook_cache
+from .pagination import paginate
 
 router = APIRouter()
 
 
 @router.post("/", response_model=TemplateResponse, status_code=status.HTTP_201_CREATED)
-def create_template(
+async def create_template(
     template_data: TemplateCreate,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a new SMS template"""
     template = Template(**template_data.model_dump(), client_id=client.id)
     db.add(template)
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    await db.refresh(template)
     return template
 
 
 @router.get("/", response_model=List[TemplateResponse])
-def list_templates(
+async def list_templates(
+    response: Response,
+    after: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     active_only: bool = False,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List all templates for the authenticated client"""
-    query = db.query(Template).filter(Template.client_id == client.id)
+    """
+    List all templates for the authenticated client, oldest first.
+    Pass a page's X-Next-Cursor header as `after` to get the next page.
+    """
+    query = select(Template).where(Template.client_id == client.id)
 
     if active_only:
-        query = query.filter(Template.is_active == True)
+        query = query.where(Template.is_active == True)
 
-    templates = query.offset(skip).limit(limit).all()
-    return templates
+    return await paginate(db, query, Template, response, after, skip, limit)
 
 
 @router.get("/{template_id}", response_model=TemplateResponse)
-def get_template(
+async def get_template(
     template_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Get a specific template"""
-    template = (
-        db.query(Template)
-        .filter(Template.id == template_id, Template.client_id == client.id)
-        .first()
+    template = await db.scalar(
+        select(Template).where(
+            Template.id == template_id, Template.client_id == client.id
+        )
     )
 
     if not template:
@@ -63,17 +71,17 @@ def get_template(
 
 
 @router.put("/{template_id}", response_model=TemplateResponse)
-def update_template(
+async def update_template(
     template_id: int,
     template_data: TemplateUpdate,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a template"""
-    template = (
-        db.query(Template)
-        .filter(Template.id == template_id, Template.client_id == client.id)
-        .first()
+    template = await db.scalar(
+        select(Template).where(
+            Template.id == template_id, Template.client_id == client.id
+        )
     )
 
     if not template:
@@ -86,22 +94,23 @@ def update_template(
     for field, value in update_data.items():
         setattr(template, field, value)
 
-    db.commit()
-    db.refresh(template)
+    await db.commit()
+    await db.refresh(template)
+    await asyncio.to_thread(webhook_cache.invalidate_template, template.id)
     return template
 
 
 @router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_template(
+async def delete_template(
     template_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Delete a template"""
-    template = (
-        db.query(Template)
-        .filter(Template.id == template_id, Template.client_id == client.id)
-        .first()
+    template = await db.scalar(
+        select(Template).where(
+            Template.id == template_id, Template.client_id == client.id
+        )
     )
 
     if not template:
@@ -109,5 +118,6 @@ def delete_template(
             status_code=status.HTTP_404_NOT_FOUND, detail="Template not found"
         )
 
-    db.delete(template)
-    db.commit()
+    await db.delete(template)
+    await db.commit()
+    await asyncio.to_thread(webhook_cache.invalidate_template, template_id)
@@ -1,28 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+import asyncio
+from ..database import get_async_db, get_read_db
 from ..models import Client, Trigger, Template
 from ..schemas import TriggerCreate, TriggerResponse, TriggerUpdate
 from ..middleware import get_current_client
+from ..services import webhook_cache
+from .pagination import paginate
 
 router = APIRouter()
 
 
+async def commit_trigger(db: AsyncSession):
+    """Commit a created or updated trigger; webhook keys are unique"""
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Webhook key already in use"
+        )
+
+
 @router.post("/", response_model=TriggerResponse, status_code=status.HTTP_201_CREATED)
-def create_trigger(
+async def create_trigger(
     trigger_data: TriggerCreate,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a new automation trigger"""
     # Verify template belongs to client
-    template = (
-        db.query(Template)
-        .filter(
+    template = await db.scalar(
+        select(Template).where(
             Template.id == trigger_data.template_id, Template.client_id == client.id
         )
-        .first()
     )
 
     if not template:
@@ -31,41 +45,44 @@ def create_trigger(
         )
 
     trigger = Trigger(**trigger_data.model_dump(), client_id=client.id)
+    trigger.sync_webhook_key()
     db.add(trigger)
-    db.commit()
-    db.refresh(trigger)
+    await commit_trigger(db)
+    await db.refresh(trigger)
     return trigger
 
 
 @router.get("/", response_model=List[TriggerResponse])
-def list_triggers(
+async def list_triggers(
+    response: Response,
+    after: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     active_only: bool = False,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List all triggers for the authenticated client"""
-    query = db.query(Trigger).filter(Trigger.client_id == client.id)
+    """
+    List all triggers for the authenticated client, oldest first.
+    Pass a page's X-Next-Cursor header as `after` to get the next page.
+    """
+    query = select(Trigger).where(Trigger.client_id == client.id)
 
     if active_only:
-        query = query.filter(Trigger.is_active == True)
+        query = query.where(Trigger.is_active == True)
 
-    triggers = query.offset(skip).limit(limit).all()
-    return triggers
+    return await paginate(db, query, Trigger, response, after, skip, limit)
 
 
 @router.get("/{trigger_id}", response_model=TriggerResponse)
-def get_trigger(
+async def get_trigger(
     trigger_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Get a specific trigger"""
-    trigger = (
-        db.query(Trigger)
-        .filter(Trigger.id == trigger_id, Trigger.client_id == client.id)
-        .first()
+    trigger = await db.scalar(
+        select(Trigger).where(Trigger.id == trigger_id, Trigger.client_id == client.id)
     )
 
     if not trigger:
@@ -77,17 +94,15 @@ def get_trigger(
 
 
 @router.put("/{trigger_id}", response_model=TriggerResponse)
-def update_trigger(
+async def update_trigger(
     trigger_id: int,
     trigger_data: TriggerUpdate,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a trigger"""
-    trigger = (
-        db.query(Trigger)
-        .filter(Trigger.id == trigger_id, Trigger.client_id == client.id)
-        .first()
+    trigger = await db.scalar(
+        select(Trigger).where(Trigger.id == trigger_id, Trigger.client_id == client.id)
     )
 
     if not trigger:
@@ -99,23 +114,23 @@ def update_trigger(
     update_data = trigger_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(trigger, field, value)
+    trigger.sync_webhook_key()
 
-    db.commit()
-    db.refresh(trigger)
+    await commit_trigger(db)
+    await db.refresh(trigger)
+    await asyncio.to_thread(webhook_cache.invalidate_trigger, trigger.id)
     return trigger
 
 
 @router.delete("/{trigger_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_trigger(
+async def delete_trigger(
     trigger_id: int,
     client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Delete a trigger"""
-    trigger = (
-        db.query(Trigger)
-        .filter(Trigger.id == trigger_id, Trigger.client_id == client.id)
-        .first()
+    trigger = await db.scalar(
+        select(Trigger).where(Trigger.id == trigger_id, Trigger.client_id == client.id)
     )
 
     if not trigger:
@@ -123,5 +138,6 @@ def delete_trigger(
             status_code=status.HTTP_404_NOT_FOUND, detail="Trigger not found"
         )
 
-    db.delete(trigger)
-    db.commit()
+    await db.delete(trigger)
+    await db.commit()
+    await asyncio.to_thread(webhook_cache.invalidate_trigger, trigger_id)
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    BackgroundTasks,
+    Form,
+    Header,
+)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import logging
-from ..database import get_db
-from ..models import Trigger, Lead, Template, Message
+from ..config import settings
+from ..database import get_async_db
+from ..models import Client, Trigger, Lead, Template, Message
 from ..models.trigger import TriggerType
-from ..models.message import MessageStatus
-from ..services import sms_service
-from datetime import datetime
+from ..models.message import MessageStatus, MessageOrigin
+from ..services import sms_service, webhook_cache
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -20,47 +30,54 @@ class WebhookTriggerRequest(BaseModel):
 
 
 @router.post("/trigger/{webhook_key}", status_code=status.HTTP_202_ACCEPTED)
-def trigger_webhook(
+async def trigger_webhook(
     webhook_key: str,
     request: WebhookTriggerRequest,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """
     Trigger SMS via webhook.
-    Finds active trigger with matching webhook_key and sends SMS to specified lead.
+    Finds the active trigger with a matching webhook_key (cached in process)
+    and sends SMS to specified lead.
+    Retries carrying the same Idempotency-Key header return the original message.
     """
-    # Find trigger with matching webhook_key
-    trigger = (
-        db.query(Trigger)
-        .filter(
-            Trigger.trigger_type == TriggerType.WEBHOOK,
-            Trigger.is_active == True,
+    cached = webhook_cache.get(webhook_key)
+    if cached is not None:
+        trigger, template, client = [await db.merge(row, load=False) for row in cached]
+    else:
+        trigger = await db.scalar(
+            select(Trigger).where(
+                Trigger.webhook_key == webhook_key,
+                Trigger.trigger_type == TriggerType.WEBHOOK,
+            )
         )
-        .all()
-    )
-
-    # Filter by webhook_key in config
-    matching_trigger = None
-    for t in trigger:
-        if t.config.get("webhook_key") == webhook_key:
-            matching_trigger = t
-            break
-
-    if not matching_trigger:
+        template = client = None
+        if trigger:
+            template = await db.get(Template, trigger.template_id)
+            client = await db.get(Client, trigger.client_id)
+            if template and client:
+                webhook_cache.put(trigger, template, client)
+
+    if not trigger or not trigger.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Webhook trigger not found or inactive",
         )
 
+    if not template or not template.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found or inactive",
+        )
+
     # Get lead
-    lead = (
-        db.query(Lead)
-        .filter(
+    lead = await db.scalar(
+        select(Lead).where(
             Lead.id == request.lead_id,
-            Lead.client_id == matching_trigger.client_id,
+            Lead.client_id == trigger.client_id,
         )
-        .first()
     )
 
     if not lead:
@@ -69,46 +86,25 @@ def trigger_webhook(
             detail="Lead not found or doesn't belong to this client",
         )
 
-    # Get template
-    template = (
-        db.query(Template)
-        .filter(Template.id == matching_trigger.template_id)
-        .first()
-    )
-
-    if not template or not template.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Template not found or inactive",
-        )
-
-    # Prepare variables
-    variables = {
-        "first_name": lead.first_name or "",
-        "last_name": lead.last_name or "",
-        "full_name": lead.full_name,
-        "phone_number": lead.phone_number,
-        "email": lead.email or "",
-    }
-    if lead.custom_fields:
-        variables.update(lead.custom_fields)
+    # Render content, request variables override the lead's
+    variables = lead.template_variables()
     if request.variables:
         variables.update(request.variables)
-
-    # Render content
-    content = template.render(**variables)
+    content = template.compiled().render(variables)
 
     # Send SMS
     try:
-        message = sms_service.send_sms(
+        message = await sms_service.send_sms_async(
             db=db,
-            client=lead.client,
+            client=client,
             lead=lead,
             content=content,
             template=template,
+            origin=MessageOrigin.WEBHOOK,
+            idempotency_key=idempotency_key,
         )
         logger.info(
-            f"Webhook trigger {matching_trigger.id} sent SMS {message.id} to lead {lead.id}"
+            f"Webhook trigger {trigger.id} sent SMS {message.id} to lead {lead.id}"
         )
         return {
             "status": "accepted",
@@ -117,31 +113,36 @@ def trigger_webhook(
         }
     except ValueError as e:
         logger.error(
-            f"Webhook trigger {matching_trigger.id} failed for lead {lead.id}: {e}",
+            f"Webhook trigger {trigger.id} failed for lead {lead.id}: {e}",
             exc_info=True,
         )
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.post("/twilio/status")
-def twilio_status_webhook(
-    MessageSid: str,
-    MessageStatus: str,
-    ErrorCode: Optional[str] = None,
-    ErrorMessage: Optional[str] = None,
-    db: Session = Depends(get_db),
+async def twilio_status_webhook(
+    message_sid: str = Form(..., alias="MessageSid"),
+    message_status: str = Form(..., alias="MessageStatus"),
+    error_code: Optional[str] = Form(None, alias="ErrorCode"),
+    error_message: Optional[str] = Form(None, alias="ErrorMessage"),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Receive delivery status updates from Twilio.
     Configure this URL in your Twilio console as the Status Callback URL.
     """
-    # Find message by Twilio SID
-    message = (
-        db.query(Message).filter(Message.twilio_sid == MessageSid).first()
+    # Find message by Twilio SID. Callbacks nearly always follow the send
+    # closely, so look in recent partitions before searching all of them.
+    by_sid = select(Message).where(Message.twilio_sid == message_sid)
+    recent = datetime.now(timezone.utc) - timedelta(
+        days=settings.message_status_lookup_days
     )
+    message = await db.scalar(by_sid.where(Message.created_at >= recent))
+    if not message:
+        message = await db.scalar(by_sid)
 
     if not message:
-        logger.warning(f"Received status update for unknown message SID: {MessageSid}")
+        logger.warning(f"Received status update for unknown message SID: {message_sid}")
         return {"status": "ignored"}
 
     # Update message status
@@ -149,7 +150,9 @@ def twilio_status_webhook(
 
     # Map Twilio status to our enum
     status_map = {
-        "queued": MessageStatus.QUEUED,
+        # Already handed to the provider; going back to QUEUED would let a
+        # retried send job claim the message again
+        "queued": MessageStatus.SENT,
         "sending": MessageStatus.SENT,
         "sent": MessageStatus.SENT,
         "delivered": MessageStatus.DELIVERED,
@@ -157,7 +160,7 @@ def twilio_status_webhook(
         "failed": MessageStatus.FAILED,
     }
 
-    new_status = status_map.get(MessageStatus.lower(), message.status)
+    new_status = status_map.get(message_status.lower(), message.status)
     message.status = new_status
 
     # Update timestamps
@@ -166,15 +169,15 @@ def twilio_status_webhook(
 
     # Update error info if failed
     if new_status == MessageStatus.FAILED:
-        if ErrorCode:
-            message.error_message = f"Twilio Error {ErrorCode}: {ErrorMessage or 'Unknown error'}"
+        if error_code:
+            message.error_message = f"Twilio Error {error_code}: {error_message or 'Unknown error'}"
         elif not message.error_message:
             message.error_message = "Delivery failed"
 
-    db.commit()
+    await db.commit()
 
     logger.info(
-        f"Updated message {message.id} status from {old_status} to {new_status} (Twilio: {MessageStatus})"
+        f"Updated message {message.id} status from {old_status} to {new_status} (Twilio: {message_status})"
     )
 
     return {"status": "updated", "message_id": message.id}
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, List, Union
 
 
 class Settings(BaseSettings):
@@ -8,12 +8,105 @@ class Settings(BaseSettings):
     twilio_account_sid: str
     twilio_auth_token: str
     twilio_phone_number: str
+    sms_provider: str = "twilio"  # "twilio" or "fake"
+    twilio_api_base_url: str = "https://api.twilio.com"
+    twilio_max_concurrency: int = 100  # Async sends in flight per worker process
+    twilio_http_timeout: float = 10.0
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     debug: bool = False
     secret_key: str
     admin_api_key: str
 
+    # Fake SMS provider (SMS_PROVIDER=fake), for load testing
+    fake_sms_latency_ms: float = 50.0
+    fake_sms_latency_jitter_ms: float = 20.0
+    fake_sms_error_rate: float = 0.0
+    fake_sms_rate_limit_rate: float = 0.0  # Fraction of sends answered with 429
+    fake_sms_callback_url: Optional[str] = None  # e.g. .../api/v1/webhooks/twilio/status
+    fake_sms_callback_delay_ms: float = 500.0
+    fake_sms_undelivered_rate: float = 0.0
+
+    # Outbound send rate limits (token buckets shared through Redis)
+    rate_limit_enabled: bool = True
+    rate_limit_sender_mps: float = 10.0  # Messages/sec per sender number, 0 disables
+    rate_limit_client_mps: float = 50.0  # Messages/sec per client, 0 disables
+    rate_limit_burst_seconds: float = 1.0  # Bucket size, in seconds of traffic
+
+    # Background SMS jobs
+    sms_job_chunk_size: int = 100  # Messages sent per RQ job
+    # Relative share of jobs each priority lane gets when all have work
+    queue_weights: Dict[str, int] = {"sms:high": 10, "sms:bulk": 1, "sms": 1}
+    # Lanes fed through per-client sub-queues by the fair dispatcher
+    fair_queue_lanes: List[str] = ["sms:bulk"]
+    fair_queue_quantum: int = 100  # Messages per client per round, times its weight
+    fair_queue_target_depth: int = 20  # Jobs kept ready in a lane for workers
+    fair_queue_poll_interval: float = 0.1
+    # Outbox relay handing committed messages to the job queue
+    outbox_batch_size: int = 1000  # Outbox rows claimed per transaction
+    outbox_poll_interval: float = 0.2  # Seconds to sleep when the outbox is empty
+    # Scheduler releasing messages with a future send_at
+    scheduler_batch_size: int = 1000  # Messages released per round
+    scheduler_poll_interval: float = 0.5  # Longest sleep between rounds
+
+    # Monthly partitions of messages, maintained by the worker
+    message_partitions_ahead: int = 3  # Future months kept created
+    message_retention_months: int = 12  # Older partitions are detached and archived
+    message_archive_schema: str = "archive"  # Where detached partitions are moved
+    message_archive_dir: Optional[str] = None  # If set, exported as .csv.gz and dropped
+    message_status_lookup_days: int = 7  # Status callbacks search this far back first
+
+    # Idempotency-Key handling on send endpoints
+    idempotency_ttl_seconds: int = 86400  # How long keys are remembered
+    idempotency_lock_seconds: int = 30  # Max time a key stays in flight
+
+    # Redis credit balances, flushed to the credit ledger by the worker
+    credit_cache_enabled: bool = True
+    credit_cache_ttl_seconds: int = 86400
+    credit_reconcile_seconds: int = 10  # How often reservations are flushed
+
+    # Database connection pools. PROCESS_ROLE selects overrides from db_pool_roles
+    # ("api", "worker", "rq_worker", "outbox_relay", "scheduler", "dispatcher")
+    process_role: str = "api"
+    db_pool_size: int = 5  # Connections kept open per engine
+    db_max_overflow: int = 10  # Extra connections opened under load
+    db_pool_timeout: float = 30.0  # Seconds to wait for a free connection
+    db_pool_recycle: int = 1800  # Reconnect after this many seconds, -1 disables
+    db_pool_pre_ping: bool = True  # Test connections on checkout (one round-trip)
+    # Per-role values for the options above, keyed by create_engine argument
+    db_pool_roles: Dict[str, Dict[str, Union[bool, int, float]]] = {
+        "api": {"pool_size": 20, "max_overflow": 20},
+        "rq_worker": {"pool_size": 2, "max_overflow": 2},
+        "outbox_relay": {"pool_size": 1, "max_overflow": 1},
+        "scheduler": {"pool_size": 1, "max_overflow": 1},
+        "dispatcher": {"pool_size": 1, "max_overflow": 1},
+    }
+
+    # How often each process writes its Redis-backed metrics (e.g. pool usage)
+    metrics_flush_interval_seconds: float = 10.0
+
+    # Region assumed for lead phone numbers given without a country code
+    default_phone_region: str = "US"
+
+    # Read replicas for read-only API endpoints, as a JSON list of URLs
+    database_replica_urls: List[str] = []
+    replica_max_lag_seconds: float = 5.0  # Replay lag beyond which the primary is used
+    replica_lag_check_seconds: float = 1.0  # How often each replica's lag is checked
+    replica_lag_check_timeout_seconds: float = 0.5  # Replica counts as down after this
+
+    # In-process API key cache used by authentication
+    auth_cache_enabled: bool = True
+    auth_cache_size: int = 10000  # API keys per process
+    auth_cache_ttl_seconds: int = 60
+
+    # In-process LRU of compiled templates, keyed by (template id, updated_at)
+    template_cache_size: int = 1000
+
+    # In-process cache of webhook key -> trigger, template and client
+    webhook_cache_enabled: bool = True
+    webhook_cache_size: int = 10000  # Webhook keys per process
+    webhook_cache_ttl_seconds: int = 60
+
     class Config:
         env_file = ".env"
         case_sensitive = False
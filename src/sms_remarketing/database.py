@@ -1,14 +1,294 @@
-from sqlalchemy import create_engine
+from redis import Redis
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+import socket
+import time
 from .config import settings
+from .metrics import registry
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+logger = logging.getLogger(__name__)
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 10, 30)
+
+# Pool metrics of every process (workers serve no /metrics) go through Redis
+metrics_redis = Redis.from_url(settings.redis_url)
+
+pool_wait = registry.redis_histogram(
+    "sms_db_pool_wait_seconds",
+    "Time to check a connection out of the pool, including pre-ping",
+    metrics_redis,
+    labels=("role", "pool"),
+    buckets=POOL_WAIT_BUCKETS,
+    buffered=True,
+)
+pool_overflows = registry.redis_counter(
+    "sms_db_pool_overflow_total",
+    "Connections opened beyond pool_size",
+    metrics_redis,
+    labels=("role", "pool"),
+)
+pool_timeouts = registry.redis_counter(
+    "sms_db_pool_timeouts_total",
+    "Checkouts that gave up after pool_timeout",
+    metrics_redis,
+    labels=("role", "pool"),
+)
+# Set per process, dropped a while after it stops refreshing them
+POOL_GAUGE_LABELS = ("role", "process", "pool")
+POOL_GAUGE_TTL = settings.metrics_flush_interval_seconds * 3
+pool_checked_out = registry.redis_gauge(
+    "sms_db_pool_checked_out",
+    "Connections currently checked out",
+    metrics_redis,
+    labels=POOL_GAUGE_LABELS,
+    ttl_seconds=POOL_GAUGE_TTL,
+)
+pool_overflow = registry.redis_gauge(
+    "sms_db_pool_overflow",
+    "Connections open beyond pool_size",
+    metrics_redis,
+    labels=POOL_GAUGE_LABELS,
+    ttl_seconds=POOL_GAUGE_TTL,
+)
+pool_size = registry.redis_gauge(
+    "sms_db_pool_size",
+    "Configured pool size",
+    metrics_redis,
+    labels=POOL_GAUGE_LABELS,
+    ttl_seconds=POOL_GAUGE_TTL,
+)
+
+
+class _InstrumentedPool:
+    """Times checkouts and counts overflow connections and timeouts"""
+
+    def connect(self):
+        name = getattr(self, "logging_name", None) or "default"
+        overflow = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_timeouts.inc(role=settings.process_role, pool=name)
+            raise
+        finally:
+            pool_wait.observe(
+                time.perf_counter() - start, role=settings.process_role, pool=name
+            )
+        if self.overflow() > max(overflow, 0):
+            pool_overflows.inc(role=settings.process_role, pool=name)
+        return connection
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(role: str) -> Dict[str, Any]:
+    """create_engine pool arguments for a process role"""
+    options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    for name, value in settings.db_pool_roles.get(role, {}).items():
+        if name not in options:
+            raise ValueError(f"Unknown pool option {name!r} for role {role!r}")
+        options[name] = type(options[name])(value)
+    return options
+
+
+# Used by workers and scripts
+engine = create_engine(
+    settings.database_url,
+    poolclass=InstrumentedQueuePool,
+    pool_logging_name="sync",
+    **pool_options(settings.process_role),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def async_database_url(url: str) -> URL:
+    """The same database through the asyncpg driver"""
+    return make_url(url).set(drivername="postgresql+asyncpg")
+
+
+# Used by the API. Objects stay loaded after commit since lazy loads
+# can't run implicitly on an async session.
+async_engine = create_async_engine(
+    async_database_url(settings.database_url),
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_logging_name="async",
+    **pool_options(settings.process_role),
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Used by the API's read-only endpoints, see ReplicaRouter
+replica_engines = [
+    create_async_engine(
+        async_database_url(url),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_logging_name=f"replica{i}",
+        **pool_options(settings.process_role),
+    )
+    for i, url in enumerate(settings.database_replica_urls)
+]
+
+# Seconds the replica is behind the primary; 0 when it has replayed everything
+# it received (an idle primary sends nothing) or isn't a standby at all
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+
+class ReplicaRouter:
+    """
+    Picks where read-only sessions go: replicas in turn, skipping any whose
+    replay lag is over `replica_max_lag_seconds` or that can't be reached,
+    and the primary when no replica qualifies. Lag is refreshed by a
+    background task at most every `replica_lag_check_seconds` per replica;
+    requests only read the last value, so an unreachable replica can't
+    stall them.
+    """
+
+    def __init__(self, engines: List[AsyncEngine]):
+        self.replicas = [
+            (
+                f"replica{i}",
+                engine,
+                async_sessionmaker(
+                    engine,
+                    class_=AsyncSession,
+                    autoflush=False,
+                    expire_on_commit=False,
+                ),
+            )
+            for i, engine in enumerate(engines)
+        ]
+        self.lag: Dict[str, Optional[float]] = {}
+        self.checked_at: Dict[str, float] = {}
+        self._checks: Dict[str, asyncio.Task] = {}
+        self._next = 0
+        self.sessions = registry.counter(
+            "sms_db_read_sessions_total",
+            "Read-only sessions by the database serving them",
+            labels=("database",),
+        )
+
+    def replica_lag(self, name: str, engine: AsyncEngine) -> Optional[float]:
+        """
+        Last known replay lag of a replica, None if unknown or unreachable.
+        Starts a refresh in the background when the value is stale.
+        """
+        now = time.monotonic()
+        stale = now - self.checked_at.get(name, float("-inf")) >= (
+            settings.replica_lag_check_seconds
+        )
+        if stale and name not in self._checks:
+            self.checked_at[name] = now
+            self._checks[name] = asyncio.create_task(self._check_lag(name, engine))
+        return self.lag.get(name)
+
+    async def _check_lag(self, name: str, engine: AsyncEngine):
+        try:
+            self.lag[name] = float(
+                await asyncio.wait_for(
+                    self._query_lag(engine),
+                    settings.replica_lag_check_timeout_seconds,
+                )
+            )
+        except (exc.SQLAlchemyError, OSError, TimeoutError) as e:
+            logger.warning(f"Read replica {name} unavailable: {e!r}")
+            self.lag[name] = None
+        finally:
+            del self._checks[name]
+
+    @staticmethod
+    async def _query_lag(engine: AsyncEngine) -> float:
+        async with engine.connect() as conn:
+            return await conn.scalar(REPLICA_LAG_QUERY)
+
+    async def sessionmaker(self) -> async_sessionmaker:
+        """Session factory for the next caught-up replica, or the primary"""
+        for _ in range(len(self.replicas)):
+            name, engine, maker = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            lag = self.replica_lag(name, engine)
+            if lag is not None and lag <= settings.replica_max_lag_seconds:
+                self.sessions.inc(database=name)
+                return maker
+        self.sessions.inc(database="primary")
+        return AsyncSessionLocal
+
+    def collect_metrics(self):
+        """Render replay lag and reachability of each replica"""
+        lag = [
+            "# HELP sms_db_replica_lag_seconds Last measured replay lag",
+            "# TYPE sms_db_replica_lag_seconds gauge",
+        ]
+        up = [
+            "# HELP sms_db_replica_up Whether the replica answered its last lag check",
+            "# TYPE sms_db_replica_up gauge",
+        ]
+        for name, _, _ in self.replicas:
+            value = self.lag.get(name)
+            up.append(f'sms_db_replica_up{{replica="{name}"}} {int(value is not None)}')
+            if value is not None:
+                lag.append(f'sms_db_replica_lag_seconds{{replica="{name}"}} {value}')
+        return lag + up
+
+
+read_router = ReplicaRouter(replica_engines)
+registry.register_collector(read_router.collect_metrics)
+
 Base = declarative_base()
 
 
+def sample_pool_metrics():
+    """Set connections in use and pool sizes of this process's engines"""
+    process = f"{socket.gethostname()}:{os.getpid()}"
+    pools = [("sync", engine.pool), ("async", async_engine.pool)] + [
+        (f"replica{i}", replica.pool) for i, replica in enumerate(replica_engines)
+    ]
+    for name, pool in pools:
+        labels = {"role": settings.process_role, "process": process, "pool": name}
+        pool_checked_out.set(pool.checkedout(), **labels)
+        pool_overflow.set(max(pool.overflow(), 0), **labels)
+        pool_size.set(pool.size(), **labels)
+
+
+registry.register_sampler(sample_pool_metrics)
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -16,3 +296,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """
+    Dependency for getting an async session for read-only endpoints.
+    Served by a read replica when one is configured and caught up.
+    """
+    async with (await read_router.sessionmaker())() as db:
+        yield db
@@ -1,12 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from .api import api_router
 from .config import settings
+from .metrics import registry
+from .middleware import IdempotencyMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pool metrics of every API process reach /metrics through Redis
+    registry.start_flushing(settings.metrics_flush_interval_seconds)
+    yield
+
 
 app = FastAPI(
     title="SMS Remarketing Service",
     description="A microservice for SMS remarketing with credit-based billing and automation",
     version="1.0.0",
+    lifespan=lifespan,
+)
+
+# Replay retried sends carrying an Idempotency-Key header (inside CORS)
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[
+        r"/api/v1/messages/send",
+        r"/api/v1/webhooks/trigger/[^/]+",
+    ],
 )
 
 # CORS middleware
@@ -38,6 +60,12 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics endpoint"""
+    return registry.render()
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,485 @@
+"""
+Minimal Prometheus-style metrics.
+Metrics live in the process that records them and are rendered in the
+Prometheus text format by the API's /metrics endpoint. State shared by
+several processes (rate limiters, queues) is read through collectors.
+Worker processes serve no endpoint and report through Redis-backed
+metrics instead; most are buffered in-process and flushed periodically
+(`MetricsRegistry.start_flushing`).
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in list(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, labels: Iterable[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in list(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0) + value
+
+    def samples(self) -> List[str]:
+        return histogram_samples(
+            self.name,
+            self.label_names,
+            self.buckets,
+            {
+                key: (list(counts), self._sums[key])
+                for key, counts in list(self._counts.items())
+            },
+        )
+
+
+def histogram_samples(
+    name: str,
+    label_names: Tuple[str, ...],
+    buckets: Tuple[float, ...],
+    series: Dict[LabelValues, Tuple[List[int], float]],
+) -> List[str]:
+    """Render per-bucket (non-cumulative) counts as Prometheus histogram samples"""
+    lines = []
+    for key, (counts, total) in series.items():
+        cumulative = 0
+        for bound, count in zip((*buckets, "+Inf"), counts):
+            cumulative += count
+            labels = _format_labels((*label_names, "le"), (*key, bound))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(label_names, key)
+        lines.append(f"{name}_count{labels} {cumulative}")
+        lines.append(f"{name}_sum{labels} {total}")
+    return lines
+
+
+class _RedisMetric(_Metric):
+    """Metric kept in a Redis hash, with what this process hasn't flushed yet"""
+
+    def __init__(
+        self, name: str, description: str, redis_conn, labels: Iterable[str] = ()
+    ):
+        super().__init__(name, description, labels)
+        self.redis_conn = redis_conn
+        self.key = f"metrics:{name}"
+        self._pending: Dict[str, float] = {}
+        self._pending_pid = os.getpid()
+
+    def _add(self, field: str, amount: float):
+        with self._lock:
+            # A forked child starts empty, its parent flushes its own
+            if self._pending_pid != os.getpid():
+                self._pending, self._pending_pid = {}, os.getpid()
+            self._pending[field] = self._pending.get(field, 0) + amount
+
+    def _take(self) -> Dict[str, float]:
+        with self._lock:
+            if self._pending_pid != os.getpid():
+                self._pending, self._pending_pid = {}, os.getpid()
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def flush(self):
+        """Write what this process recorded since the last flush"""
+
+    def _fields(self) -> Dict[str, bytes]:
+        try:
+            fields = self.redis_conn.hgetall(self.key)
+        except Exception as e:
+            logger.warning(f"Could not read {self.name}: {e}")
+            return {}
+        return {
+            field.decode() if isinstance(field, bytes) else field: value
+            for field, value in fields.items()
+        }
+
+
+class RedisCounter(_RedisMetric):
+    """
+    Counter summed over processes in a Redis hash, so counts made by worker
+    processes are visible to the API's /metrics endpoint. Increments are
+    kept in-process until the registry flushes them.
+    """
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        self._add(json.dumps(self._key(labels)), amount)
+
+    def flush(self):
+        pending = self._take()
+        if not pending:
+            return
+        try:
+            with self.redis_conn.pipeline(transaction=False) as pipe:
+                for field, amount in pending.items():
+                    pipe.hincrbyfloat(self.key, field, amount)
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not record {self.name}: {e}")
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, json.loads(field))} "
+            f"{float(value)}"
+            for field, value in self._fields().items()
+        ]
+
+
+class RedisHistogram(_RedisMetric):
+    """
+    Histogram whose buckets live in a Redis hash, so observations made by
+    worker processes are visible to the API's /metrics endpoint. Buffered
+    histograms keep observations in-process until the registry flushes
+    them, for values recorded too often to write each one.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        redis_conn,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+        buffered: bool = False,
+    ):
+        super().__init__(name, description, redis_conn, labels)
+        self.buckets = tuple(sorted(buckets))
+        self.buffered = buffered
+
+    def observe(self, value: float, **labels):
+        series = json.dumps(self._key(labels))
+        index = next(
+            (i for i, bound in enumerate(self.buckets) if value <= bound),
+            len(self.buckets),
+        )
+        if self.buffered:
+            self._add(f"{series}|{index}", 1)
+            self._add(f"{series}|sum", value)
+        else:
+            self._write({f"{series}|{index}": 1, f"{series}|sum": value})
+
+    def flush(self):
+        pending = self._take()
+        if pending:
+            self._write(pending)
+
+    def _write(self, fields: Dict[str, float]):
+        try:
+            with self.redis_conn.pipeline(transaction=False) as pipe:
+                for field, amount in fields.items():
+                    if field.endswith("|sum"):
+                        pipe.hincrbyfloat(self.key, field, amount)
+                    else:
+                        pipe.hincrby(self.key, field, int(amount))
+                pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not record {self.name}: {e}")
+
+    def samples(self) -> List[str]:
+        series: Dict[LabelValues, Tuple[List[int], float]] = {}
+        for field, value in self._fields().items():
+            labels, _, slot = field.rpartition("|")
+            key = tuple(json.loads(labels))
+            counts, total = series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            if slot == "sum":
+                total = float(value)
+            else:
+                counts[int(slot)] = int(value)
+            series[key] = (counts, total)
+        return histogram_samples(self.name, self.label_names, self.buckets, series)
+
+
+class RedisGauge(_RedisMetric):
+    """
+    Gauge each process sets and publishes to a Redis hash, so values of
+    worker processes are visible to the API's /metrics endpoint. Label it
+    by process: series not refreshed for `ttl_seconds` (their process
+    exited) are dropped.
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        redis_conn,
+        labels: Iterable[str] = (),
+        ttl_seconds: float = 60,
+    ):
+        super().__init__(name, description, redis_conn, labels)
+        self.ttl_seconds = ttl_seconds
+        self._values: Dict[str, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[json.dumps(self._key(labels))] = value
+
+    def flush(self):
+        with self._lock:
+            values = dict(self._values)
+        if not values:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        try:
+            self.redis_conn.hset(
+                self.key,
+                mapping={
+                    field: json.dumps([value, expires_at])
+                    for field, value in values.items()
+                },
+            )
+        except Exception as e:
+            logger.warning(f"Could not record {self.name}: {e}")
+
+    def samples(self) -> List[str]:
+        now = time.time()
+        lines, expired = [], []
+        for field, entry in self._fields().items():
+            value, expires_at = json.loads(entry)
+            if expires_at < now:
+                expired.append(field)
+                continue
+            labels = _format_labels(self.label_names, json.loads(field))
+            lines.append(f"{self.name}{labels} {value}")
+        if expired:
+            try:
+                self.redis_conn.hdel(self.key, *expired)
+            except Exception as e:
+                logger.warning(f"Could not expire {self.name}: {e}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and collectors for rendering"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+        self._samplers: List[Callable[[], None]] = []
+        self._flusher_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def redis_histogram(
+        self,
+        name: str,
+        description: str,
+        redis_conn,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+        buffered: bool = False,
+    ) -> RedisHistogram:
+        return self._register(
+            RedisHistogram(name, description, redis_conn, labels, buckets, buffered)
+        )
+
+    def redis_counter(
+        self, name: str, description: str, redis_conn, labels: Iterable[str] = ()
+    ) -> RedisCounter:
+        return self._register(RedisCounter(name, description, redis_conn, labels))
+
+    def redis_gauge(
+        self,
+        name: str,
+        description: str,
+        redis_conn,
+        labels: Iterable[str] = (),
+        ttl_seconds: float = 60,
+    ) -> RedisGauge:
+        return self._register(
+            RedisGauge(name, description, redis_conn, labels, ttl_seconds)
+        )
+
+    def register_collector(self, collector: Callable[[], Iterable[str]]):
+        """Register a callable returning already formatted metric lines"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def register_sampler(self, sampler: Callable[[], None]):
+        """Register a callable setting Redis-backed gauges before each flush"""
+        with self._lock:
+            self._samplers.append(sampler)
+
+    def flush(self, sample: bool = True):
+        """
+        Write what Redis-backed metrics recorded in this process to Redis,
+        after running the samplers unless `sample` is False
+        """
+        if sample:
+            for sampler in list(self._samplers):
+                sampler()
+        for metric in list(self._metrics.values()):
+            if isinstance(metric, _RedisMetric):
+                metric.flush()
+
+    def start_flushing(self, interval: float):
+        """
+        Flush every `interval` seconds from a background thread, once per
+        process. Forked children don't inherit the thread; ones that record
+        metrics call `flush(sample=False)` before exiting instead.
+        """
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(
+            target=self._flush_every,
+            args=(interval,),
+            name="metrics-flush",
+            daemon=True,
+        ).start()
+
+    def _flush_every(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"Could not flush metrics: {e}")
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        for collector in list(self._collectors):
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+registry = MetricsRegistry()
@@ -1,3 +1,4 @@
 from .auth import get_current_client
+from .idempotency import IdempotencyMiddleware
 
-__all__ = ["get_current_client"]
+__all__ = ["get_current_client", "IdempotencyMiddleware"]
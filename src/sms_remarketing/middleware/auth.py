@@ -1,20 +1,23 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader
-from sqlalchemy.orm import Session
-from ..database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
 from ..models import Client
 from ..config import settings
+from ..services.auth_cache import auth_cache
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 admin_api_key_header = APIKeyHeader(name="X-Admin-API-Key", auto_error=False)
 
 
 async def get_current_client(
-    api_key: str = Depends(api_key_header), db: Session = Depends(get_db)
+    api_key: str = Depends(api_key_header), db: AsyncSession = Depends(get_async_db)
 ) -> Client:
     """
     Authenticate client using API key from X-API-Key header.
     Returns the authenticated client or raises 401 error.
+    Cached clients are attached to the session without a query.
     """
     if not api_key:
         raise HTTPException(
@@ -22,7 +25,13 @@ async def get_current_client(
             detail="API key is missing. Provide it in X-API-Key header.",
         )
 
-    client = db.query(Client).filter(Client.api_key == api_key).first()
+    client = auth_cache.get(api_key)
+    if client is not None:
+        client = await db.merge(client, load=False)
+    else:
+        client = await db.scalar(select(Client).where(Client.api_key == api_key))
+        if client:
+            auth_cache.put(client)
 
     if not client:
         raise HTTPException(
@@ -0,0 +1,106 @@
+from fastapi import status
+from fastapi.responses import JSONResponse, Response
+from redis.exceptions import RedisError
+from starlette.middleware.base import BaseHTTPMiddleware
+from typing import Sequence
+import hashlib
+import logging
+import re
+from ..services.idempotency_service import idempotency_service, MAX_KEY_LENGTH
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    Replay cached responses for POST requests retried with the same
+    Idempotency-Key header, without running the endpoint.
+    Keys are scoped to the request path and API key. Only successful
+    responses are cached, so failed requests can be retried.
+    """
+
+    def __init__(self, app, paths: Sequence[str]):
+        super().__init__(app)
+        self.paths = [re.compile(path) for path in paths]
+
+    async def dispatch(self, request, call_next):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if (
+            request.method != "POST"
+            or not key
+            or not any(path.fullmatch(request.url.path) for path in self.paths)
+        ):
+            return await call_next(request)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={
+                    "detail": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"
+                },
+            )
+
+        body = await request.body()
+        fingerprint = hashlib.sha256(body).hexdigest()
+        scope = f"{request.url.path}:{request.headers.get('X-API-Key', '')}"
+        cache_key = idempotency_service.cache_key(scope, key)
+
+        try:
+            cached = await idempotency_service.get_response(cache_key)
+            if cached:
+                if cached["fingerprint"] != fingerprint:
+                    # 422 Unprocessable Content
+                    return JSONResponse(
+                        status_code=422,
+                        content={
+                            "detail": f"{IDEMPOTENCY_HEADER} was already used with a different request body"
+                        },
+                    )
+                return Response(
+                    content=cached["body"],
+                    status_code=cached["status_code"],
+                    media_type=cached["media_type"],
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+            if not await idempotency_service.lock(cache_key):
+                return JSONResponse(
+                    status_code=status.HTTP_409_CONFLICT,
+                    content={
+                        "detail": f"A request with this {IDEMPOTENCY_HEADER} is in progress"
+                    },
+                )
+        except RedisError as e:
+            # The unique key in Postgres still prevents duplicates
+            logger.warning(f"Idempotency cache unavailable: {e}")
+            return await call_next(request)
+
+        try:
+            response = await call_next(request)
+            if not 200 <= response.status_code < 300:
+                return response
+
+            content = b"".join([chunk async for chunk in response.body_iterator])
+            try:
+                await idempotency_service.save_response(
+                    cache_key,
+                    fingerprint,
+                    response.status_code,
+                    content,
+                    response.media_type,
+                )
+            except RedisError as e:
+                logger.warning(f"Could not cache idempotent response: {e}")
+            return Response(
+                content=content,
+                status_code=response.status_code,
+                headers=dict(response.headers),
+                media_type=response.media_type,
+            )
+        finally:
+            try:
+                await idempotency_service.unlock(cache_key)
+            except RedisError:
+                pass
@@ -3,5 +3,20 @@ from .lead import Lead
 from .template import Template
 from .message import Message
 from .trigger import Trigger
+from .batch import MessageBatch
+from .outbox import OutboxEntry
+from .idempotency import IdempotencyKey
+from .credit import CreditLedgerEntry, CreditSnapshot
 
-__all__ = ["Client", "Lead", "Template", "Message", "Trigger"]
+__all__ = [
+    "Client",
+    "Lead",
+    "Template",
+    "Message",
+    "Trigger",
+    "MessageBatch",
+    "OutboxEntry",
+    "IdempotencyKey",
+    "CreditLedgerEntry",
+    "CreditSnapshot",
+]
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class MessageBatch(Base):
+    __tablename__ = "message_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
+    template_id = Column(Integer, ForeignKey("templates.id"), nullable=True)
+
+    # Number of messages created for this batch (credits reserved up front)
+    total_messages = Column(Integer, default=0, nullable=False)
+    # SMS segments of those messages, what the carrier bills for
+    total_segments = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    client = relationship("Client", back_populates="batches")
+    template = relationship("Template")
+    messages = relationship("Message", back_populates="batch")
@@ -1,22 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func
 import secrets
 from ..database import Base
+from .credit import credit_balance
 
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (Index("ix_clients_created_at_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False, index=True)
     api_key = Column(String, unique=True, nullable=False, index=True)
-    credits = Column(Integer, default=0, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Share of bulk send capacity relative to other clients
+    queue_weight = Column(Integer, default=1, server_default="1", nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Read-only balance from the credit ledger; change it through CreditService
+    credits = column_property(credit_balance(id), deferred=True)
+
     # Relationships
     leads = relationship("Lead", back_populates="client", cascade="all, delete-orphan")
     templates = relationship(
@@ -28,6 +36,9 @@ class Client(Base):
     triggers = relationship(
         "Trigger", back_populates="client", cascade="all, delete-orphan"
     )
+    batches = relationship(
+        "MessageBatch", back_populates="client", cascade="all, delete-orphan"
+    )
 
     @staticmethod
     def generate_api_key():
@@ -35,12 +46,5 @@ class Client(Base):
         return f"sk_{secrets.token_urlsafe(32)}"
 
     def has_credits(self, count: int = 1) -> bool:
-        """Check if client has enough credits"""
+        """Check if client has enough credits (as of when they were loaded)"""
         return self.credits >= count
-
-    def deduct_credits(self, count: int = 1) -> bool:
-        """Deduct credits from client account. Returns True if successful."""
-        if self.has_credits(count):
-            self.credits -= count
-            return True
-        return False
@@ -0,0 +1,84 @@
+from sqlalchemy import (
+    Column,
+    BigInteger,
+    Integer,
+    DateTime,
+    ForeignKey,
+    Enum,
+    Index,
+    select,
+    func,
+)
+import enum
+from ..database import Base
+
+
+class CreditEntryKind(str, enum.Enum):
+    GRANT = "grant"  # Credits bought or added
+    RESERVATION = "reservation"  # Credits taken for sends
+    REFUND = "refund"  # Reserved credits returned unused
+
+
+class CreditLedgerEntry(Base):
+    """
+    Append-only record of every credit balance change.
+    Rows are never updated; a balance is the latest snapshot plus the
+    amounts of all entries after it.
+    """
+
+    __tablename__ = "credit_ledger"
+    __table_args__ = (Index("ix_credit_ledger_client_id_id", "client_id", "id"),)
+
+    id = Column(BigInteger, primary_key=True)
+    client_id = Column(
+        Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False
+    )
+    kind = Column(Enum(CreditEntryKind), nullable=False)
+    amount = Column(Integer, nullable=False)  # Signed change to the balance
+
+    # What the credits were used for, if known
+    batch_id = Column(Integer, nullable=True)
+    message_id = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CreditSnapshot(Base):
+    """Client balance as of a ledger entry, maintained by the rollup job"""
+
+    __tablename__ = "credit_snapshots"
+
+    client_id = Column(
+        Integer, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True
+    )
+    balance = Column(Integer, nullable=False)
+    last_entry_id = Column(BigInteger, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+def credit_balance(client_id):
+    """SQL expression for a client's balance: snapshot plus later ledger entries"""
+    snapshot = (
+        select(CreditSnapshot)
+        .where(CreditSnapshot.client_id == client_id)
+        .correlate_except(CreditSnapshot)
+    )
+    last_entry_id = func.coalesce(
+        snapshot.with_only_columns(CreditSnapshot.last_entry_id).scalar_subquery(), 0
+    )
+    delta = (
+        select(func.coalesce(func.sum(CreditLedgerEntry.amount), 0))
+        .where(
+            CreditLedgerEntry.client_id == client_id,
+            CreditLedgerEntry.id > last_entry_id,
+        )
+        .correlate_except(CreditLedgerEntry)
+        .scalar_subquery()
+    )
+    return (
+        func.coalesce(
+            snapshot.with_only_columns(CreditSnapshot.balance).scalar_subquery(), 0
+        )
+        + delta
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Idempotency-Key sent with a request that created a message.
+    The unique constraint stops retries from creating a second message when
+    the Redis response cache misses (expired, or concurrent retries).
+    """
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("client_id", "key", name="uq_idempotency_keys_client_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    client_id = Column(
+        Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False
+    )
+    key = Column(String(255), nullable=False)
+    message_id = Column(Integer, nullable=False)
+    # Partition key of the message, so lookups skip the other months
+    message_created_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
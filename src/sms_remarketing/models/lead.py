@@ -1,20 +1,39 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from typing import Any, Dict, List, Optional, Sequence
 from ..database import Base
+from ..phone import normalize_phone
+from ..templating import MISSING
 
 
 class Lead(Base):
     __tablename__ = "leads"
+    __table_args__ = (
+        Index("ix_leads_client_id_created_at_id", "client_id", "created_at", "id"),
+        # One lead per number per client; creates and imports upsert on it
+        Index(
+            "ix_leads_client_id_phone_normalized",
+            "client_id",
+            "phone_normalized",
+            unique=True,
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
+    # client_id lookups use the composite index
+    id = Column(Integer, primary_key=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
     phone_number = Column(String, nullable=False)
+    # E.164 form of phone_number, kept in sync on assignment. NULL only for
+    # numbers stored before normalization that couldn't be parsed.
+    phone_normalized = Column(String, nullable=True)
     first_name = Column(String)
     last_name = Column(String)
     email = Column(String)
     custom_fields = Column(JSON, default={})
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
@@ -23,8 +42,59 @@ class Lead(Base):
         "Message", back_populates="lead", cascade="all, delete-orphan"
     )
 
+    @validates("phone_number")
+    def _normalize_phone_number(self, key, value):
+        self.phone_normalized = normalize_phone(value)
+        return value
+
     @property
     def full_name(self) -> str:
         """Get full name of lead"""
         parts = [self.first_name, self.last_name]
         return " ".join(filter(None, parts)) or "Unknown"
+
+    def template_variables(self, defaults: Optional[Dict[str, Any]] = None) -> dict:
+        """
+        Get the variables available to templates rendered for this lead.
+        `defaults` are added to the lead's fields; its custom fields win over them.
+        """
+        variables = {
+            "first_name": self.first_name or "",
+            "last_name": self.last_name or "",
+            "full_name": self.full_name,
+            "phone_number": self.phone_number,
+            "email": self.email or "",
+            **(defaults or {}),
+        }
+        if self.custom_fields:
+            variables.update(self.custom_fields)
+        return variables
+
+    @staticmethod
+    def template_columns(
+        leads: Sequence["Lead"], defaults: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[Any]]:
+        """
+        Get `template_variables` of many leads as one list per variable, for
+        `CompiledTemplate.render_batch`. Leads without a custom field another
+        lead has get MISSING in its column. `defaults` apply to every lead
+        like its own fields, with its custom fields taking precedence.
+        """
+        columns: Dict[str, List[Any]] = {
+            "first_name": [lead.first_name or "" for lead in leads],
+            "last_name": [lead.last_name or "" for lead in leads],
+            "full_name": [lead.full_name for lead in leads],
+            "phone_number": [lead.phone_number for lead in leads],
+            "email": [lead.email or "" for lead in leads],
+        }
+        for name, value in (defaults or {}).items():
+            columns[name] = [value] * len(leads)
+        for row, lead in enumerate(leads):
+            if not lead.custom_fields:
+                continue
+            for name, value in lead.custom_fields.items():
+                column = columns.get(name)
+                if column is None:
+                    column = columns[name] = [MISSING] * len(leads)
+                column[row] = value
+        return columns
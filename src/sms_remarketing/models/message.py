@@ -1,4 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    DateTime,
+    ForeignKey,
+    Enum,
+    Index,
+    text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -8,33 +18,65 @@ from ..database import Base
 class MessageStatus(str, enum.Enum):
     PENDING = "pending"
     QUEUED = "queued"
+    SENDING = "sending"  # Claimed by a send job, provider result not stored yet
     SENT = "sent"
     DELIVERED = "delivered"
     FAILED = "failed"
 
 
+class MessageOrigin(str, enum.Enum):
+    API = "api"  # Sent through POST /messages/send
+    WEBHOOK = "webhook"  # Sent by a webhook trigger
+    NEW_LEAD = "new_lead"  # Sent by a NEW_LEAD trigger
+    LEAD_AGE = "lead_age"  # Sent by a LEAD_AGE trigger
+    CAMPAIGN = "campaign"  # Sent through POST /messages/send-batch
+    IMPORT = "import"  # Sent by NEW_LEAD triggers run for POST /leads/import
+
+
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_client_id_created_at_id", "client_id", "created_at", "id"),
+        # Only messages not yet handed to the provider; delivered ones dominate
+        # the table and are never looked up by status
+        Index(
+            "ix_messages_pending_created_at",
+            "created_at",
+            postgresql_where=text("status IN ('PENDING', 'QUEUED')"),
+        ),
+        # Monthly partitions, maintained by services/partition_service.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
+    # The primary key is (id, created_at): unique constraints on a partitioned
+    # table must include the partition key. ids still come from one sequence.
+    # Updates by primary key thereby only touch the message's partition.
+    # client_id lookups use the composite index
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False, index=True)
     template_id = Column(Integer, ForeignKey("templates.id"), nullable=True)
+    batch_id = Column(
+        Integer, ForeignKey("message_batches.id"), nullable=True, index=True
+    )
 
     to_number = Column(String, nullable=False)
     content = Column(Text, nullable=False)
-    status = Column(
-        Enum(MessageStatus), default=MessageStatus.PENDING, nullable=False, index=True
-    )
+    status = Column(Enum(MessageStatus), default=MessageStatus.PENDING, nullable=False)
+    origin = Column(Enum(MessageOrigin), default=MessageOrigin.API, nullable=True)
 
-    # Twilio specific
-    twilio_sid = Column(String, unique=True, nullable=True)
+    # Twilio specific. Not unique across partitions; Twilio never reuses SIDs.
+    twilio_sid = Column(String, nullable=True, index=True)
     error_message = Column(Text, nullable=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), primary_key=True, server_default=func.now()
+    )
+    send_at = Column(DateTime(timezone=True), nullable=True)  # Scheduled send time
     sent_at = Column(DateTime(timezone=True), nullable=True)
     delivered_at = Column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     client = relationship("Client", back_populates="messages")
     lead = relationship("Lead", back_populates="messages")
+    batch = relationship("MessageBatch", back_populates="messages")
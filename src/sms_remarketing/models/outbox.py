@@ -0,0 +1,25 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, Enum
+from sqlalchemy.sql import func
+from ..database import Base
+from .message import MessageOrigin
+
+
+class OutboxEntry(Base):
+    """
+    Message waiting to be handed to the job queue.
+    Written in the same transaction as the message, then enqueued (or
+    scheduled, if `send_at` is in the future) and deleted by the outbox
+    relay (workers/outbox_relay.py).
+    """
+
+    __tablename__ = "sms_outbox"
+
+    id = Column(BigInteger, primary_key=True)
+    message_id = Column(Integer, nullable=False)
+    # Partition key of the message, so lookups skip the other months
+    message_created_at = Column(DateTime(timezone=True), nullable=True)
+    client_id = Column(Integer, nullable=False)
+    origin = Column(Enum(MessageOrigin), nullable=False)
+    send_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
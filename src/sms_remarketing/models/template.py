@@ -1,36 +1,50 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Index,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-import re
 from ..database import Base
+from ..templating import CompiledTemplate, template_cache
 
 
 class Template(Base):
     __tablename__ = "templates"
+    __table_args__ = (
+        Index("ix_templates_client_id_created_at_id", "client_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     client = relationship("Client", back_populates="templates")
 
+    def compiled(self) -> CompiledTemplate:
+        """Get the compiled form of the content, cached per (id, updated_at)"""
+        return template_cache.get(self.id, self.updated_at, self.content)
+
     def render(self, **variables) -> str:
         """
         Render template with variables.
         Variables in template should be in format: {{variable_name}}
+        Placeholders without a matching variable are left as they are.
         """
-        content = self.content
-        for key, value in variables.items():
-            placeholder = f"{{{{{key}}}}}"
-            content = content.replace(placeholder, str(value))
-        return content
+        return self.compiled().render(variables)
 
     def get_variables(self) -> list[str]:
         """Extract variable names from template"""
-        pattern = r"\{\{(\w+)\}\}"
-        return re.findall(pattern, self.content)
+        return self.compiled().variables
@@ -7,6 +7,8 @@ from sqlalchemy import (
     Boolean,
     Enum,
     JSON,
+    Index,
+    text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -22,6 +24,16 @@ class TriggerType(str, enum.Enum):
 
 class Trigger(Base):
     __tablename__ = "triggers"
+    __table_args__ = (
+        Index("ix_triggers_client_id_created_at_id", "client_id", "created_at", "id"),
+        # Active triggers of a type for a client (NEW_LEAD processing)
+        Index(
+            "ix_triggers_active_client_id_trigger_type",
+            "client_id",
+            "trigger_type",
+            postgresql_where=text("is_active"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
@@ -37,9 +49,22 @@ class Trigger(Base):
     # For WEBHOOK: {"webhook_key": "unique_key"}
     # For NEW_LEAD: {} (no config needed)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # config["webhook_key"] of WEBHOOK triggers, indexed for inbound webhooks.
+    # Kept in sync by sync_webhook_key().
+    webhook_key = Column(String, unique=True, nullable=True, index=True)
+
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     client = relationship("Client", back_populates="triggers")
     template = relationship("Template")
+
+    def sync_webhook_key(self):
+        """Copy the webhook key from config into the indexed column"""
+        if self.trigger_type == TriggerType.WEBHOOK and self.config:
+            self.webhook_key = self.config.get("webhook_key")
+        else:
+            self.webhook_key = None
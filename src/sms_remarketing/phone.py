@@ -0,0 +1,26 @@
+"""
+Phone number normalization.
+Leads are deduplicated on the E.164 form of their number, so "+1 (415)
+555-0100", "415-555-0100" and "+14155550100" are the same lead. Numbers
+without a country code are read as being in DEFAULT_PHONE_REGION.
+"""
+from typing import Optional
+import phonenumbers
+from .config import settings
+
+
+def normalize_phone(value: str, region: Optional[str] = None) -> str:
+    """
+    E.164 form of a phone number.
+
+    Raises:
+        ValueError: If the value can't be parsed or has an impossible length
+    """
+    try:
+        number = phonenumbers.parse(value, region or settings.default_phone_region)
+    except phonenumbers.NumberParseException as e:
+        raise ValueError(f"Invalid phone number: {e}")
+    # Possible rather than valid: numbering plan data lags new ranges
+    if not phonenumbers.is_possible_number(number):
+        raise ValueError("Invalid phone number: impossible length for its region")
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
@@ -1,7 +1,13 @@
 from .client import ClientCreate, ClientResponse, ClientUpdate
-from .lead import LeadCreate, LeadResponse, LeadUpdate
+from .lead import LeadCreate, LeadResponse, LeadUpdate, LeadImportResponse
 from .template import TemplateCreate, TemplateResponse, TemplateUpdate
-from .message import MessageResponse, SendSMSRequest
+from .message import (
+    MessageResponse,
+    SendSMSRequest,
+    SendBatchRequest,
+    LeadFilter,
+    MessageBatchResponse,
+)
 from .trigger import TriggerCreate, TriggerResponse, TriggerUpdate
 
 __all__ = [
@@ -11,11 +17,15 @@ __all__ = [
     "LeadCreate",
     "LeadResponse",
     "LeadUpdate",
+    "LeadImportResponse",
     "TemplateCreate",
     "TemplateResponse",
     "TemplateUpdate",
     "MessageResponse",
     "SendSMSRequest",
+    "SendBatchRequest",
+    "LeadFilter",
+    "MessageBatchResponse",
     "TriggerCreate",
     "TriggerResponse",
     "TriggerUpdate",
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
 from typing import Optional
 
@@ -10,12 +10,14 @@ class ClientBase(BaseModel):
 
 class ClientCreate(ClientBase):
     initial_credits: int = 0
+    queue_weight: int = Field(default=1, ge=1)
 
 
 class ClientUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
     is_active: Optional[bool] = None
+    queue_weight: Optional[int] = Field(default=None, ge=1)
 
 
 class ClientResponse(ClientBase):
@@ -23,6 +25,7 @@ class ClientResponse(ClientBase):
     api_key: str
     credits: int
     is_active: bool
+    queue_weight: int
     created_at: datetime
     updated_at: Optional[datetime] = None
 
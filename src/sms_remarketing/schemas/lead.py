@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, field_validator
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from ..phone import normalize_phone
 
 
 class LeadBase(BaseModel):
@@ -12,7 +13,10 @@ class LeadBase(BaseModel):
 
 
 class LeadCreate(LeadBase):
-    pass
+    @field_validator("phone_number")
+    @classmethod
+    def normalize_phone_number(cls, value: str) -> str:
+        return normalize_phone(value)
 
 
 class LeadUpdate(BaseModel):
@@ -22,6 +26,11 @@ class LeadUpdate(BaseModel):
     email: Optional[EmailStr] = None
     custom_fields: Optional[Dict[str, Any]] = None
 
+    @field_validator("phone_number")
+    @classmethod
+    def normalize_phone_number(cls, value: Optional[str]) -> Optional[str]:
+        return normalize_phone(value) if value is not None else value
+
 
 class LeadResponse(LeadBase):
     id: int
@@ -31,3 +40,15 @@ class LeadResponse(LeadBase):
 
     class Config:
         from_attributes = True
+
+
+class LeadImportResponse(BaseModel):
+    received: int
+    imported: int
+    updated: int
+    unchanged: int
+    duplicates: int
+    invalid: int
+    # The first rejected rows, as {"line": ..., "error": ...}
+    errors: List[Dict[str, Any]] = []
+    triggers_scheduled: bool = False
@@ -1,7 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, Dict, Any
-from ..models.message import MessageStatus
+from typing import Optional, Dict, Any, List
+from ..models.message import MessageStatus, MessageOrigin
 
 
 class SendSMSRequest(BaseModel):
@@ -9,6 +9,35 @@ class SendSMSRequest(BaseModel):
     template_id: Optional[int] = None
     content: Optional[str] = None
     variables: Optional[Dict[str, Any]] = {}
+    send_at: Optional[datetime] = None  # Naive times are UTC
+
+
+class LeadFilter(BaseModel):
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+
+class SendBatchRequest(BaseModel):
+    template_id: int
+    lead_ids: Optional[List[int]] = None
+    lead_filter: Optional[LeadFilter] = None
+    variables: Optional[Dict[str, Any]] = {}
+    send_at: Optional[datetime] = None  # Naive times are UTC
+    # Spread sends evenly over this many seconds from send_at (or now)
+    spread_seconds: Optional[int] = Field(None, ge=1)
+
+
+class MessageBatchResponse(BaseModel):
+    id: int
+    client_id: int
+    template_id: Optional[int] = None
+    total_messages: int
+    total_segments: int = 0
+    status_counts: Dict[MessageStatus, int] = {}
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
 
 
 class MessageResponse(BaseModel):
@@ -16,12 +45,15 @@ class MessageResponse(BaseModel):
     client_id: int
     lead_id: int
     template_id: Optional[int] = None
+    batch_id: Optional[int] = None
     to_number: str
     content: str
     status: MessageStatus
+    origin: Optional[MessageOrigin] = None
     twilio_sid: Optional[str] = None
     error_message: Optional[str] = None
     created_at: datetime
+    send_at: Optional[datetime] = None
     sent_at: Optional[datetime] = None
     delivered_at: Optional[datetime] = None
 
@@ -1,5 +1,46 @@
-from .twilio_service import TwilioService, twilio_service
+from .sms_provider import SMSProvider, get_sms_provider
+from .twilio_service import TwilioService
 from .sms_service import SMSService, sms_service
 from .queue_service import QueueService, queue_service
+from .rate_limiter import RateLimiter, rate_limiter
+from .idempotency_service import IdempotencyService, idempotency_service
+from .credit_service import CreditService, credit_service, InsufficientCredits
+from .credit_cache import CreditCache, credit_cache
+from .auth_cache import AuthCache, auth_cache
+from .webhook_cache import WebhookCache, webhook_cache
+from .partition_service import PartitionService, partition_service
+from .lead_import import (
+    LeadImportService,
+    lead_import_service,
+    LeadImportResult,
+    UnsupportedImportFormat,
+)
 
-__all__ = ["TwilioService", "twilio_service", "SMSService", "sms_service", "QueueService", "queue_service"]
+__all__ = [
+    "SMSProvider",
+    "get_sms_provider",
+    "TwilioService",
+    "SMSService",
+    "sms_service",
+    "QueueService",
+    "queue_service",
+    "RateLimiter",
+    "rate_limiter",
+    "IdempotencyService",
+    "idempotency_service",
+    "CreditService",
+    "credit_service",
+    "InsufficientCredits",
+    "CreditCache",
+    "credit_cache",
+    "AuthCache",
+    "auth_cache",
+    "WebhookCache",
+    "webhook_cache",
+    "PartitionService",
+    "partition_service",
+    "LeadImportService",
+    "lead_import_service",
+    "LeadImportResult",
+    "UnsupportedImportFormat",
+]
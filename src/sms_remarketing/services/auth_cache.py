@@ -0,0 +1,66 @@
+from sqlalchemy.orm import make_transient_to_detached
+from typing import Optional, Sequence
+from ..config import settings
+from ..metrics import registry
+from ..models import Client
+from .local_cache import LocalCache
+
+# Client columns kept in the cache; enough to rebuild a detached Client
+CACHED_FIELDS = (
+    "id",
+    "name",
+    "email",
+    "api_key",
+    "is_active",
+    "queue_weight",
+    "created_at",
+    "updated_at",
+)
+
+
+class AuthCache:
+    """
+    In-process cache of API key -> client row (see LocalCache).
+    Lets authentication skip the `clients` lookup on hits. Changes made
+    through the clients API invalidate the client in every process.
+    """
+
+    def __init__(self):
+        self._cache = LocalCache(
+            "auth",
+            settings.auth_cache_size,
+            settings.auth_cache_ttl_seconds,
+            enabled=settings.auth_cache_enabled,
+        )
+
+    def get(self, api_key: str) -> Optional[Client]:
+        """
+        Get the cached client for an API key.
+
+        Returns:
+            A detached Client (merge it into a session with load=False),
+            or None on a miss
+        """
+        values = self._cache.get(api_key)
+        if values is None:
+            return None
+        client = Client(**values)
+        make_transient_to_detached(client)
+        return client
+
+    def put(self, client: Client):
+        """Cache a client loaded from the database"""
+        values = {field: getattr(client, field) for field in CACHED_FIELDS}
+        self._cache.put(client.api_key, values, tags=[f"client:{client.id}"])
+
+    def invalidate(self, client_id: int):
+        """Drop a client from this process and tell the other processes to"""
+        self._cache.invalidate(f"client:{client_id}")
+
+    def collect_metrics(self) -> Sequence[str]:
+        return self._cache.collect_metrics()
+
+
+# Singleton instance
+auth_cache = AuthCache()
+registry.register_collector(auth_cache.collect_metrics)
@@ -0,0 +1,333 @@
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Sequence, Tuple, TypeVar
+import asyncio
+import logging
+from ..config import settings
+from ..database import SessionLocal
+from ..metrics import registry
+from .credit_service import credit_service, InsufficientCredits
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+KEY_PREFIX = "credits:"
+DIRTY_KEY = "credits:dirty"  # Clients with reservations not yet in the ledger
+STATS_KEY = "credits:stats"
+
+# Take credits if the cached balance covers them. The amount is also added
+# to the client's pending counter, which the reconciler writes to the ledger.
+# KEYS: balance, pending, dirty set  ARGV: count, client_id
+# Returns {1, balance} when reserved, {-1, balance} when short,
+# {0, 0} when the balance isn't cached yet.
+RESERVE_SCRIPT = """
+local balance = redis.call('GET', KEYS[1])
+if not balance then
+    return {0, 0}
+end
+balance = tonumber(balance)
+local count = tonumber(ARGV[1])
+if balance < count then
+    return {-1, balance}
+end
+redis.call('DECRBY', KEYS[1], count)
+redis.call('INCRBY', KEYS[2], count)
+redis.call('SADD', KEYS[3], ARGV[2])
+return {1, balance - count}
+"""
+
+# Give back reserved credits (pending may go negative, flushed as a refund)
+# KEYS: balance, pending, dirty set  ARGV: count, client_id
+REFUND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+redis.call('DECRBY', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[2])
+"""
+
+# Set the cached balance to the ledger balance minus unflushed reservations.
+# KEYS: balance, pending  ARGV: ledger balance, ttl, only_if_missing
+# Returns the cached balance and how far it was off (0 if it wasn't cached)
+SYNC_SCRIPT = """
+local pending = tonumber(redis.call('GET', KEYS[2]) or '0')
+local balance = tonumber(ARGV[1]) - pending
+local old = redis.call('GET', KEYS[1])
+if old and ARGV[3] == '1' then
+    return {tonumber(old), 0}
+end
+redis.call('SET', KEYS[1], balance, 'EX', ARGV[2])
+if old then
+    return {balance, tonumber(old) - balance}
+end
+return {balance, 0}
+"""
+
+# Move a client's pending reservations out for flushing
+# KEYS: pending, dirty set  ARGV: client_id
+TAKE_PENDING_SCRIPT = """
+local pending = tonumber(redis.call('GET', KEYS[1]) or '0')
+redis.call('DECRBY', KEYS[1], pending)
+redis.call('SREM', KEYS[2], ARGV[1])
+return pending
+"""
+
+
+def balance_key(client_id: int) -> str:
+    return f"{KEY_PREFIX}balance:{client_id}"
+
+
+def pending_key(client_id: int) -> str:
+    return f"{KEY_PREFIX}pending:{client_id}"
+
+
+class CreditCache:
+    """
+    Redis-resident credit balances in front of the credit ledger.
+    Sends reserve credits with one Lua call (floor-checked DECRBY) instead
+    of a Postgres round-trip. Reservations accumulate in a per-client
+    pending counter that `reconcile` writes to the ledger as one entry per
+    client, re-syncing the cached balance and recording any drift.
+    If Redis is unavailable, calls fall back to CreditService.
+    The `*_async` methods serve the API: they run in a worker thread with a
+    session of their own, so neither Redis nor the fallback blocks the loop.
+    """
+
+    def __init__(self):
+        self.redis_conn = Redis.from_url(settings.redis_url, decode_responses=True)
+        self._reserve = self.redis_conn.register_script(RESERVE_SCRIPT)
+        self._refund = self.redis_conn.register_script(REFUND_SCRIPT)
+        self._sync = self.redis_conn.register_script(SYNC_SCRIPT)
+        self._take_pending = self.redis_conn.register_script(TAKE_PENDING_SCRIPT)
+
+    def _load(self, db: Session, client_id: int) -> int:
+        """
+        Cache a client's balance from the ledger unless already cached.
+        The ledger lock is held from reading the ledger until the balance is
+        set, so pending reservations can't be flushed in between and get
+        subtracted from a ledger balance that already includes them.
+        """
+        try:
+            credit_service.lock(db, client_id)
+            ledger_balance = credit_service.balance(db, client_id)
+            balance, _ = self._sync(
+                keys=[balance_key(client_id), pending_key(client_id)],
+                args=[ledger_balance, settings.credit_cache_ttl_seconds, 1],
+            )
+        except Exception:
+            db.rollback()
+            raise
+        db.commit()
+        return balance
+
+    def reserve(self, db: Session, client_id: int, count: int = 1) -> int:
+        """
+        Take credits from a client's balance if it can cover them.
+        Must not be part of a larger transaction: the Postgres fallback
+        commits the reservation on its own. Undo with `refund`.
+
+        Returns:
+            Remaining balance
+
+        Raises:
+            InsufficientCredits: If the balance is lower than count
+        """
+        if not settings.credit_cache_enabled:
+            return self._reserve_in_db(db, client_id, count)
+
+        keys = [balance_key(client_id), pending_key(client_id), DIRTY_KEY]
+        try:
+            status, balance = self._reserve(keys=keys, args=[count, client_id])
+            if status == 0:
+                self._load(db, client_id)
+                status, balance = self._reserve(keys=keys, args=[count, client_id])
+        except RedisError as e:
+            logger.warning(f"Credit cache unavailable, reserving in Postgres: {e}")
+            return self._reserve_in_db(db, client_id, count)
+
+        if status != 1:
+            raise InsufficientCredits()
+        return balance
+
+    @staticmethod
+    def _reserve_in_db(db: Session, client_id: int, count: int) -> int:
+        remaining = credit_service.reserve(db, client_id, count)
+        db.commit()
+        return remaining
+
+    def refund(self, db: Session, client_id: int, count: int):
+        """Give back credits taken by `reserve`"""
+        if settings.credit_cache_enabled:
+            try:
+                self._refund(
+                    keys=[balance_key(client_id), pending_key(client_id), DIRTY_KEY],
+                    args=[count, client_id],
+                )
+                return
+            except RedisError as e:
+                logger.warning(f"Credit cache unavailable, refunding in Postgres: {e}")
+        credit_service.refund(db, client_id, count)
+        db.commit()
+
+    def balance(self, db: Session, client_id: int) -> int:
+        """Get a client's balance, including reservations not yet flushed"""
+        if settings.credit_cache_enabled:
+            try:
+                cached = self.redis_conn.get(balance_key(client_id))
+                if cached is not None:
+                    return int(cached)
+                return self._load(db, client_id)
+            except RedisError as e:
+                logger.warning(f"Credit cache unavailable, reading Postgres: {e}")
+        return credit_service.balance(db, client_id)
+
+    async def reserve_async(self, client_id: int, count: int = 1) -> int:
+        """Async version of `reserve`, see there"""
+        return await asyncio.to_thread(self._in_session, self.reserve, client_id, count)
+
+    async def refund_async(self, client_id: int, count: int):
+        """Async version of `refund`"""
+        await asyncio.to_thread(self._in_session, self.refund, client_id, count)
+
+    async def balance_async(self, client_id: int) -> int:
+        """Async version of `balance`"""
+        return await asyncio.to_thread(self._in_session, self.balance, client_id)
+
+    @staticmethod
+    def _in_session(method: Callable[..., T], *args) -> T:
+        db = SessionLocal()
+        try:
+            return method(db, *args)
+        finally:
+            db.close()
+
+    def invalidate(self, client_id: int):
+        """Drop a cached balance after the ledger changed outside the cache"""
+        try:
+            self.redis_conn.delete(balance_key(client_id))
+        except RedisError as e:
+            logger.warning(f"Could not invalidate cached balance of client {client_id}: {e}")
+
+    def forget(self, client_id: int):
+        """Drop all cached credit state of a deleted client"""
+        try:
+            pipe = self.redis_conn.pipeline()
+            pipe.delete(balance_key(client_id), pending_key(client_id))
+            pipe.srem(DIRTY_KEY, client_id)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not drop cached credits of client {client_id}: {e}")
+
+    def reconcile(self, db: Session) -> Dict[str, int]:
+        """
+        Flush pending reservations to the ledger and re-sync cached balances.
+
+        Returns:
+            Dict with the number of clients checked, credits flushed and
+            total drift corrected
+        """
+        client_ids = {
+            int(client_id) for client_id in self.redis_conn.smembers(DIRTY_KEY)
+        }
+        for key in self.redis_conn.scan_iter(f"{KEY_PREFIX}balance:*", count=500):
+            client_ids.add(int(key.rsplit(":", 1)[1]))
+
+        flushed = drift = 0
+        for client_id in client_ids:
+            try:
+                client_flushed, off_by = self._reconcile_client(db, client_id)
+            except Exception as e:
+                db.rollback()
+                logger.error(
+                    f"Could not reconcile credits of client {client_id}: {e}",
+                    exc_info=True,
+                )
+                continue
+            flushed += client_flushed
+            drift += abs(off_by)
+
+        pipe = self.redis_conn.pipeline()
+        pipe.hincrby(STATS_KEY, "flushed", flushed)
+        pipe.hincrby(STATS_KEY, "drift", drift)
+        pipe.hincrby(STATS_KEY, "runs", 1)
+        pipe.execute()
+        return {"clients": len(client_ids), "flushed": flushed, "drift": drift}
+
+    def _reconcile_client(self, db: Session, client_id: int) -> Tuple[int, int]:
+        """
+        Flush one client's pending reservations and re-sync its balance.
+
+        Returns:
+            Tuple of (credits flushed, drift of the cached balance)
+        """
+        # Taken before the pending counter is emptied, so a concurrent _load
+        # sees the reservations either pending or in the ledger
+        credit_service.lock(db, client_id)
+        pending = self._take_pending(
+            keys=[pending_key(client_id), DIRTY_KEY], args=[client_id]
+        )
+        if pending:
+            try:
+                credit_service.record_cached(db, client_id, -pending)
+                db.commit()
+            except Exception:
+                # Put the reservations back for the next run
+                db.rollback()
+                pipe = self.redis_conn.pipeline()
+                pipe.incrby(pending_key(client_id), pending)
+                pipe.sadd(DIRTY_KEY, client_id)
+                pipe.execute()
+                raise
+
+        try:
+            credit_service.lock(db, client_id)
+            ledger_balance = credit_service.balance(db, client_id)
+            _, off_by = self._sync(
+                keys=[balance_key(client_id), pending_key(client_id)],
+                args=[ledger_balance, settings.credit_cache_ttl_seconds, 0],
+            )
+        except Exception:
+            db.rollback()
+            raise
+        db.commit()
+        if off_by:
+            logger.warning(
+                f"Cached credit balance of client {client_id} drifted by {off_by}"
+            )
+        return pending, off_by
+
+    def collect_metrics(self) -> Sequence[str]:
+        """Render unflushed reservations and reconciler counters"""
+        try:
+            stats = self.redis_conn.hgetall(STATS_KEY)
+            dirty = list(self.redis_conn.smembers(DIRTY_KEY))
+            pending = (
+                self.redis_conn.mget([pending_key(client_id) for client_id in dirty])
+                if dirty
+                else []
+            )
+        except RedisError as e:
+            logger.warning(f"Could not collect credit cache metrics: {e}")
+            return []
+
+        return [
+            "# HELP sms_credit_pending Credits reserved in Redis, not yet in the ledger",
+            "# TYPE sms_credit_pending gauge",
+            f"sms_credit_pending {sum(int(value or 0) for value in pending)}",
+            "# HELP sms_credit_flushed_total Reserved credits written to the ledger",
+            "# TYPE sms_credit_flushed_total counter",
+            f"sms_credit_flushed_total {stats.get('flushed', 0)}",
+            "# HELP sms_credit_drift_total Credits corrected in cached balances",
+            "# TYPE sms_credit_drift_total counter",
+            f"sms_credit_drift_total {stats.get('drift', 0)}",
+            "# HELP sms_credit_reconcile_runs_total Reconciler runs",
+            "# TYPE sms_credit_reconcile_runs_total counter",
+            f"sms_credit_reconcile_runs_total {stats.get('runs', 0)}",
+        ]
+
+
+# Singleton instance
+credit_cache = CreditCache()
+registry.register_collector(credit_cache.collect_metrics)
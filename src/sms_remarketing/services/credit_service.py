@@ -0,0 +1,191 @@
+from sqlalchemy import select, insert, exists, func
+from sqlalchemy.orm import Session
+from typing import Optional
+import logging
+from ..models import Client, CreditLedgerEntry, CreditSnapshot
+from ..models.credit import CreditEntryKind, credit_balance
+
+logger = logging.getLogger(__name__)
+
+# First key of the per-client advisory lock taken around ledger writes
+CREDIT_LOCK_NAMESPACE = 0x43524544  # "CRED"
+
+
+class InsufficientCredits(ValueError):
+    """Raised when a client can't pay for a send"""
+
+    def __init__(self):
+        super().__init__("Insufficient credits")
+
+
+class CreditService:
+    """
+    Credit balances backed by the append-only credit ledger.
+    Every change is an inserted ledger entry; no row is ever updated.
+    Writes for one client take a transaction-scoped advisory lock, so
+    reservations can't overdraw and a client's entry ids follow commit
+    order (the snapshot rollup relies on this). Callers should commit
+    soon after writing.
+    """
+
+    @staticmethod
+    def lock(db: Session, client_id: int):
+        """
+        Serialize ledger writes for a client until the transaction ends.
+        Readers that must not see a write land halfway take it too.
+        """
+        db.execute(select(func.pg_advisory_xact_lock(CREDIT_LOCK_NAMESPACE, client_id)))
+
+    @staticmethod
+    def _append(
+        db: Session,
+        client_id: int,
+        kind: CreditEntryKind,
+        amount: int,
+        batch_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+    ):
+        db.execute(
+            insert(CreditLedgerEntry).values(
+                client_id=client_id,
+                kind=kind,
+                amount=amount,
+                batch_id=batch_id,
+                message_id=message_id,
+            )
+        )
+
+    @staticmethod
+    def balance(db: Session, client_id: int) -> int:
+        """Get a client's balance: latest snapshot plus later ledger entries"""
+        return db.execute(select(credit_balance(client_id))).scalar_one()
+
+    @staticmethod
+    def reserve(
+        db: Session,
+        client_id: int,
+        count: int = 1,
+        batch_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+    ) -> int:
+        """
+        Take credits from a client's balance if it can cover them.
+
+        Args:
+            db: Database session
+            client_id: The client paying
+            count: Number of credits to take
+            batch_id: Batch the credits pay for, if any
+            message_id: Message the credits pay for, if any
+
+        Returns:
+            Remaining balance
+
+        Raises:
+            InsufficientCredits: If the balance is lower than count
+        """
+        CreditService.lock(db, client_id)
+        balance = CreditService.balance(db, client_id)
+        if balance < count:
+            raise InsufficientCredits()
+        CreditService._append(
+            db, client_id, CreditEntryKind.RESERVATION, -count, batch_id, message_id
+        )
+        return balance - count
+
+    @staticmethod
+    def refund(
+        db: Session,
+        client_id: int,
+        count: int,
+        batch_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+    ) -> int:
+        """
+        Return reserved credits that weren't used.
+
+        Returns:
+            New balance
+        """
+        CreditService.lock(db, client_id)
+        CreditService._append(
+            db, client_id, CreditEntryKind.REFUND, count, batch_id, message_id
+        )
+        return CreditService.balance(db, client_id)
+
+    @staticmethod
+    def record_cached(db: Session, client_id: int, amount: int):
+        """
+        Write net reservations already checked against the Redis balance
+        (see CreditCache), as a reservation or, if negative, a refund.
+        """
+        CreditService.lock(db, client_id)
+        kind = CreditEntryKind.RESERVATION if amount < 0 else CreditEntryKind.REFUND
+        CreditService._append(db, client_id, kind, amount)
+
+    @staticmethod
+    def add(db: Session, client_id: int, amount: int) -> int:
+        """
+        Grant credits to a client.
+
+        Returns:
+            New balance
+        """
+        CreditService.lock(db, client_id)
+        CreditService._append(db, client_id, CreditEntryKind.GRANT, amount)
+        return CreditService.balance(db, client_id)
+
+    @staticmethod
+    def rollup(db: Session) -> int:
+        """
+        Fold new ledger entries into each client's balance snapshot, so
+        balance reads only sum the entries since the last rollup.
+
+        Returns:
+            Number of snapshots updated
+        """
+        last_entry_id = func.coalesce(CreditSnapshot.last_entry_id, 0)
+        client_ids = (
+            db.execute(
+                select(Client.id)
+                .outerjoin(CreditSnapshot, CreditSnapshot.client_id == Client.id)
+                .where(
+                    exists().where(
+                        CreditLedgerEntry.client_id == Client.id,
+                        CreditLedgerEntry.id > last_entry_id,
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+        for client_id in client_ids:
+            CreditService.lock(db, client_id)
+            snapshot = db.get(CreditSnapshot, client_id)
+            after = snapshot.last_entry_id if snapshot else 0
+            delta, last_id = db.execute(
+                select(
+                    func.coalesce(func.sum(CreditLedgerEntry.amount), 0),
+                    func.max(CreditLedgerEntry.id),
+                ).where(
+                    CreditLedgerEntry.client_id == client_id,
+                    CreditLedgerEntry.id > after,
+                )
+            ).one()
+            if last_id is None:
+                db.rollback()
+                continue
+
+            if snapshot is None:
+                snapshot = CreditSnapshot(client_id=client_id, balance=0)
+                db.add(snapshot)
+            snapshot.balance += delta
+            snapshot.last_entry_id = last_id
+            snapshot.updated_at = func.now()
+            db.commit()
+
+        return len(client_ids)
+
+
+credit_service = CreditService()
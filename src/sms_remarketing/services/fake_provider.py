@@ -0,0 +1,152 @@
+"""
+Local stand-in SMS provider for load testing without network access.
+
+Use it in-process by setting SMS_PROVIDER=fake, or run it as a fake Twilio
+HTTP API and point the Twilio transport at it:
+
+    uvicorn sms_remarketing.services.fake_provider:fake_twilio_app --port 8099
+    TWILIO_API_BASE_URL=http://localhost:8099
+"""
+from fastapi import FastAPI, Form
+from fastapi.responses import JSONResponse
+from typing import Optional
+import asyncio
+import httpx
+import logging
+import random
+import time
+import uuid
+from ..config import settings
+from .sms_provider import SMSProvider, SendResult
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_ERROR = "Fake provider error: Too Many Requests (429)"
+SEND_FAILED_ERROR = "Fake provider error: Simulated send failure"
+
+
+class FakeSMSProvider(SMSProvider):
+    """
+    SMS provider that simulates a real one: latency, random errors, 429s
+    and Twilio-style delivery status callbacks. Nothing leaves the process
+    except the optional status callbacks.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.from_number = settings.twilio_phone_number
+        self._http: Optional[httpx.AsyncClient] = None
+        self._callbacks: set[asyncio.Task] = set()
+
+    def send_sms(self, to: str, body: str) -> SendResult:
+        """
+        Simulate sending an SMS message, blocking for the simulated latency.
+
+        Args:
+            to: Recipient phone number
+            body: Message content
+
+        Returns:
+            Tuple of (success: bool, sid: str, error_message: str)
+        """
+        time.sleep(self._latency())
+        result = self._outcome()
+        if result[0]:
+            asyncio.run_coroutine_threadsafe(
+                self._send_status_callback(result[1]), self._get_loop()
+            )
+        return result
+
+    async def send_sms_async(self, to: str, body: str) -> SendResult:
+        """
+        Simulate sending an SMS message without blocking.
+
+        Args:
+            to: Recipient phone number
+            body: Message content
+
+        Returns:
+            Tuple of (success: bool, sid: str, error_message: str)
+        """
+        await asyncio.sleep(self._latency())
+        result = self._outcome()
+        if result[0]:
+            task = asyncio.create_task(self._send_status_callback(result[1]))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+        return result
+
+    async def _on_loop_start(self):
+        """Create the HTTP client used for status callbacks"""
+        self._http = httpx.AsyncClient(timeout=10.0)
+
+    def _latency(self) -> float:
+        """Simulated provider response time in seconds"""
+        latency_ms = settings.fake_sms_latency_ms + random.uniform(
+            -settings.fake_sms_latency_jitter_ms, settings.fake_sms_latency_jitter_ms
+        )
+        return max(latency_ms, 0) / 1000
+
+    def _outcome(self) -> SendResult:
+        """Roll the dice for a simulated send"""
+        roll = random.random()
+        if roll < settings.fake_sms_rate_limit_rate:
+            return False, None, RATE_LIMITED_ERROR
+        if roll < settings.fake_sms_rate_limit_rate + settings.fake_sms_error_rate:
+            return False, None, SEND_FAILED_ERROR
+        return True, f"SM{uuid.uuid4().hex}", None
+
+    async def _send_status_callback(self, sid: str):
+        """Post a delivery status update the way Twilio does"""
+        if not settings.fake_sms_callback_url:
+            return
+
+        await asyncio.sleep(settings.fake_sms_callback_delay_ms / 1000)
+        delivered = random.random() >= settings.fake_sms_undelivered_rate
+        data = {"MessageSid": sid, "MessageStatus": "delivered"}
+        if not delivered:
+            data = {
+                "MessageSid": sid,
+                "MessageStatus": "undelivered",
+                "ErrorCode": "30003",
+                "ErrorMessage": "Unreachable destination handset",
+            }
+
+        try:
+            if self._http is None:
+                await self._on_loop_start()
+            await self._http.post(settings.fake_sms_callback_url, data=data)
+        except httpx.HTTPError as e:
+            logger.warning(f"Fake status callback for {sid} failed: {e}")
+
+
+# Fake Twilio REST API backed by the same simulation
+fake_twilio_app = FastAPI(title="Fake Twilio API")
+_fake_provider = FakeSMSProvider()
+
+
+@fake_twilio_app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+async def create_message(
+    account_sid: str,
+    To: str = Form(...),
+    From: str = Form(...),
+    Body: str = Form(...),
+):
+    """Accept a message the way Twilio's Messages endpoint does"""
+    success, sid, error = await _fake_provider.send_sms_async(To, Body)
+    if not success:
+        status_code = 429 if error == RATE_LIMITED_ERROR else 400
+        return JSONResponse(
+            status_code=status_code, content={"status": status_code, "message": error}
+        )
+    return JSONResponse(
+        status_code=201,
+        content={
+            "sid": sid,
+            "account_sid": account_sid,
+            "to": To,
+            "from": From,
+            "body": Body,
+            "status": "queued",
+        },
+    )
@@ -0,0 +1,144 @@
+from redis.asyncio import Redis
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any
+import hashlib
+import json
+import logging
+from ..config import settings
+from ..models import IdempotencyKey, Message
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "idempotency:"
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyService:
+    """
+    Idempotency-Key support for endpoints that create messages.
+    Responses are cached in Redis so replays never reach Postgres; the
+    `idempotency_keys` table backs this up when the cache misses.
+    """
+
+    def __init__(self):
+        self.redis_conn = Redis.from_url(settings.redis_url, decode_responses=True)
+
+    @staticmethod
+    def cache_key(scope: str, key: str) -> str:
+        """Redis key for an Idempotency-Key within a scope (path + credentials)"""
+        digest = hashlib.sha256(f"{scope}\0{key}".encode()).hexdigest()
+        return f"{CACHE_PREFIX}{digest}"
+
+    async def get_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached response.
+
+        Returns:
+            Dict with fingerprint, status_code, body and media_type, or None
+        """
+        cached = await self.redis_conn.get(cache_key)
+        return json.loads(cached) if cached else None
+
+    async def save_response(
+        self,
+        cache_key: str,
+        fingerprint: str,
+        status_code: int,
+        body: bytes,
+        media_type: Optional[str],
+    ):
+        """Cache a response for `idempotency_ttl_seconds`"""
+        await self.redis_conn.set(
+            cache_key,
+            json.dumps(
+                {
+                    "fingerprint": fingerprint,
+                    "status_code": status_code,
+                    "body": body.decode(),
+                    "media_type": media_type,
+                }
+            ),
+            ex=settings.idempotency_ttl_seconds,
+        )
+
+    async def lock(self, cache_key: str) -> bool:
+        """Mark a key as in flight; False if another request holds it"""
+        return bool(
+            await self.redis_conn.set(
+                f"{cache_key}:lock", 1, nx=True, ex=settings.idempotency_lock_seconds
+            )
+        )
+
+    async def unlock(self, cache_key: str):
+        """Release an in-flight key"""
+        await self.redis_conn.delete(f"{cache_key}:lock")
+
+    @staticmethod
+    def find_message(db: Session, client_id: int, key: str) -> Optional[Message]:
+        """Get the message created by an earlier request with this key"""
+        record = (
+            db.query(IdempotencyKey)
+            .filter(IdempotencyKey.client_id == client_id, IdempotencyKey.key == key)
+            .first()
+        )
+        if not record:
+            return None
+        query = db.query(Message).filter(Message.id == record.message_id)
+        if record.message_created_at is not None:
+            # Only the message's month partition is searched
+            query = query.filter(Message.created_at == record.message_created_at)
+        return query.first()
+
+    @staticmethod
+    def claim(db: Session, client_id: int, key: str, message: Message) -> Optional[Message]:
+        """
+        Record a key for a new, flushed message in the current transaction.
+        If a concurrent request already claimed it, the transaction is rolled
+        back and that request's message is returned instead.
+
+        Returns:
+            None if claimed, otherwise the existing message
+        """
+        db.add(
+            IdempotencyKey(
+                client_id=client_id,
+                key=key,
+                message_id=message.id,
+                message_created_at=message.created_at,
+            )
+        )
+        try:
+            db.flush()
+            return None
+        except IntegrityError:
+            db.rollback()
+            logger.info(f"Idempotency key already used by client {client_id}, replaying")
+            existing = IdempotencyService.find_message(db, client_id, key)
+            if existing is None:
+                raise
+            return existing
+
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """
+        Delete keys older than the cache TTL.
+
+        Returns:
+            Number of keys deleted
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.idempotency_ttl_seconds
+        )
+        deleted = (
+            db.query(IdempotencyKey)
+            .filter(IdempotencyKey.created_at < cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return deleted
+
+
+# Singleton instance
+idempotency_service = IdempotencyService()
@@ -0,0 +1,303 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import codecs
+import csv
+import json
+import logging
+from ..schemas.lead import LeadCreate
+
+logger = logging.getLogger(__name__)
+
+CSV_CONTENT_TYPES = ("text/csv",)
+NDJSON_CONTENT_TYPES = (
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+)
+
+# Invalid rows reported back in detail; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# CSV columns mapped to lead fields; any other column goes to custom_fields
+LEAD_COLUMNS = ("phone_number", "first_name", "last_name", "email")
+
+STAGING_TABLE = "lead_import"
+STAGING_COLUMNS = (
+    "line",
+    "phone_number",
+    "first_name",
+    "last_name",
+    "email",
+    "custom_fields",
+)
+
+# Dropped with the transaction; one per import
+CREATE_STAGING = f"""
+CREATE TEMPORARY TABLE {STAGING_TABLE} (
+    line integer NOT NULL,
+    phone_number text NOT NULL,
+    first_name text,
+    last_name text,
+    email text,
+    custom_fields json
+) ON COMMIT DROP
+"""
+
+# Upserts on (client_id, phone_normalized); a number repeated within the file
+# is taken from its last occurrence. Existing leads get the non-empty fields
+# and custom fields merged in, and are only written if that changes them.
+# New leads are inserted in file order and share the transaction's created_at.
+MERGE_STAGING = f"""
+WITH staged AS (
+    SELECT DISTINCT ON (phone_number) *
+    FROM {STAGING_TABLE}
+    ORDER BY phone_number, line DESC
+),
+upserted AS (
+    INSERT INTO leads AS lead (
+        client_id, phone_number, phone_normalized,
+        first_name, last_name, email, custom_fields
+    )
+    SELECT :client_id, phone_number, phone_number,
+           first_name, last_name, email, custom_fields
+    FROM staged
+    ORDER BY line
+    ON CONFLICT (client_id, phone_normalized) DO UPDATE SET
+        phone_number = excluded.phone_number,
+        first_name = COALESCE(excluded.first_name, lead.first_name),
+        last_name = COALESCE(excluded.last_name, lead.last_name),
+        email = COALESCE(excluded.email, lead.email),
+        custom_fields = (
+            COALESCE(lead.custom_fields::jsonb, '{{}}') || excluded.custom_fields::jsonb
+        )::json,
+        updated_at = now()
+    WHERE (
+        lead.phone_number,
+        lead.first_name,
+        lead.last_name,
+        lead.email,
+        lead.custom_fields::jsonb
+    ) IS DISTINCT FROM (
+        excluded.phone_number,
+        COALESCE(excluded.first_name, lead.first_name),
+        COALESCE(excluded.last_name, lead.last_name),
+        COALESCE(excluded.email, lead.email),
+        COALESCE(lead.custom_fields::jsonb, '{{}}') || excluded.custom_fields::jsonb
+    )
+    -- xmax is only set on rows that already existed
+    RETURNING id, created_at, xmax = 0 AS inserted
+)
+SELECT
+    (SELECT count(*) FROM staged),
+    count(*) FILTER (WHERE inserted),
+    count(*) FILTER (WHERE NOT inserted),
+    min(id) FILTER (WHERE inserted),
+    max(id) FILTER (WHERE inserted),
+    min(created_at) FILTER (WHERE inserted)
+FROM upserted
+"""
+
+
+class UnsupportedImportFormat(ValueError):
+    """Raised for uploads that are neither CSV nor NDJSON"""
+
+
+@dataclass
+class LeadImportResult:
+    received: int = 0
+    imported: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    # Range of the new lead ids and their shared created_at, used to find the
+    # imported leads again (ids of concurrent inserts may interleave)
+    first_id: Optional[int] = None
+    last_id: Optional[int] = None
+    imported_at: Optional[datetime] = None
+
+    def reject(self, line: int, error: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without holding more than one chunk"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def _csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    (line number, field dict or error) for each CSV record after the header.
+    Quoted fields may span lines: a record is complete once its quotes balance.
+    """
+    header: Optional[List[str]] = None
+    record: List[str] = []
+    quotes = 0
+    line_number = start = 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            start = line_number
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+
+        raw = "\n".join(record)
+        record, quotes = [], 0
+        if not raw.strip():
+            continue
+        values = next(csv.reader([raw]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+
+        data: Dict[str, Any] = {"custom_fields": {}}
+        for name, value in zip(header, values):
+            if name in LEAD_COLUMNS:
+                data[name] = value or None
+            elif value:
+                data["custom_fields"][name] = value
+        yield start, data
+
+    if record:
+        yield start, "Unterminated quoted field"
+
+
+async def _ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Any]]:
+    """(line number, object or error) for each non-empty NDJSON line"""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, "Expected a JSON object"
+            continue
+        yield line_number, data
+
+
+async def _records(
+    rows: AsyncIterator[Tuple[int, Any]], result: LeadImportResult
+) -> AsyncIterator[Tuple]:
+    """Validate rows into staging table records, counting rejected ones"""
+    async for line_number, data in rows:
+        result.received += 1
+        if isinstance(data, str):
+            result.reject(line_number, data)
+            continue
+        try:
+            lead = LeadCreate.model_validate(data)
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            result.reject(line_number, f"{location}: {error['msg']}")
+            continue
+        yield (
+            line_number,
+            lead.phone_number,
+            lead.first_name,
+            lead.last_name,
+            lead.email,
+            json.dumps(lead.custom_fields or {}),
+        )
+
+
+class LeadImportService:
+    """
+    Bulk lead import from a streamed CSV or NDJSON upload.
+    Rows are parsed and validated one at a time by a chain of async
+    generators feeding a binary COPY into a temporary staging table, so
+    memory use doesn't grow with the file. One INSERT ... ON CONFLICT then
+    upserts the staged rows into `leads`.
+    """
+
+    @staticmethod
+    def row_parser(content_type: str):
+        """Pick the row generator for an upload's Content-Type"""
+        media_type = content_type.split(";")[0].strip().lower()
+        if media_type in CSV_CONTENT_TYPES:
+            return _csv_rows
+        if media_type in NDJSON_CONTENT_TYPES:
+            return _ndjson_rows
+        raise UnsupportedImportFormat(
+            f"Unsupported Content-Type {media_type!r}, "
+            "send text/csv or application/x-ndjson"
+        )
+
+    @staticmethod
+    async def import_leads(
+        db: AsyncSession,
+        client_id: int,
+        chunks: AsyncIterator[bytes],
+        content_type: str,
+    ) -> LeadImportResult:
+        """
+        Import leads for a client and commit them.
+
+        Args:
+            db: Database session
+            client_id: The client owning the leads
+            chunks: The upload's body
+            content_type: The upload's Content-Type
+
+        Returns:
+            LeadImportResult with counts and the first rejected rows
+
+        Raises:
+            UnsupportedImportFormat: If the Content-Type is not CSV or NDJSON
+        """
+        rows = LeadImportService.row_parser(content_type)(_lines(chunks))
+        result = LeadImportResult()
+
+        await db.execute(text(CREATE_STAGING))
+        connection = await (await db.connection()).get_raw_connection()
+        await connection.driver_connection.copy_records_to_table(
+            STAGING_TABLE,
+            records=_records(rows, result),
+            columns=STAGING_COLUMNS,
+        )
+
+        staged, imported, updated, first_id, last_id, imported_at = (
+            await db.execute(text(MERGE_STAGING), {"client_id": client_id})
+        ).one()
+        await db.commit()
+
+        result.imported, result.updated = imported, updated
+        result.unchanged = staged - imported - updated
+        result.duplicates = result.received - result.invalid - staged
+        result.first_id, result.last_id = first_id, last_id
+        result.imported_at = imported_at
+        logger.info(
+            f"Imported {imported} of {result.received} leads for client {client_id} "
+            f"({updated} updated, {result.unchanged} unchanged, "
+            f"{result.duplicates} duplicates, {result.invalid} invalid)"
+        )
+        return result
+
+
+lead_import_service = LeadImportService()
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from redis import Redis
+from redis.exceptions import RedisError
+from typing import Any, Dict, Iterable, Optional, Sequence, Set, Tuple
+import logging
+import os
+import threading
+import time
+from ..config import settings
+from ..metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache:
+    """
+    In-process LRU cache bounded by size and TTL, for rows read on every
+    request. Entries carry tags (e.g. "client:12"); invalidating a tag is
+    published on the `<name>:invalidate` Redis channel so every process
+    drops the entries carrying it. If the subscription breaks, the cache is
+    cleared, and entries only live for `ttl_seconds` anyway.
+    """
+
+    def __init__(self, name: str, size: int, ttl_seconds: float, enabled: bool = True):
+        self.name = name
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.channel = f"{name}:invalidate"
+        self.redis_conn = Redis.from_url(settings.redis_url)
+        self._entries: "OrderedDict[str, Tuple[float, Any, Tuple[str, ...]]]" = (
+            OrderedDict()
+        )
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_pid: Optional[int] = None
+        self._listener_retry_at = 0.0
+        self.requests = registry.counter(
+            f"sms_{name}_cache_requests_total",
+            f"{name} cache lookups by result (hit, miss, expired)",
+            labels=("result",),
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value, or None on a miss"""
+        if not self.enabled:
+            return None
+        self._ensure_listener()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                entry = None
+                result = "expired"
+            elif entry is None:
+                result = "miss"
+            else:
+                self._entries.move_to_end(key)
+                result = "hit"
+        self.requests.inc(result=result)
+        return entry[1] if entry is not None else None
+
+    def put(self, key: str, value: Any, tags: Iterable[str] = ()):
+        """Cache a value until it expires or one of its tags is invalidated"""
+        if not self.enabled:
+            return
+        tags = tuple(tags)
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *tags: str):
+        """Drop entries carrying any of the tags here and in other processes"""
+        self._invalidate_local(tags)
+        try:
+            self.redis_conn.publish(self.channel, " ".join(tags))
+        except RedisError as e:
+            logger.warning(f"Could not publish {self.name} cache invalidation: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def _invalidate_local(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def _on_message(self, message):
+        data = message["data"]
+        if isinstance(data, bytes):
+            data = data.decode()
+        self._invalidate_local(data.split())
+
+    def _on_listener_error(self, error, pubsub, thread):
+        # Invalidations may have been missed while disconnected
+        logger.warning(f"{self.name} cache invalidation listener failed: {error}")
+        thread.stop()
+        self._listener = None
+        self.clear()
+
+    def _ensure_listener(self):
+        """
+        Subscribe to invalidations once per process (threads don't survive
+        fork). The subscription connects in a background thread, so lookups
+        never wait on Redis.
+        """
+        if self._listener is not None and self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener_pid == os.getpid():
+                return
+            if time.monotonic() < self._listener_retry_at:
+                return
+            self._listener = threading.Thread(
+                target=self._subscribe, name=f"{self.name}-cache-subscribe", daemon=True
+            )
+            self._listener_pid = os.getpid()
+            self._listener.start()
+
+    def _subscribe(self):
+        try:
+            pubsub = self.redis_conn.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_message})
+            listener = pubsub.run_in_thread(
+                sleep_time=1,
+                daemon=True,
+                exception_handler=self._on_listener_error,
+            )
+        except RedisError as e:
+            logger.warning(f"{self.name} cache invalidation listener unavailable: {e}")
+            listener = None
+            with self._lock:
+                self._listener_retry_at = time.monotonic() + self.ttl_seconds
+
+        with self._lock:
+            # Unless the listener already failed and reset it
+            if self._listener is threading.current_thread():
+                self._listener = listener
+            # Entries cached before now may never be invalidated
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def collect_metrics(self) -> Sequence[str]:
+        """Render cache size and hit ratio"""
+        hits = self.requests.value(result="hit")
+        total = sum(
+            self.requests.value(result=result) for result in ("hit", "miss", "expired")
+        )
+        entries = f"sms_{self.name}_cache_entries"
+        hit_ratio = f"sms_{self.name}_cache_hit_ratio"
+        return [
+            f"# HELP {entries} Entries in this process's {self.name} cache",
+            f"# TYPE {entries} gauge",
+            f"{entries} {len(self._entries)}",
+            f"# HELP {hit_ratio} Share of {self.name} cache lookups that hit",
+            f"# TYPE {hit_ratio} gauge",
+            f"{hit_ratio} {hits / total if total else 0}",
+        ]
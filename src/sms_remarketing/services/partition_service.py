@@ -0,0 +1,211 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import gzip
+import logging
+import os
+import re
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "messages"
+
+# Keeps partition DDL from queueing the send path behind it for long
+LOCK_TIMEOUT = "5s"
+
+PARTITION_BOUND = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+
+
+@dataclass
+class Partition:
+    name: str
+    # None for MINVALUE / MAXVALUE
+    start: Optional[datetime]
+    end: Optional[datetime]
+
+    def covers(self, start: datetime, end: datetime) -> bool:
+        """Whether the partition holds the whole [start, end) range"""
+        return (self.start is None or self.start <= start) and (
+            self.end is None or end <= self.end
+        )
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """First instant (UTC) of the month `months` after the one containing `moment`"""
+    moment = moment.astimezone(timezone.utc)
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+class PartitionService:
+    """
+    Maintenance of the monthly range partitions of `messages` on created_at.
+    Partitions are created `message_partitions_ahead` months in advance, and
+    the ones entirely older than `message_retention_months` are detached,
+    moved to the `message_archive_schema` schema and, when
+    `message_archive_dir` is set, exported to gzipped CSV and dropped. Hot
+    queries then only ever touch a bounded number of partitions.
+    """
+
+    @staticmethod
+    def partitions(db: Session) -> List[Partition]:
+        """Partitions currently attached to messages, oldest first"""
+        rows = db.execute(
+            text(
+                """
+                SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = :parent
+                """
+            ),
+            {"parent": PARENT_TABLE},
+        ).all()
+
+        partitions = []
+        for name, bound in rows:
+            match = PARTITION_BOUND.search(bound)
+            if match is None:
+                logger.warning(f"Skipping partition {name} with bound {bound}")
+                continue
+            partitions.append(
+                Partition(name, _parse_bound(match[1]), _parse_bound(match[2]))
+            )
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        return sorted(partitions, key=lambda p: p.start or oldest)
+
+    @staticmethod
+    def create_partitions(db: Session, now: Optional[datetime] = None) -> List[str]:
+        """
+        Create the partitions of this month and the next
+        `message_partitions_ahead` months that don't exist yet.
+
+        Returns:
+            Names of the partitions created
+        """
+        now = now or datetime.now(timezone.utc)
+        existing = PartitionService.partitions(db)
+        created = []
+        for months in range(settings.message_partitions_ahead + 1):
+            start, end = month_start(now, months), month_start(now, months + 1)
+            if any(partition.covers(start, end) for partition in existing):
+                continue
+            name = f"{PARENT_TABLE}_{start:%Y_%m}"
+            db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            db.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {PARENT_TABLE} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+            )
+            db.commit()
+            created.append(name)
+            logger.info(f"Created partition {name}")
+        return created
+
+    @staticmethod
+    def archive_partitions(db: Session, now: Optional[datetime] = None) -> List[str]:
+        """
+        Detach partitions holding only messages older than
+        `message_retention_months` and move them to the archive schema,
+        without the foreign keys they kept from messages. Every partition
+        waiting in the archive schema is then exported and dropped, if
+        `message_archive_dir` is set.
+
+        Returns:
+            Names of the partitions detached
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = month_start(now, -settings.message_retention_months)
+        schema = settings.message_archive_schema
+        db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        db.commit()
+        # Partitions archived before their foreign keys were dropped
+        db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        PartitionService._drop_foreign_keys(db, schema)
+        db.commit()
+
+        detached = []
+        for partition in PartitionService.partitions(db):
+            if partition.end is None or partition.end > cutoff:
+                continue
+            db.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            db.execute(
+                text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition.name}")
+            )
+            db.execute(text(f"ALTER TABLE {partition.name} SET SCHEMA {schema}"))
+            PartitionService._drop_foreign_keys(db, schema)
+            db.commit()
+            detached.append(partition.name)
+            logger.info(f"Detached partition {partition.name} into {schema}")
+
+        if settings.message_archive_dir:
+            archived = db.scalars(
+                text(
+                    "SELECT tablename FROM pg_tables "
+                    "WHERE schemaname = :schema AND tablename LIKE :pattern"
+                ),
+                {"schema": schema, "pattern": f"{PARENT_TABLE}\\_%"},
+            ).all()
+            for name in archived:
+                PartitionService._export(db, f"{schema}.{name}", name)
+        return detached
+
+    @staticmethod
+    def _drop_foreign_keys(db: Session, schema: str):
+        """
+        Drop the foreign keys archived partitions keep after being detached,
+        which would otherwise block deleting the clients, leads, templates
+        and batches their messages point to
+        """
+        constraints = db.execute(
+            text(
+                """
+                SELECT child.relname, pg_constraint.conname
+                FROM pg_constraint
+                JOIN pg_class child ON child.oid = pg_constraint.conrelid
+                JOIN pg_namespace ON pg_namespace.oid = child.relnamespace
+                WHERE pg_namespace.nspname = :schema
+                AND child.relname LIKE :pattern
+                AND pg_constraint.contype = 'f'
+                """
+            ),
+            {"schema": schema, "pattern": f"{PARENT_TABLE}\\_%"},
+        ).all()
+        for table, name in constraints:
+            db.execute(text(f'ALTER TABLE {schema}.{table} DROP CONSTRAINT "{name}"'))
+
+    @staticmethod
+    def _export(db: Session, table: str, name: str):
+        """Write an archived partition to a .csv.gz file, then drop it"""
+        path = os.path.join(settings.message_archive_dir, f"{name}.csv.gz")
+        partial = f"{path}.partial"
+        os.makedirs(settings.message_archive_dir, exist_ok=True)
+
+        cursor = db.connection().connection.cursor()
+        with open(partial, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                cursor.copy_expert(
+                    f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", out
+                )
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(partial, path)
+
+        # Only dropped once the file is safely written
+        db.execute(text(f"DROP TABLE {table}"))
+        db.commit()
+        logger.info(f"Exported {table} to {path}")
+
+
+partition_service = PartitionService()
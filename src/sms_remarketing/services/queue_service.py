@@ -1,10 +1,57 @@
 from redis import Redis
-from rq import Queue
+from redis.exceptions import RedisError
+from rq import Queue, Retry
+from rq.queue import EnqueueData
+from collections import defaultdict
+from itertools import batched
+from typing import Dict, List, Optional, Sequence, Tuple
 from ..config import settings
+from ..metrics import registry
+from ..models.message import MessageOrigin
+import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Priority lanes. Time-sensitive messages must not wait behind bulk campaigns.
+HIGH_PRIORITY_QUEUE = "sms:high"
+BULK_QUEUE = "sms:bulk"
+# Single queue used before priority lanes; workers still drain it
+LEGACY_QUEUE = "sms"
+
+ORIGIN_QUEUES = {
+    MessageOrigin.API: HIGH_PRIORITY_QUEUE,
+    MessageOrigin.WEBHOOK: HIGH_PRIORITY_QUEUE,
+    MessageOrigin.NEW_LEAD: HIGH_PRIORITY_QUEUE,
+    MessageOrigin.LEAD_AGE: BULK_QUEUE,
+    MessageOrigin.CAMPAIGN: BULK_QUEUE,
+    MessageOrigin.IMPORT: BULK_QUEUE,
+}
+
+# Per-client sub-queues feeding fair lanes (see workers/dispatcher.py)
+TENANT_QUEUE_PREFIX = "sms:tenant:"
+
+# Scheduled messages, scored by send time in epoch seconds (see
+# workers/scheduler.py). Members are "message_id:client_id:origin:created_at",
+# older ones lack created_at.
+SCHEDULED_KEY = "sms:scheduled"
+
+# A message as queued work refers to it: its id and its created_at in epoch
+# seconds (None if unknown). The partition key lets the send job look it up
+# in its month's partition of `messages` only.
+MessageRef = Tuple[int, Optional[float]]
+
+
+def tenant_queue_key(lane: str, client_id: int) -> str:
+    """Redis list holding a client's pending chunks for a lane"""
+    return f"{TENANT_QUEUE_PREFIX}{lane}:{client_id}"
+
+
+def active_tenants_key(lane: str) -> str:
+    """Redis set of clients with pending chunks for a lane"""
+    return f"{TENANT_QUEUE_PREFIX}{lane}:active"
+
 
 class QueueService:
     """Service for managing background job queues"""
@@ -15,42 +62,250 @@ class QueueService:
                 settings.redis_url,
                 decode_responses=False,
             )
-            self.queue = Queue("sms", connection=self.redis_conn)
+            self.queues: Dict[str, Queue] = {
+                name: Queue(name, connection=self.redis_conn)
+                for name in (HIGH_PRIORITY_QUEUE, BULK_QUEUE)
+            }
             logger.info("Redis queue service initialized")
         except Exception as e:
             logger.warning(f"Failed to connect to Redis: {e}. Jobs will run synchronously.")
             self.redis_conn = None
-            self.queue = None
+            self.queues = {}
+
+        self.queue_wait = registry.redis_histogram(
+            "sms_queue_wait_seconds",
+            "Time from enqueue until a worker starts sending",
+            self.redis_conn,
+            labels=("queue", "client"),
+            buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 1800, 3600),
+        )
+
+    def queue_for(self, origin: MessageOrigin) -> Queue:
+        """Get the priority lane for messages of a given origin"""
+        return self.queues[ORIGIN_QUEUES.get(origin, BULK_QUEUE)]
+
+    def is_fair(self, queue: Queue) -> bool:
+        """Whether a lane is fed through per-client sub-queues"""
+        return queue.name in settings.fair_queue_lanes
 
-    def enqueue_sms(self, message_id: int) -> str:
+    @staticmethod
+    def prepare_job(
+        messages: Sequence[MessageRef],
+        client_id: Optional[int] = None,
+        queued_at: Optional[float] = None,
+    ) -> EnqueueData:
+        """Build the RQ job sending a chunk of messages"""
+        from ..workers.jobs import send_sms_batch_job
+
+        message_ids, created_at = map(list, zip(*messages))
+        return Queue.prepare_data(
+            send_sms_batch_job,
+            args=(message_ids, created_at),
+            retry=Retry(max=3),
+            timeout="10m",
+            meta={"client_id": client_id, "queued_at": queued_at or time.time()},
+        )
+
+    def enqueue_sms(
+        self,
+        message: MessageRef,
+        origin: MessageOrigin = MessageOrigin.API,
+        client_id: Optional[int] = None,
+    ) -> str:
         """
         Enqueue an SMS message for async sending.
 
         Args:
-            message_id: The message ID to send
+            message: The message to send
+            origin: Where the message came from, selects the priority lane
+            client_id: The sending client, used for fair queuing and metrics
 
         Returns:
-            Job ID if queued, or "sync" if running synchronously
+            Job ID if queued, "tenant" if held in the client's sub-queue,
+            or "sync" if running synchronously
         """
-        if self.queue is None:
+        message_id, created_at = message
+        if not self.queues:
             logger.warning(f"Redis unavailable, sending message {message_id} synchronously")
             return "sync"
 
+        queue = self.queue_for(origin)
+        if client_id is not None and self.is_fair(queue):
+            self._push_tenant_chunks(queue, client_id, [[message]])
+            return "tenant"
+
         from ..workers.jobs import send_sms_job
 
-        job = self.queue.enqueue(
+        job = queue.enqueue(
             send_sms_job,
             message_id,
-            retry=3,
+            created_at,
+            retry=Retry(max=3),
             job_timeout="5m",
+            meta={"client_id": client_id, "queued_at": time.time()},
         )
-        logger.info(f"Enqueued SMS job {job.id} for message {message_id}")
+        logger.info(f"Enqueued SMS job {job.id} for message {message_id} on {queue.name}")
         return job.id
 
+    def enqueue_sms_many(
+        self,
+        messages: List[MessageRef],
+        origin: MessageOrigin = MessageOrigin.CAMPAIGN,
+        client_id: Optional[int] = None,
+    ) -> List[str]:
+        """
+        Enqueue many SMS messages for async sending in a single Redis round-trip.
+        Messages are grouped into chunks of `sms_job_chunk_size`, one job per chunk.
+        On fair lanes the chunks go to the client's sub-queue and the dispatcher
+        turns them into jobs.
+
+        Args:
+            messages: The messages to send
+            origin: Where the messages came from, selects the priority lane
+            client_id: The sending client, used for fair queuing and metrics
+
+        Returns:
+            List of job IDs (empty when held in a sub-queue or Redis is unavailable)
+        """
+        if not self.queues:
+            logger.warning(
+                f"Redis unavailable, cannot enqueue {len(messages)} messages"
+            )
+            return []
+
+        queue = self.queue_for(origin)
+        chunks = [
+            list(chunk) for chunk in batched(messages, settings.sms_job_chunk_size)
+        ]
+        if client_id is not None and self.is_fair(queue):
+            self._push_tenant_chunks(queue, client_id, chunks)
+            return []
+
+        job_datas = [self.prepare_job(chunk, client_id) for chunk in chunks]
+        with self.redis_conn.pipeline() as pipe:
+            jobs = queue.enqueue_many(job_datas, pipeline=pipe)
+            pipe.execute()
+
+        logger.info(
+            f"Enqueued {len(messages)} messages as {len(jobs)} SMS jobs on {queue.name}"
+        )
+        return [job.id for job in jobs]
+
+    def _push_tenant_chunks(
+        self, queue: Queue, client_id: int, chunks: List[List[MessageRef]]
+    ):
+        """Append chunks to a client's sub-queue and mark the client active"""
+        queued_at = time.time()
+        with self.redis_conn.pipeline(transaction=True) as pipe:
+            for chunk in chunks:
+                message_ids, created_at = map(list, zip(*chunk))
+                pipe.rpush(
+                    tenant_queue_key(queue.name, client_id),
+                    json.dumps(
+                        {
+                            "ids": message_ids,
+                            "created_at": created_at,
+                            "queued_at": queued_at,
+                        }
+                    ),
+                )
+            pipe.sadd(active_tenants_key(queue.name), client_id)
+            pipe.execute()
+        logger.info(
+            f"Queued {sum(len(c) for c in chunks)} messages for client {client_id} "
+            f"on {queue.name} sub-queue"
+        )
+
+    def schedule_sms_many(
+        self,
+        messages: Sequence[Tuple[MessageRef, float]],
+        origin: MessageOrigin,
+        client_id: int,
+    ):
+        """
+        Hold messages until their send time; the scheduler enqueues them.
+
+        Args:
+            messages: Sequence of (message, send_at epoch seconds) pairs
+            origin: Where the messages came from, selects the priority lane
+            client_id: The sending client
+        """
+        self.redis_conn.zadd(
+            SCHEDULED_KEY,
+            {
+                f"{message_id}:{client_id}:{origin.value}:{created_at or ''}": send_at
+                for (message_id, created_at), send_at in messages
+            },
+        )
+
+    def release_due_sms(self, limit: int) -> int:
+        """
+        Enqueue scheduled messages whose send time has passed, earliest first.
+        Messages leave the scheduled set only after they were enqueued.
+
+        Returns:
+            Number of messages released
+        """
+        due = self.redis_conn.zrangebyscore(
+            SCHEDULED_KEY, "-inf", time.time(), start=0, num=limit
+        )
+        if not due:
+            return 0
+
+        groups: Dict[Tuple[MessageOrigin, int], List[MessageRef]] = defaultdict(list)
+        for member in due:
+            message_id, client_id, origin, *rest = member.decode().split(":")
+            created_at = float(rest[0]) if rest and rest[0] else None
+            groups[(MessageOrigin(origin), int(client_id))].append(
+                (int(message_id), created_at)
+            )
+        for (origin, client_id), messages in groups.items():
+            self.enqueue_sms_many(messages, origin=origin, client_id=client_id)
+
+        self.redis_conn.zrem(SCHEDULED_KEY, *due)
+        return len(due)
+
+    def next_scheduled_at(self) -> Optional[float]:
+        """Send time of the earliest scheduled message, in epoch seconds"""
+        first = self.redis_conn.zrange(SCHEDULED_KEY, 0, 0, withscores=True)
+        return first[0][1] if first else None
+
     def is_available(self) -> bool:
         """Check if Redis queue is available"""
-        return self.queue is not None
+        return bool(self.queues)
+
+    def collect_metrics(self) -> Sequence[str]:
+        """Render waiting jobs per lane and client sub-queue, and scheduled messages"""
+        lines = [
+            "# HELP sms_queue_jobs Jobs waiting in a priority lane",
+            "# TYPE sms_queue_jobs gauge",
+        ]
+        scheduled = [
+            "# HELP sms_scheduled_messages Messages waiting for their send time",
+            "# TYPE sms_scheduled_messages gauge",
+        ]
+        backlog = [
+            "# HELP sms_tenant_queue_chunks Chunks waiting in a client sub-queue",
+            "# TYPE sms_tenant_queue_chunks gauge",
+        ]
+        try:
+            if self.queues:
+                scheduled.append(
+                    f"sms_scheduled_messages {self.redis_conn.zcard(SCHEDULED_KEY)}"
+                )
+            for name, queue in self.queues.items():
+                lines.append(f'sms_queue_jobs{{queue="{name}"}} {queue.count}')
+                for client_id in self.redis_conn.smembers(active_tenants_key(name)):
+                    client_id = client_id.decode()
+                    depth = self.redis_conn.llen(tenant_queue_key(name, client_id))
+                    labels = f'queue="{name}",client="{client_id}"'
+                    backlog.append(f"sms_tenant_queue_chunks{{{labels}}} {depth}")
+        except RedisError as e:
+            logger.warning(f"Could not collect queue metrics: {e}")
+            return []
+        return lines + backlog + scheduled
 
 
 # Singleton instance
 queue_service = QueueService()
+registry.register_collector(queue_service.collect_metrics)
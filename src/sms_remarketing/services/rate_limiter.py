@@ -0,0 +1,200 @@
+from redis import Redis
+from redis.exceptions import RedisError
+from typing import List, Optional, Sequence, Tuple
+import logging
+import time
+from ..config import settings
+from ..metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BUCKET_PREFIX = "ratelimit:bucket:"
+STATS_KEY = "ratelimit:stats"
+
+# Token buckets, refilled continuously at `rate` tokens/sec up to `burst`.
+# Tokens are taken from every bucket only if all of them can pay, so a send
+# is never charged against its sender number without its client (or vice
+# versa). Returns 0 when granted, otherwise milliseconds until it would be.
+# KEYS: stats hash, bucket keys...  ARGV: tokens, rate1, burst1, rate2, burst2...
+TOKEN_BUCKET_SCRIPT = """
+local requested = tonumber(ARGV[1])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local levels = {}
+local short = {}
+local wait = 0
+
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[i * 2 - 2])
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+    levels[i] = tokens
+    short[i] = tokens < requested
+    if short[i] then
+        wait = math.max(wait, math.ceil((requested - tokens) * 1000 / rate))
+    end
+end
+
+for i = 2, #KEYS do
+    local rate = tonumber(ARGV[i * 2 - 2])
+    local burst = tonumber(ARGV[i * 2 - 1])
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - requested
+        redis.call('HINCRBY', KEYS[1], KEYS[i] .. ':granted', requested)
+    elseif short[i] then
+        redis.call('HINCRBY', KEYS[1], KEYS[i] .. ':throttled', 1)
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now, 'rate', rate, 'burst', burst)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(burst * 1000 / rate) + 60000)
+end
+
+return wait
+"""
+
+
+class RateLimiter:
+    """
+    Redis-backed token-bucket limiter shared by all workers.
+    Sends are keyed by sender number and by client; callers block until
+    both buckets have a token, so throughput stays under the configured
+    rates instead of failing with provider 429s.
+    """
+
+    def __init__(self):
+        self.redis_conn = Redis.from_url(settings.redis_url, decode_responses=True)
+        self._script = self.redis_conn.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def _buckets(
+        self, sender: str, client_id: Optional[int]
+    ) -> List[Tuple[str, float, float]]:
+        """Get (key, rate, burst) for every bucket that applies to a send"""
+        buckets = []
+        if settings.rate_limit_sender_mps > 0:
+            rate = settings.rate_limit_sender_mps
+            buckets.append(
+                (
+                    f"{BUCKET_PREFIX}sender:{sender}",
+                    rate,
+                    max(rate * settings.rate_limit_burst_seconds, 1),
+                )
+            )
+        if client_id is not None and settings.rate_limit_client_mps > 0:
+            rate = settings.rate_limit_client_mps
+            buckets.append(
+                (
+                    f"{BUCKET_PREFIX}client:{client_id}",
+                    rate,
+                    max(rate * settings.rate_limit_burst_seconds, 1),
+                )
+            )
+        return buckets
+
+    def try_acquire(
+        self, sender: str, client_id: Optional[int] = None, tokens: int = 1
+    ) -> float:
+        """
+        Try to take tokens for a send.
+
+        Returns:
+            0 if granted, otherwise seconds to wait before trying again
+        """
+        buckets = self._buckets(sender, client_id)
+        if not settings.rate_limit_enabled or not buckets:
+            return 0
+
+        args: List = [tokens]
+        for _, rate, burst in buckets:
+            args.extend([rate, burst])
+        keys = [STATS_KEY, *(key for key, _, _ in buckets)]
+        wait_ms = self._script(keys=keys, args=args)
+        return int(wait_ms) / 1000
+
+    def wait(
+        self, sender: str, client_id: Optional[int] = None, tokens: int = 1
+    ) -> float:
+        """
+        Block until tokens are available for a send.
+        Fails open (no limiting) if Redis is unreachable.
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            try:
+                delay = self.try_acquire(sender, client_id, tokens)
+            except RedisError as e:
+                logger.warning(f"Rate limiter unavailable, sending unthrottled: {e}")
+                return waited
+            if delay <= 0:
+                break
+            time.sleep(delay)
+            waited += delay
+
+        if waited:
+            try:
+                self.redis_conn.hincrbyfloat(
+                    STATS_KEY, f"sender:{sender}:wait_seconds", waited
+                )
+            except RedisError:
+                pass
+        return waited
+
+    def collect_metrics(self) -> Sequence[str]:
+        """Render bucket levels and grant/throttle counters from Redis"""
+        try:
+            stats = self.redis_conn.hgetall(STATS_KEY)
+            bucket_keys = list(
+                self.redis_conn.scan_iter(f"{BUCKET_PREFIX}*", count=500)
+            )
+            pipe = self.redis_conn.pipeline()
+            for key in bucket_keys:
+                pipe.hmget(key, "tokens", "ts", "rate", "burst")
+            pipe.time()
+            *states, (seconds, micros) = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not collect rate limiter metrics: {e}")
+            return []
+
+        now_ms = seconds * 1000 + micros // 1000
+        levels, rates = [], []
+        for key, (tokens, ts, rate, burst) in zip(bucket_keys, states):
+            if tokens is None:
+                continue
+            refill = max(0, now_ms - float(ts)) * float(rate) / 1000
+            bucket = key.removeprefix(BUCKET_PREFIX)
+            levels.append(
+                f'sms_rate_limit_tokens{{bucket="{bucket}"}} '
+                f"{min(float(burst), float(tokens) + refill)}"
+            )
+            rates.append(f'sms_rate_limit_rate{{bucket="{bucket}"}} {rate}')
+
+        lines = [
+            "# HELP sms_rate_limit_tokens Tokens currently available in a send bucket",
+            "# TYPE sms_rate_limit_tokens gauge",
+            *levels,
+            "# HELP sms_rate_limit_rate Configured refill rate of a send bucket",
+            "# TYPE sms_rate_limit_rate gauge",
+            *rates,
+        ]
+        for suffix, name, description in (
+            (":granted", "sms_rate_limit_granted_total", "Tokens granted"),
+            (":throttled", "sms_rate_limit_throttled_total", "Acquires denied by a bucket"),
+            (":wait_seconds", "sms_rate_limit_wait_seconds_total", "Time spent waiting"),
+        ):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for field, value in stats.items():
+                if field.endswith(suffix):
+                    bucket = field[: -len(suffix)].removeprefix(BUCKET_PREFIX)
+                    lines.append(f'{name}{{bucket="{bucket}"}} {value}')
+        return lines
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
+registry.register_collector(rate_limiter.collect_metrics)
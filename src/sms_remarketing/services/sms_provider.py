@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple, List, Sequence
+import asyncio
+import concurrent.futures
+import os
+import threading
+from ..config import settings
+
+# (success, provider message SID, error message)
+SendResult = Tuple[bool, Optional[str], Optional[str]]
+
+
+class SMSProvider(ABC):
+    """
+    Interface for SMS providers.
+    Providers expose a blocking and an asyncio send; `send_many` fans out
+    async sends on a per-process transport loop for use from sync code.
+    """
+
+    from_number: str
+
+    def __init__(self):
+        # Transport loop, started lazily in the process that first uses it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_pid: Optional[int] = None
+        self._loop_lock = threading.Lock()
+
+    @abstractmethod
+    def send_sms(self, to: str, body: str) -> SendResult:
+        """
+        Send an SMS message, blocking until the provider responds.
+
+        Args:
+            to: Recipient phone number (E.164 format recommended)
+            body: Message content
+
+        Returns:
+            Tuple of (success: bool, sid: str, error_message: str)
+        """
+
+    @abstractmethod
+    async def send_sms_async(self, to: str, body: str) -> SendResult:
+        """
+        Send an SMS message without blocking.
+        Must be awaited on the transport loop (see `send_many`).
+
+        Args:
+            to: Recipient phone number (E.164 format recommended)
+            body: Message content
+
+        Returns:
+            Tuple of (success: bool, sid: str, error_message: str)
+        """
+
+    async def _on_loop_start(self):
+        """Hook to create loop-bound resources (HTTP pools, semaphores)"""
+
+    def send_many(
+        self,
+        messages: Sequence[Tuple[str, str]],
+        before_send: Optional[Callable[[int], None]] = None,
+        on_results: Optional[Callable[[List[Tuple[int, SendResult]]], None]] = None,
+    ) -> List[SendResult]:
+        """
+        Send many SMS messages concurrently from synchronous code.
+
+        Args:
+            messages: Sequence of (to, body) pairs
+            before_send: Optional blocking hook called with each message's index
+                before it is dispatched (e.g. to wait for rate limit tokens)
+            on_results: Optional hook called in this thread with the
+                (index, result) pairs of sends as they complete, in small
+                groups, so results can be stored before the rest are done
+
+        Returns:
+            List of (success, sid, error_message) tuples, in input order
+        """
+        loop = self._get_loop()
+        results: List[Optional[SendResult]] = [None] * len(messages)
+        pending: Dict[concurrent.futures.Future, int] = {}
+
+        def collect(done):
+            finished = []
+            for future in done:
+                index = pending.pop(future)
+                results[index] = future.result()
+                finished.append((index, results[index]))
+            if finished and on_results:
+                on_results(finished)
+
+        try:
+            for index, (to, body) in enumerate(messages):
+                if before_send:
+                    before_send(index)
+                future = asyncio.run_coroutine_threadsafe(
+                    self.send_sms_async(to, body), loop
+                )
+                pending[future] = index
+                # Hand back whatever completed while waiting to dispatch
+                collect([future for future in pending if future.done()])
+        finally:
+            # Dispatched sends go out either way, so their results are
+            # reported even if dispatching the rest failed
+            while pending:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                collect(done)
+        return results
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the transport event loop, starting it on a daemon thread if needed"""
+        with self._loop_lock:
+            # Threads don't survive fork (RQ work horses), so restart per process
+            if self._loop is None or self._loop_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever,
+                    name=f"{type(self).__name__}-transport",
+                    daemon=True,
+                ).start()
+                asyncio.run_coroutine_threadsafe(self._on_loop_start(), loop).result()
+                self._loop = loop
+                self._loop_pid = os.getpid()
+            return self._loop
+
+
+@lru_cache
+def get_sms_provider() -> SMSProvider:
+    """Get the SMS provider selected by the `sms_provider` setting"""
+    if settings.sms_provider == "twilio":
+        from .twilio_service import TwilioService
+
+        return TwilioService()
+    if settings.sms_provider == "fake":
+        from .fake_provider import FakeSMSProvider
+
+        return FakeSMSProvider()
+    raise ValueError(f"Unknown SMS provider: {settings.sms_provider}")
@@ -1,16 +1,37 @@
+from sqlalchemy import Select, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from itertools import batched
+from typing import Optional, Dict, Any, Tuple
+import asyncio
 import logging
-from ..models import Client, Lead, Template, Message
-from ..models.message import MessageStatus
-from .twilio_service import twilio_service
+from ..models import Client, Lead, Template, Message, MessageBatch, OutboxEntry
+from ..models.message import MessageStatus, MessageOrigin
+from .sms_provider import SendResult, get_sms_provider
+from .rate_limiter import rate_limiter
+from .credit_cache import credit_cache
 
 logger = logging.getLogger(__name__)
 
+# Number of Message rows written per INSERT statement when sending a batch
+BATCH_INSERT_CHUNK_SIZE = 1000
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
 
 class SMSService:
-    """Service for managing SMS sending with credit management"""
+    """
+    Service for managing SMS sending with credit management.
+    The `*_async` methods serve the API: database work runs on the async
+    session's connection, provider and credit cache calls run in worker
+    threads, so the event loop never blocks on them.
+    """
 
     @staticmethod
     def send_sms(
@@ -20,6 +41,9 @@ class SMSService:
         content: str,
         template: Optional[Template] = None,
         async_send: bool = True,
+        origin: MessageOrigin = MessageOrigin.API,
+        send_at: Optional[datetime] = None,
+        idempotency_key: Optional[str] = None,
     ) -> Message:
         """
         Send an SMS message to a lead.
@@ -32,55 +56,216 @@ class SMSService:
             content: The message content
             template: Optional template used
             async_send: If True, queue for async sending (default). If False, send immediately.
+            origin: Where the message came from, selects its priority lane
+            send_at: Optional time to send at, released by the scheduler
+            idempotency_key: Optional request key; a retry with the same key
+                returns the original message instead of sending again
 
         Returns:
             Message object
 
         Raises:
-            ValueError: If client has insufficient credits
+            ValueError: If client has insufficient credits, or a scheduled
+                send can't be queued
         """
-        # Check credits
-        if not client.has_credits(1):
-            raise ValueError("Insufficient credits")
-
-        # Create message record
-        message = Message(
-            client_id=client.id,
-            lead_id=lead.id,
-            template_id=template.id if template else None,
-            to_number=lead.phone_number,
-            content=content,
-            status=MessageStatus.PENDING,
+        existing = SMSService._check_send(
+            db, client, async_send, send_at, idempotency_key
         )
-        db.add(message)
-        db.flush()
+        if existing:
+            return existing
 
-        # Deduct credit
-        client.deduct_credits(1)
+        # Reserve the credit before writing anything (a Redis call when the
+        # credit cache is up); every failure below gives it back
+        credit_cache.reserve(db, client.id, 1)
+        try:
+            message, send_now, duplicate = SMSService._create_message(
+                db,
+                client,
+                lead,
+                content,
+                template,
+                async_send,
+                origin,
+                send_at,
+                idempotency_key,
+            )
+        except Exception:
+            credit_cache.refund(db, client.id, 1)
+            raise
+        if duplicate:
+            credit_cache.refund(db, client.id, 1)
+        if send_now:
+            result = SMSService._deliver(message.to_number, message.content, client.id)
+            SMSService._record_result(db, message, *result)
+        return message
 
-        # Queue for async sending or send immediately
-        if async_send:
-            from .queue_service import queue_service
+    @staticmethod
+    async def send_sms_async(
+        db: AsyncSession,
+        client: Client,
+        lead: Lead,
+        content: str,
+        template: Optional[Template] = None,
+        async_send: bool = True,
+        origin: MessageOrigin = MessageOrigin.API,
+        send_at: Optional[datetime] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Message:
+        """Async version of `send_sms`, see there for arguments"""
+        existing = await db.run_sync(
+            SMSService._check_send, client, async_send, send_at, idempotency_key
+        )
+        if existing:
+            return existing
 
-            if queue_service.is_available():
-                # Queue for background processing
-                message.status = MessageStatus.QUEUED
-                db.commit()
-                db.refresh(message)
+        await credit_cache.reserve_async(client.id, 1)
+        try:
+            message, send_now, duplicate = await db.run_sync(
+                SMSService._create_message,
+                client,
+                lead,
+                content,
+                template,
+                async_send,
+                origin,
+                send_at,
+                idempotency_key,
+            )
+        except Exception:
+            await credit_cache.refund_async(client.id, 1)
+            raise
+        if duplicate:
+            await credit_cache.refund_async(client.id, 1)
+        if send_now:
+            result = await asyncio.to_thread(
+                SMSService._deliver, message.to_number, message.content, client.id
+            )
+            await db.run_sync(SMSService._record_result, message, *result)
+        return message
 
-                job_id = queue_service.enqueue_sms(message.id)
-                logger.info(f"Message {message.id} queued for async sending (job: {job_id})")
-                return message
-            else:
-                # Redis unavailable, fall through to sync sending
-                logger.warning("Redis unavailable, sending synchronously")
+    @staticmethod
+    def _check_send(
+        db: Session,
+        client: Client,
+        async_send: bool,
+        send_at: Optional[datetime],
+        idempotency_key: Optional[str],
+    ) -> Optional[Message]:
+        """
+        Check a send can go ahead before any credit is reserved.
 
-        # Send synchronously (either requested or Redis unavailable)
-        success, twilio_sid, error_message = twilio_service.send_sms(
-            to=lead.phone_number, body=content
-        )
+        Returns:
+            The message of an earlier request with the same idempotency key
+        """
+        from .queue_service import queue_service
+        from .idempotency_service import idempotency_service
 
-        # Update message status
+        if idempotency_key:
+            existing = idempotency_service.find_message(db, client.id, idempotency_key)
+            if existing:
+                return existing
+
+        if send_at is not None and not (async_send and queue_service.is_available()):
+            raise ValueError("Scheduled sends require the message queue")
+        return None
+
+    @staticmethod
+    def _create_message(
+        db: Session,
+        client: Client,
+        lead: Lead,
+        content: str,
+        template: Optional[Template],
+        async_send: bool,
+        origin: MessageOrigin,
+        send_at: Optional[datetime],
+        idempotency_key: Optional[str],
+    ) -> Tuple[Message, bool, bool]:
+        """
+        Commit the message, queued when possible. The caller has reserved its
+        credit and gives it back if this raises or returns a duplicate.
+
+        Returns:
+            The message, whether it still has to be sent synchronously, and
+            whether it is the message of a concurrent request with the same
+            idempotency key
+        """
+        from .queue_service import queue_service
+        from .idempotency_service import idempotency_service
+
+        if send_at is not None:
+            send_at = _as_utc(send_at)
+
+        try:
+            # Create message record
+            message = Message(
+                client_id=client.id,
+                lead_id=lead.id,
+                template_id=template.id if template else None,
+                to_number=lead.phone_number,
+                content=content,
+                status=MessageStatus.PENDING,
+                origin=origin,
+                send_at=send_at,
+            )
+            db.add(message)
+            db.flush()
+
+            # Claimed before anything is sent; a concurrent retry rolls this back
+            if idempotency_key:
+                existing = idempotency_service.claim(
+                    db, client.id, idempotency_key, message
+                )
+                if existing:
+                    return existing, False, True
+
+            # Queue for async sending or send immediately
+            if async_send:
+                if queue_service.is_available():
+                    # The outbox entry commits with the message; the relay enqueues it
+                    message.status = MessageStatus.QUEUED
+                    db.add(
+                        OutboxEntry(
+                            message_id=message.id,
+                            message_created_at=message.created_at,
+                            client_id=client.id,
+                            origin=origin,
+                            send_at=send_at,
+                        )
+                    )
+                    db.commit()
+                    db.refresh(message)
+
+                    logger.info(f"Message {message.id} queued for async sending")
+                    return message, False, False
+                else:
+                    # Redis unavailable, fall through to sync sending
+                    logger.warning("Redis unavailable, sending synchronously")
+
+            # Send synchronously (either requested or Redis unavailable)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return message, True, False
+
+    @staticmethod
+    def _deliver(to: str, body: str, client_id: int) -> SendResult:
+        """Send through the provider, blocking on rate limits"""
+        provider = get_sms_provider()
+        rate_limiter.wait(provider.from_number, client_id)
+        return provider.send_sms(to=to, body=body)
+
+    @staticmethod
+    def _record_result(
+        db: Session,
+        message: Message,
+        success: bool,
+        twilio_sid: Optional[str],
+        error_message: Optional[str],
+    ):
+        """Store the outcome of a synchronous send"""
         if success:
             message.status = MessageStatus.SENT
             message.twilio_sid = twilio_sid
@@ -94,7 +279,218 @@ class SMSService:
         db.commit()
         db.refresh(message)
 
-        return message
+    @staticmethod
+    def send_batch(
+        db: Session,
+        client: Client,
+        template: Template,
+        leads: Select,
+        variables: Optional[Dict[str, Any]] = None,
+        send_at: Optional[datetime] = None,
+        spread_seconds: Optional[int] = None,
+        origin: MessageOrigin = MessageOrigin.CAMPAIGN,
+        defaults: Optional[Dict[str, Any]] = None,
+    ) -> MessageBatch:
+        """
+        Send a templated SMS to every lead matched by a query.
+        Credits are reserved once for the whole batch (and refunded if the
+        insert fails), messages and their outbox entries are inserted in
+        chunks and committed together.
+
+        Args:
+            db: Database session
+            client: The client sending the messages
+            template: The template rendered for each lead
+            leads: Statement selecting the leads to send to
+            variables: Extra variables applied on top of each lead's fields
+            send_at: Optional time to start sending at
+            spread_seconds: Optional window to spread sends evenly over,
+                starting at send_at (or now)
+            origin: Where the messages came from, selects the priority lane
+            defaults: Extra variables each lead's own fields take precedence over
+
+        Returns:
+            MessageBatch object
+
+        Raises:
+            ValueError: If no leads match or client has insufficient credits
+        """
+        total = SMSService._count_leads(db, leads)
+
+        # Reserve credits for the whole batch up front in one call
+        credit_cache.reserve(db, client.id, total)
+        try:
+            batch = SMSService._insert_batch(
+                db,
+                client,
+                template,
+                leads,
+                total,
+                variables,
+                send_at,
+                spread_seconds,
+                origin,
+                defaults,
+            )
+        except Exception:
+            credit_cache.refund(db, client.id, total)
+            raise
+
+        # Leads deleted between the count and the insert don't consume credits
+        if batch.total_messages < total:
+            credit_cache.refund(db, client.id, total - batch.total_messages)
+        return batch
+
+    @staticmethod
+    async def send_batch_async(
+        db: AsyncSession,
+        client: Client,
+        template: Template,
+        leads: Select,
+        variables: Optional[Dict[str, Any]] = None,
+        send_at: Optional[datetime] = None,
+        spread_seconds: Optional[int] = None,
+        origin: MessageOrigin = MessageOrigin.CAMPAIGN,
+        defaults: Optional[Dict[str, Any]] = None,
+    ) -> MessageBatch:
+        """Async version of `send_batch`, see there for arguments"""
+        total = await db.run_sync(SMSService._count_leads, leads)
+
+        await credit_cache.reserve_async(client.id, total)
+        try:
+            batch = await db.run_sync(
+                SMSService._insert_batch,
+                client,
+                template,
+                leads,
+                total,
+                variables,
+                send_at,
+                spread_seconds,
+                origin,
+                defaults,
+            )
+        except Exception:
+            await credit_cache.refund_async(client.id, total)
+            raise
+
+        if batch.total_messages < total:
+            await credit_cache.refund_async(client.id, total - batch.total_messages)
+        return batch
+
+    @staticmethod
+    def _count_leads(db: Session, leads: Select) -> int:
+        total = db.scalar(
+            select(func.count()).select_from(leads.order_by(None).subquery())
+        )
+        if total == 0:
+            raise ValueError("No leads matched")
+        return total
+
+    @staticmethod
+    def _insert_batch(
+        db: Session,
+        client: Client,
+        template: Template,
+        leads: Select,
+        total: int,
+        variables: Optional[Dict[str, Any]],
+        send_at: Optional[datetime],
+        spread_seconds: Optional[int],
+        origin: MessageOrigin,
+        defaults: Optional[Dict[str, Any]],
+    ) -> MessageBatch:
+        """
+        Commit the batch with its messages and outbox entries, for at most
+        `total` leads. The caller has reserved `total` credits and gives back
+        what the batch didn't use.
+        """
+        try:
+            batch = MessageBatch(
+                client_id=client.id, template_id=template.id, total_messages=total
+            )
+            db.add(batch)
+            db.flush()
+
+            # Scheduled time of the n-th message, if any
+            start = _as_utc(send_at) if send_at else None
+            if spread_seconds:
+                start = start or datetime.now(timezone.utc)
+                step = timedelta(seconds=spread_seconds / total)
+            else:
+                step = timedelta(0)
+
+            # Chunks are rendered together, with their SMS segment counts
+            compiled = template.compiled()
+            total_segments = 0
+            message_ids = []
+            # Only as many leads as were counted and reserved for; ones added
+            # since are left to the next send
+            lead_rows = db.scalars(
+                leads.limit(total).execution_options(
+                    yield_per=BATCH_INSERT_CHUNK_SIZE
+                )
+            )
+            for chunk in batched(lead_rows, BATCH_INSERT_CHUNK_SIZE):
+                rendered = compiled.render_batch(
+                    Lead.template_columns(chunk, defaults), len(chunk), variables
+                )
+                total_segments += rendered.total_segments
+                rows = []
+                for lead, content in zip(chunk, rendered.contents):
+                    message_send_at = None
+                    if start:
+                        message_send_at = start + step * (len(message_ids) + len(rows))
+                    rows.append(
+                        {
+                            "client_id": client.id,
+                            "lead_id": lead.id,
+                            "template_id": template.id,
+                            "batch_id": batch.id,
+                            "to_number": lead.phone_number,
+                            "content": content,
+                            "status": MessageStatus.QUEUED,
+                            "origin": origin,
+                            "send_at": message_send_at,
+                        }
+                    )
+                inserted = db.execute(
+                    insert(Message).returning(
+                        Message.id, Message.created_at, sort_by_parameter_order=True
+                    ),
+                    rows,
+                ).all()
+                db.execute(
+                    insert(OutboxEntry),
+                    [
+                        {
+                            "message_id": message_id,
+                            "message_created_at": created_at,
+                            "client_id": client.id,
+                            "origin": origin,
+                            "send_at": row["send_at"],
+                        }
+                        for (message_id, created_at), row in zip(inserted, rows)
+                    ],
+                )
+                message_ids.extend(message_id for message_id, _ in inserted)
+
+            if len(message_ids) < total:
+                batch.total_messages = len(message_ids)
+            batch.total_segments = total_segments
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        db.refresh(batch)
+
+        logger.info(
+            f"Batch {batch.id} queued {batch.total_messages} messages "
+            f"({batch.total_segments} segments) for client {client.id}"
+        )
+        return batch
 
 
 sms_service = SMSService()
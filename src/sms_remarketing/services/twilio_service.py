@@ -1,17 +1,29 @@
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 from ..config import settings
-from typing import Optional, Tuple
+from typing import Optional
+import asyncio
+import httpx
+from .sms_provider import SMSProvider, SendResult
 
 
-class TwilioService:
+class TwilioService(SMSProvider):
     """Service for sending SMS messages via Twilio"""
 
     def __init__(self):
+        super().__init__()
         self.client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
         self.from_number = settings.twilio_phone_number
+        self.messages_url = (
+            f"{settings.twilio_api_base_url}/2010-04-01/Accounts/"
+            f"{settings.twilio_account_sid}/Messages.json"
+        )
 
-    def send_sms(self, to: str, body: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        # Created on the transport loop
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def send_sms(self, to: str, body: str) -> SendResult:
         """
         Send an SMS message via Twilio.
 
@@ -34,6 +46,43 @@ class TwilioService:
             error_msg = f"Unexpected error: {str(e)}"
             return False, None, error_msg
 
+    async def send_sms_async(self, to: str, body: str) -> SendResult:
+        """
+        Send an SMS message via the Twilio REST API without blocking.
+        Requests share one keep-alive connection pool and at most
+        `twilio_max_concurrency` are in flight at once.
+
+        Args:
+            to: Recipient phone number (E.164 format recommended)
+            body: Message content
+
+        Returns:
+            Tuple of (success: bool, twilio_sid: str, error_message: str)
+        """
+        try:
+            async with self._semaphore:
+                response = await self._http.post(
+                    self.messages_url,
+                    data={"To": to, "From": self.from_number, "Body": body},
+                )
+            payload = response.json()
+            if response.is_error:
+                message = payload.get("message") or response.reason_phrase
+                return False, None, f"Twilio error: {message}"
+            return True, payload["sid"], None
+        except Exception as e:
+            error_msg = f"Unexpected error: {str(e)}"
+            return False, None, error_msg
 
-# Singleton instance
-twilio_service = TwilioService()
+    async def _on_loop_start(self):
+        """Create the pooled HTTP client on the transport loop"""
+        concurrency = settings.twilio_max_concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._http = httpx.AsyncClient(
+            auth=(settings.twilio_account_sid, settings.twilio_auth_token),
+            timeout=settings.twilio_http_timeout,
+            limits=httpx.Limits(
+                max_connections=concurrency,
+                max_keepalive_connections=concurrency,
+            ),
+        )
@@ -0,0 +1,233 @@
+"""
+Compiled SMS templates.
+Template content is split once into literal text and {{placeholder}}
+segments, so rendering for a lead is one dict lookup per placeholder and a
+single join. Compiled templates are kept in a per-process LRU keyed by
+(template id, updated_at); editing a template changes updated_at, so stale
+entries are never hit and simply age out.
+
+Campaigns render a whole chunk of leads at once from columns of variables,
+measuring each message's encoding (GSM-7 or UCS-2) and segment count in the
+same pass.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import repeat
+from math import inf
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import re
+import threading
+from .config import settings
+from .metrics import registry
+
+# Like the str.replace() rendering this replaced, a given variable fills
+# {{name}} whatever the name looks like (custom fields may be "a.b" or
+# "first name"); only word names are listed as the template's variables.
+PLACEHOLDER = re.compile(r"\{\{([^{}]+)\}\}")
+VARIABLE_NAME = re.compile(r"\w+")
+
+CacheKey = Tuple[int, Optional[datetime]]
+
+# Column entry for a row that has no value for the variable
+MISSING = object()
+
+GSM7 = "GSM-7"
+UCS2 = "UCS-2"
+
+# GSM 03.38 default alphabet, one septet each
+GSM7_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Extension table, an escape septet plus one each
+GSM7_EXTENDED = "^{}\\[~]|€\f"
+GSM7_CHARACTERS = GSM7_BASIC.union(GSM7_EXTENDED)
+
+# (single message, per segment of a multipart message) capacity, the rest of
+# a multipart segment holds the concatenation header
+SEGMENT_CAPACITY = {GSM7: (160, 153), UCS2: (70, 67)}
+
+
+def gsm7_length(text: str) -> Optional[int]:
+    """Septets needed to send text in GSM-7, or None if it needs UCS-2"""
+    if GSM7_BASIC.issuperset(text):
+        return len(text)
+    if not GSM7_CHARACTERS.issuperset(text):
+        return None
+    return len(text) + sum(map(text.count, GSM7_EXTENDED))
+
+
+def _septets(text: str) -> float:
+    length = gsm7_length(text)
+    return inf if length is None else length
+
+
+def ucs2_length(text: str) -> int:
+    """UTF-16 code units needed to send text in UCS-2"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def segment_count(length: int, encoding: str) -> int:
+    """Segments of a message of `length` septets (GSM-7) or code units (UCS-2)"""
+    single, multipart = SEGMENT_CAPACITY[encoding]
+    if length <= single:
+        return 1
+    return -(-length // multipart)
+
+
+@dataclass
+class RenderedBatch:
+    """Messages rendered by `CompiledTemplate.render_batch`, as columns"""
+
+    contents: List[str] = field(default_factory=list)
+    encodings: List[str] = field(default_factory=list)
+    segments: List[int] = field(default_factory=list)
+
+    @property
+    def total_segments(self) -> int:
+        return sum(self.segments)
+
+
+class CompiledTemplate:
+    """Template content pre-split into literal and placeholder segments"""
+
+    __slots__ = ("source", "segments", "placeholders")
+
+    def __init__(self, source: str):
+        self.source = source
+        # split() alternates literal text and captured placeholder names
+        parts = PLACEHOLDER.split(source)
+        self.segments: List[str] = []
+        # (index in segments, variable name) of each placeholder
+        self.placeholders: List[Tuple[int, str]] = []
+        for index, part in enumerate(parts):
+            if index % 2:
+                self.placeholders.append((len(self.segments), part))
+                # Kept as written when the variable isn't given
+                self.segments.append(f"{{{{{part}}}}}")
+            elif part:
+                self.segments.append(part)
+
+    @property
+    def variables(self) -> List[str]:
+        """Variable names (`{{word}}` placeholders) in order of appearance"""
+        return [
+            name for _, name in self.placeholders if VARIABLE_NAME.fullmatch(name)
+        ]
+
+    def render(self, variables: Mapping[str, Any]) -> str:
+        """Substitute the given variables, leaving unknown placeholders as is"""
+        segments = self.segments.copy()
+        for index, name in self.placeholders:
+            if name in variables:
+                segments[index] = str(variables[name])
+        return "".join(segments)
+
+    def render_batch(
+        self,
+        columns: Mapping[str, Sequence[Any]],
+        count: int,
+        variables: Optional[Mapping[str, Any]] = None,
+    ) -> RenderedBatch:
+        """
+        Render `count` messages from columns of per-row variables.
+        Values in `variables` apply to every row and win over the columns; a
+        MISSING column entry leaves the placeholder as written for that row.
+        Each distinct value is measured once and rows are joined column-wise,
+        so the per-row work is a join and a sum.
+        """
+        variables = variables or {}
+        names = dict(self.placeholders)
+        # Texts of each segment by row, and GSM-7 septets of the varying ones
+        # (inf when a text needs UCS-2)
+        text_columns: List[Iterable[str]] = []
+        septet_columns: List[List[float]] = []
+        fixed: List[str] = []
+        measured: Dict[str, Tuple[List[str], List[float]]] = {}
+        septets_of: Dict[str, float] = {}
+        for index, segment in enumerate(self.segments):
+            name = names.get(index)
+            if name in variables:
+                segment = str(variables[name])
+            elif name in columns:
+                if name not in measured:
+                    texts = [
+                        segment if value is MISSING else str(value)
+                        for value in columns[name]
+                    ]
+                    for text in set(texts).difference(septets_of):
+                        septets_of[text] = _septets(text)
+                    measured[name] = (texts, list(map(septets_of.__getitem__, texts)))
+                texts, septets = measured[name]
+                text_columns.append(texts)
+                septet_columns.append(septets)
+                continue
+            text_columns.append(repeat(segment, count))
+            fixed.append(segment)
+
+        if text_columns:
+            contents = list(map("".join, zip(*text_columns)))
+        else:
+            contents = [""] * count
+        fixed_septets = _septets("".join(fixed))
+        if septet_columns:
+            row_septets = map(sum, zip(*septet_columns))
+        else:
+            row_septets = repeat(0, count)
+
+        rendered = RenderedBatch(contents=contents)
+        for content, septets in zip(contents, row_septets):
+            septets += fixed_septets
+            if septets != inf:
+                rendered.encodings.append(GSM7)
+                rendered.segments.append(segment_count(septets, GSM7))
+            else:
+                rendered.encodings.append(UCS2)
+                rendered.segments.append(segment_count(ucs2_length(content), UCS2))
+        return rendered
+
+
+class TemplateCache:
+    """Per-process LRU of compiled templates"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries: "OrderedDict[CacheKey, CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Only misses are counted, hits are on the per-lead render path
+        self.compiles = registry.counter(
+            "sms_template_compiles_total", "Templates compiled on a cache miss"
+        )
+
+    def get(
+        self, template_id: Optional[int], updated_at: Optional[datetime], content: str
+    ) -> CompiledTemplate:
+        """Compiled form of a template's content, compiling it on a miss"""
+        if template_id is None:
+            # Not saved yet, so there is no stable key
+            return CompiledTemplate(content)
+
+        key = (template_id, updated_at)
+        with self._lock:
+            compiled = self._entries.get(key)
+            # Content edited in this session but not flushed has the old key
+            if compiled is not None and compiled.source == content:
+                self._entries.move_to_end(key)
+                return compiled
+
+        self.compiles.inc()
+        compiled = CompiledTemplate(content)
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+template_cache = TemplateCache(settings.template_cache_size)
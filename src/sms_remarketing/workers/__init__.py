@@ -1,3 +1,11 @@
-from .trigger_processor import process_new_lead_triggers, process_lead_age_triggers
+from .trigger_processor import (
+    process_new_lead_triggers,
+    process_imported_lead_triggers,
+    process_lead_age_triggers,
+)
 
-__all__ = ["process_new_lead_triggers", "process_lead_age_triggers"]
+__all__ = [
+    "process_new_lead_triggers",
+    "process_imported_lead_triggers",
+    "process_lead_age_triggers",
+]
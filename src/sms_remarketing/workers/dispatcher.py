@@ -0,0 +1,186 @@
+"""
+Fair dispatcher moving queued chunks from per-client sub-queues into RQ.
+Run this with: python -m sms_remarketing.workers.dispatcher
+
+Each fair lane (`fair_queue_lanes`) is served with deficit round-robin:
+every round, each active client earns `fair_queue_quantum * queue_weight`
+messages of credit and has chunks moved to the RQ lane while its credit
+covers them. The lane is only topped up to `fair_queue_target_depth` jobs,
+so a large campaign waits in its own sub-queue instead of in front of
+every other client's messages.
+"""
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from typing import Dict, List
+from ..config import settings
+from ..metrics import registry
+from ..database import SessionLocal
+from ..models import Client
+from ..services.queue_service import (
+    queue_service,
+    tenant_queue_key,
+    active_tenants_key,
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Seconds a dispatcher holds a lane before another instance may take over
+LOCK_TTL = 10
+# Seconds client weights are cached
+WEIGHT_CACHE_TTL = 30
+
+# Drop a client from the active set only if its sub-queue is still empty
+DEACTIVATE_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+
+class FairDispatcher:
+    """Deficit round-robin across the clients of one lane"""
+
+    def __init__(self, lane: str):
+        self.lane = lane
+        self.queue = queue_service.queues[lane]
+        self.redis_conn = queue_service.redis_conn
+        self.lock_key = f"sms:dispatcher:{lane}:lock"
+        self.lock_token = f"{socket.gethostname()}:{os.getpid()}"
+        self.order: deque = deque()
+        self.deficits: Dict[int, float] = {}
+        self.weights: Dict[int, int] = {}
+        self.weights_loaded_at = 0.0
+        self._deactivate = self.redis_conn.register_script(DEACTIVATE_SCRIPT)
+
+    def acquire_lock(self) -> bool:
+        """Make sure only one dispatcher serves this lane"""
+        if self.redis_conn.set(self.lock_key, self.lock_token, nx=True, ex=LOCK_TTL):
+            return True
+        if self.redis_conn.get(self.lock_key) == self.lock_token.encode():
+            self.redis_conn.expire(self.lock_key, LOCK_TTL)
+            return True
+        return False
+
+    def _load_weights(self, client_ids: List[int]):
+        """Refresh client weights from the database"""
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Client.id, Client.queue_weight)
+                .filter(Client.id.in_(client_ids))
+                .all()
+            )
+            self.weights = {client_id: weight for client_id, weight in rows}
+            self.weights_loaded_at = time.monotonic()
+        finally:
+            db.close()
+
+    def _sync_active(self) -> List[int]:
+        """Align the round-robin order with the set of active clients"""
+        active = {
+            int(client_id)
+            for client_id in self.redis_conn.smembers(active_tenants_key(self.lane))
+        }
+        for client_id in list(self.order):
+            if client_id not in active:
+                self.order.remove(client_id)
+                self.deficits.pop(client_id, None)
+        for client_id in active - set(self.order):
+            self.order.append(client_id)
+
+        stale = time.monotonic() - self.weights_loaded_at > WEIGHT_CACHE_TTL
+        if active and (stale or not active <= set(self.weights)):
+            self._load_weights(list(active))
+        return list(self.order)
+
+    def run_once(self) -> int:
+        """
+        Run one round-robin round.
+
+        Returns:
+            Number of jobs moved into the RQ lane
+        """
+        room = settings.fair_queue_target_depth - self.queue.count
+        if room <= 0:
+            return 0
+
+        moved = 0
+        for _ in range(len(self._sync_active())):
+            if moved >= room:
+                break
+            client_id = self.order[0]
+            self.order.rotate(-1)
+            key = tenant_queue_key(self.lane, client_id)
+            weight = max(self.weights.get(client_id, 1), 1)
+            self.deficits[client_id] = (
+                self.deficits.get(client_id, 0) + settings.fair_queue_quantum * weight
+            )
+
+            while moved < room:
+                raw = self.redis_conn.lindex(key, 0)
+                if raw is None:
+                    # Idle clients don't bank credit
+                    self.deficits[client_id] = 0
+                    self._deactivate(
+                        keys=[key, active_tenants_key(self.lane)], args=[client_id]
+                    )
+                    break
+
+                chunk = json.loads(raw)
+                cost = len(chunk["ids"])
+                if cost > self.deficits[client_id]:
+                    break
+
+                # Create the job and pop the chunk atomically; chunks queued
+                # before created_at was stored have none
+                created_at = chunk.get("created_at") or [None] * cost
+                job_data = queue_service.prepare_job(
+                    list(zip(chunk["ids"], created_at)), client_id, chunk["queued_at"]
+                )
+                with self.redis_conn.pipeline(transaction=True) as pipe:
+                    self.queue.enqueue_many([job_data], pipeline=pipe)
+                    pipe.lpop(key)
+                    pipe.execute()
+
+                self.deficits[client_id] -= cost
+                moved += 1
+
+        return moved
+
+
+def main():
+    """Main dispatcher loop"""
+    if not queue_service.is_available():
+        raise RuntimeError("Redis is required for the fair dispatcher")
+
+    dispatchers = [FairDispatcher(lane) for lane in settings.fair_queue_lanes]
+    logger.info(f"Starting fair dispatcher for lanes {settings.fair_queue_lanes}")
+    logger.info("Press Ctrl+C to stop")
+    registry.start_flushing(settings.metrics_flush_interval_seconds)
+
+    while True:
+        moved = 0
+        for dispatcher in dispatchers:
+            try:
+                if dispatcher.acquire_lock():
+                    moved += dispatcher.run_once()
+            except Exception as e:
+                logger.error(
+                    f"Error dispatching lane {dispatcher.lane}: {e}", exc_info=True
+                )
+        if not moved:
+            time.sleep(settings.fair_queue_poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,58 +3,166 @@ Background jobs for RQ workers.
 These functions are executed by the RQ worker process.
 """
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Set, Tuple
+from sqlalchemy import ColumnElement, Row, true, update
+from sqlalchemy.orm import Session
+from rq import get_current_job
 from ..database import SessionLocal
 from ..models import Message
 from ..models.message import MessageStatus
-from ..services.twilio_service import twilio_service
+from ..services.sms_provider import SendResult, get_sms_provider
+from ..services.rate_limiter import rate_limiter
+from ..services.queue_service import queue_service
 
 logger = logging.getLogger(__name__)
 
 
-def send_sms_job(message_id: int):
-    """
-    Background job to send an SMS message via Twilio.
+def _observe_queue_wait():
+    """Record how long the current job waited between enqueue and start"""
+    job = get_current_job()
+    if job is None or not job.meta.get("queued_at"):
+        return
+    queue_service.queue_wait.observe(
+        time.time() - job.meta["queued_at"],
+        queue=job.origin,
+        client=job.meta.get("client_id") or "",
+    )
 
-    Args:
-        message_id: The ID of the message to send
 
-    This job is executed by the RQ worker.
+def _created_between(created_at: Sequence[Optional[datetime]]) -> ColumnElement:
     """
-    db = SessionLocal()
-    try:
-        # Get message
-        message = db.query(Message).filter(Message.id == message_id).first()
+    Bound messages to the creation times of a job's messages. Postgres then
+    only scans the month partitions in between, not every one of `messages`.
+    """
+    if not created_at or None in created_at:
+        return true()
+    return Message.created_at.between(min(created_at), max(created_at))
 
-        if not message:
-            logger.error(f"Message {message_id} not found in database")
-            return {"status": "error", "message": "Message not found"}
 
-        if message.status != MessageStatus.QUEUED:
-            logger.warning(
-                f"Message {message_id} has status {message.status}, skipping send"
-            )
-            return {"status": "skipped", "message": f"Message status is {message.status}"}
+def _from_epoch(
+    created_at: Optional[Sequence[Optional[float]]], count: int
+) -> List[Optional[datetime]]:
+    """created_at of a job's messages as datetimes, None where unknown"""
+    if created_at is None:
+        return [None] * count
+    return [
+        datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+        for value in created_at
+    ]
 
-        # Send via Twilio
-        logger.info(f"Sending SMS {message_id} to {message.to_number}")
-        success, twilio_sid, error_message = twilio_service.send_sms(
-            to=message.to_number, body=message.content
+
+def _claim(
+    db: Session, message_ids: List[int], created_at: List[Optional[datetime]]
+) -> List[Row]:
+    """
+    Mark queued messages as SENDING and return what is needed to send them.
+    Copies of the same job (RQ retries, duplicates from the at-least-once
+    relay, scheduler or dispatcher) only get messages nobody claimed yet.
+    """
+    claimed = db.execute(
+        update(Message)
+        .where(
+            Message.id.in_(message_ids),
+            _created_between(created_at),
+            Message.status == MessageStatus.QUEUED,
+        )
+        .values(status=MessageStatus.SENDING)
+        .returning(
+            Message.id,
+            Message.created_at,
+            Message.client_id,
+            Message.to_number,
+            Message.content,
         )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return claimed
 
-        # Update message status
+
+def _record(db: Session, results: List[Tuple[Row, SendResult]]):
+    """Store provider results of claimed messages"""
+    now = datetime.utcnow()
+    updates = []
+    for message, (success, twilio_sid, error_message) in results:
+        updates.append(
+            {
+                "id": message.id,
+                "created_at": message.created_at,
+                "status": MessageStatus.SENT if success else MessageStatus.FAILED,
+                "twilio_sid": twilio_sid,
+                "sent_at": now if success else None,
+                "error_message": error_message,
+            }
+        )
         if success:
-            message.status = MessageStatus.SENT
-            message.twilio_sid = twilio_sid
-            message.sent_at = datetime.utcnow()
-            logger.info(f"SMS {message_id} sent successfully (SID: {twilio_sid})")
+            logger.info(f"SMS {message.id} sent successfully (SID: {twilio_sid})")
         else:
-            message.status = MessageStatus.FAILED
-            message.error_message = error_message
-            logger.error(f"SMS {message_id} failed: {error_message}")
+            logger.error(f"SMS {message.id} failed: {error_message}")
+    db.execute(update(Message), updates)
+    db.commit()
+
+
+def _release(db: Session, unsent: List[Row], unknown: List[Row], error: Exception):
+    """
+    Settle claimed messages without a stored result after a job error.
+    Ones never dispatched go back to QUEUED for the job's retry; ones that
+    may have reached the provider are failed rather than risk a second send.
+    """
+    db.rollback()
+    for messages, values in (
+        (unsent, {"status": MessageStatus.QUEUED}),
+        (
+            unknown,
+            {"status": MessageStatus.FAILED, "error_message": f"Job error: {error}"},
+        ),
+    ):
+        if messages:
+            db.execute(
+                update(Message)
+                .where(
+                    Message.id.in_([message.id for message in messages]),
+                    _created_between([message.created_at for message in messages]),
+                    Message.status == MessageStatus.SENDING,
+                )
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+
+
+def send_sms_job(message_id: int, created_at: Optional[float] = None):
+    """
+    Background job to send an SMS message via the configured provider.
+
+    Args:
+        message_id: The ID of the message to send
+        created_at: Its created_at in epoch seconds, if known
+
+    This job is executed by the RQ worker.
+    """
+    _observe_queue_wait()
+    db = SessionLocal()
+    claimed: List[Row] = []
+    dispatched = False
+    try:
+        claimed = _claim(db, [message_id], _from_epoch([created_at], 1))
+        if not claimed:
+            logger.warning(f"Message {message_id} not found or not queued, skipping send")
+            return {"status": "skipped", "message": "Message not found or not queued"}
+        message = claimed[0]
 
-        db.commit()
+        # Send via provider, within the sender and client rate limits
+        provider = get_sms_provider()
+        rate_limiter.wait(provider.from_number, message.client_id)
+        logger.info(f"Sending SMS {message_id} to {message.to_number}")
+        dispatched = True
+        result = provider.send_sms(to=message.to_number, body=message.content)
+        _record(db, [(message, result)])
 
+        success, twilio_sid, error_message = result
         return {
             "status": "success" if success else "failed",
             "message_id": message_id,
@@ -64,17 +172,103 @@ def send_sms_job(message_id: int):
 
     except Exception as e:
         logger.error(f"Error sending SMS {message_id}: {e}", exc_info=True)
-
-        # Try to update message status to failed
         try:
-            message = db.query(Message).filter(Message.id == message_id).first()
-            if message:
-                message.status = MessageStatus.FAILED
-                message.error_message = f"Job error: {str(e)}"
-                db.commit()
-        except:
-            pass
+            if dispatched:
+                _release(db, [], claimed, e)
+            else:
+                _release(db, claimed, [], e)
+        except Exception:
+            logger.error(f"Could not release message {message_id}", exc_info=True)
+        raise
+
+    finally:
+        db.close()
+
+
+def send_sms_batch_job(
+    message_ids: List[int], created_at: Optional[List[Optional[float]]] = None
+):
+    """
+    Background job to send a chunk of SMS messages via the configured provider.
+
+    Args:
+        message_ids: The IDs of the messages to send
+        created_at: Their created_at in epoch seconds, None where unknown
+
+    Claims the queued messages with one UPDATE, sends them concurrently and
+    stores results in small groups as the provider returns them, so status
+    callbacks find their SID and a retry only picks up unsent messages.
+    This job is executed by the RQ worker.
+    """
+    _observe_queue_wait()
+    db = SessionLocal()
+    messages: List[Row] = []
+    dispatched: Set[int] = set()
+    recorded: Set[int] = set()
+    sent = 0
+
+    def before_send(index: int):
+        rate_limiter.wait(provider.from_number, messages[index].client_id)
+        dispatched.add(index)
 
+    def on_results(finished: List[Tuple[int, SendResult]]):
+        nonlocal sent
+        _record(db, [(messages[index], result) for index, result in finished])
+        recorded.update(index for index, _ in finished)
+        sent += sum(1 for _, (success, _, _) in finished if success)
+
+    try:
+        messages = _claim(
+            db, message_ids, _from_epoch(created_at, len(message_ids))
+        )
+        skipped = len(message_ids) - len(messages)
+        if skipped:
+            logger.warning(
+                f"Skipping {skipped} of {len(message_ids)} messages not found or not queued"
+            )
+        if not messages:
+            return {"status": "skipped", "sent": 0, "failed": 0, "skipped": skipped}
+
+        # Send concurrently over the provider's async transport, paced by
+        # the shared sender and client rate limits
+        provider = get_sms_provider()
+        logger.info(f"Sending {len(messages)} SMS messages")
+        started = time.monotonic()
+        provider.send_many(
+            [(message.to_number, message.content) for message in messages],
+            before_send=before_send,
+            on_results=on_results,
+        )
+        elapsed = time.monotonic() - started
+
+        logger.info(
+            f"Sent {sent} of {len(messages)} SMS messages in {elapsed:.2f}s "
+            f"({len(messages) / elapsed if elapsed else 0:.0f} msg/s)"
+        )
+
+        return {
+            "status": "success",
+            "sent": sent,
+            "failed": len(messages) - sent,
+            "skipped": skipped,
+        }
+
+    except Exception as e:
+        logger.error(f"Error sending SMS batch {message_ids}: {e}", exc_info=True)
+        pending = [
+            (index, message)
+            for index, message in enumerate(messages)
+            if index not in recorded
+        ]
+        try:
+            _release(
+                db,
+                [message for index, message in pending if index not in dispatched],
+                [message for index, message in pending if index in dispatched],
+                e,
+            )
+        except Exception:
+            logger.error("Could not release claimed messages", exc_info=True)
         raise
 
     finally:
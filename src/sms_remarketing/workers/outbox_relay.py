@@ -0,0 +1,129 @@
+"""
+Outbox relay handing committed messages to the job queue.
+Run this with: python -m sms_remarketing.workers.outbox_relay
+
+The API only writes a message and its outbox entry in one transaction.
+The relay claims pending entries with FOR UPDATE SKIP LOCKED (so several
+relays can run side by side), enqueues them in bulk (or hands them to the
+scheduler if `send_at` is in the future) and deletes them in the same
+transaction. If Redis is down the transaction rolls back and the
+entries are retried, so a committed message is always enqueued at least once.
+"""
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from sqlalchemy import select, delete
+from ..config import settings
+from ..metrics import registry
+from ..database import SessionLocal
+from ..models import OutboxEntry
+from ..models.message import MessageOrigin
+from ..services.queue_service import MessageRef, queue_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def relay_once(batch_size: int) -> int:
+    """
+    Enqueue one batch of outbox entries.
+
+    Returns:
+        Number of entries relayed
+    """
+    db = SessionLocal()
+    try:
+        entries = db.execute(
+            select(
+                OutboxEntry.id,
+                OutboxEntry.message_id,
+                OutboxEntry.message_created_at,
+                OutboxEntry.client_id,
+                OutboxEntry.origin,
+                OutboxEntry.send_at,
+            )
+            .order_by(OutboxEntry.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not entries:
+            return 0
+
+        # One bulk enqueue per lane and client, in outbox order; messages
+        # scheduled for later go to the scheduler instead
+        now = time.time()
+        due: Dict[Tuple[MessageOrigin, int], List[MessageRef]] = defaultdict(list)
+        later: Dict[Tuple[MessageOrigin, int], List[Tuple[MessageRef, float]]] = (
+            defaultdict(list)
+        )
+        for entry in entries:
+            key = (entry.origin, entry.client_id)
+            message = (
+                entry.message_id,
+                (
+                    entry.message_created_at.timestamp()
+                    if entry.message_created_at
+                    else None
+                ),
+            )
+            send_at = entry.send_at.timestamp() if entry.send_at else None
+            if send_at is not None and send_at > now:
+                later[key].append((message, send_at))
+            else:
+                due[key].append(message)
+        for (origin, client_id), messages in due.items():
+            queue_service.enqueue_sms_many(
+                messages, origin=origin, client_id=client_id
+            )
+        for (origin, client_id), messages in later.items():
+            queue_service.schedule_sms_many(
+                messages, origin=origin, client_id=client_id
+            )
+
+        db.execute(
+            delete(OutboxEntry).where(
+                OutboxEntry.id.in_([entry.id for entry in entries])
+            )
+        )
+        db.commit()
+        return len(entries)
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+def main():
+    """Main relay loop"""
+    if not queue_service.is_available():
+        raise RuntimeError("Redis is required for the outbox relay")
+
+    logger.info(f"Starting outbox relay (batch size {settings.outbox_batch_size})")
+    logger.info("Press Ctrl+C to stop")
+    registry.start_flushing(settings.metrics_flush_interval_seconds)
+
+    while True:
+        try:
+            relayed = relay_once(settings.outbox_batch_size)
+        except Exception as e:
+            logger.error(f"Error relaying outbox: {e}", exc_info=True)
+            relayed = 0
+            time.sleep(1)
+
+        if relayed:
+            logger.info(f"Relayed {relayed} outbox entries")
+        # Keep draining while there is a backlog
+        if relayed < settings.outbox_batch_size:
+            time.sleep(settings.outbox_poll_interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ import logging
 from redis import Redis
 from rq import Worker
 from ..config import settings
+from ..metrics import registry
+from ..services.queue_service import HIGH_PRIORITY_QUEUE, BULK_QUEUE, LEGACY_QUEUE
 
 # Configure logging
 logging.basicConfig(
@@ -15,9 +17,64 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class WeightedWorker(Worker):
+    """
+    Worker that drains priority lanes with smooth weighted round-robin.
+    When every lane has work, each lane gets jobs in proportion to its
+    weight in `queue_weights`; an empty lane never blocks the others.
+    """
+
+    def __init__(self, *args, weights=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.weights = {
+            queue.name: max((weights or {}).get(queue.name, 1), 1)
+            for queue in self.queues
+        }
+        self._current = {name: 0 for name in self.weights}
+        self.reorder_queues(reference_queue=None)
+
+    def reorder_queues(self, reference_queue):
+        """
+        Charge the lane the job was dequeued from, then put the lane owed the
+        most jobs first. Lanes ordered ahead of it were empty, so they sit
+        the round out instead of banking credit for later.
+        """
+        if reference_queue is not None:
+            skipped = set()
+            for queue in self._ordered_queues:
+                if queue.name == reference_queue.name:
+                    break
+                skipped.add(queue.name)
+            total = 0
+            for name, weight in self.weights.items():
+                if name not in skipped:
+                    self._current[name] += weight
+                    total += weight
+            self._current[reference_queue.name] -= total
+
+        self._ordered_queues = sorted(
+            self.queues,
+            key=lambda queue: (
+                -(self._current[queue.name] + self.weights[queue.name]),
+                -self.weights[queue.name],
+            ),
+        )
+
+    def perform_job(self, job, queue):
+        """
+        Run the job, then flush its metrics: the forked work horse exits
+        right after, without the parent's flush thread
+        """
+        try:
+            return super().perform_job(job, queue)
+        finally:
+            registry.flush(sample=False)
+
+
 def main():
     """Start the RQ worker"""
-    logger.info("Starting RQ worker for SMS queue...")
+    queue_names = [HIGH_PRIORITY_QUEUE, BULK_QUEUE, LEGACY_QUEUE]
+    logger.info(f"Starting RQ worker for queues {queue_names}...")
 
     try:
         redis_conn = Redis.from_url(settings.redis_url)
@@ -27,12 +84,14 @@ def main():
         logger.info(f"Connected to Redis at {settings.redis_url}")
 
         # Create worker
-        worker = Worker(
-            ["sms"],  # Queue names to listen to
+        worker = WeightedWorker(
+            queue_names,  # Queue names to listen to
             connection=redis_conn,
+            weights=settings.queue_weights,
         )
 
-        logger.info("RQ worker ready. Listening for jobs on 'sms' queue...")
+        logger.info(f"RQ worker ready. Lane weights: {worker.weights}")
+        registry.start_flushing(settings.metrics_flush_interval_seconds)
         logger.info("Press Ctrl+C to stop")
 
         # Start working
@@ -0,0 +1,76 @@
+"""
+Scheduler releasing scheduled SMS messages to the job queue.
+Run this with: python -m sms_remarketing.workers.scheduler
+
+Messages with a future `send_at` are held in a Redis sorted set scored by
+send time. The scheduler sleeps until the earliest one is due (at most
+`scheduler_poll_interval`) and enqueues due messages in batches, so
+releases land within a fraction of a second of their send time.
+"""
+import logging
+import os
+import socket
+import time
+from ..config import settings
+from ..metrics import registry
+from ..services.queue_service import queue_service
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Only one scheduler releases messages at a time
+LOCK_KEY = "sms:scheduler:lock"
+LOCK_TTL = 10
+
+
+def acquire_lock(token: str) -> bool:
+    """Take or extend the scheduler lock"""
+    redis_conn = queue_service.redis_conn
+    if redis_conn.set(LOCK_KEY, token, nx=True, ex=LOCK_TTL):
+        return True
+    if redis_conn.get(LOCK_KEY) == token.encode():
+        redis_conn.expire(LOCK_KEY, LOCK_TTL)
+        return True
+    return False
+
+
+def main():
+    """Main scheduler loop"""
+    if not queue_service.is_available():
+        raise RuntimeError("Redis is required for the scheduler")
+
+    token = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("Starting SMS scheduler")
+    logger.info("Press Ctrl+C to stop")
+    registry.start_flushing(settings.metrics_flush_interval_seconds)
+
+    while True:
+        try:
+            if not acquire_lock(token):
+                time.sleep(LOCK_TTL / 2)
+                continue
+
+            released = queue_service.release_due_sms(settings.scheduler_batch_size)
+            if released:
+                logger.info(f"Released {released} scheduled messages")
+            if released == settings.scheduler_batch_size:
+                continue
+
+            # Sleep until the next message is due
+            next_at = queue_service.next_scheduled_at()
+            delay = settings.scheduler_poll_interval
+            if next_at is not None:
+                delay = min(delay, max(next_at - time.time(), 0))
+            time.sleep(delay)
+
+        except Exception as e:
+            logger.error(f"Error releasing scheduled messages: {e}", exc_info=True)
+            time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
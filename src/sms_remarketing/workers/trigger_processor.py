@@ -1,10 +1,13 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from functools import partial
 import logging
 from ..database import SessionLocal
 from ..models import Trigger, Lead, Template
 from ..models.trigger import TriggerType
-from ..services import sms_service
+from ..models.message import MessageOrigin
+from ..services import sms_service, credit_cache, InsufficientCredits
 
 logger = logging.getLogger(__name__)
 
@@ -37,22 +40,9 @@ def process_new_lead_triggers(lead_id: int):
             )
 
             if template and template.is_active:
-                # Prepare variables for template
-                variables = {
-                    "first_name": lead.first_name or "",
-                    "last_name": lead.last_name or "",
-                    "full_name": lead.full_name,
-                    "phone_number": lead.phone_number,
-                    "email": lead.email or "",
-                }
-                # Add custom fields
-                if lead.custom_fields:
-                    variables.update(lead.custom_fields)
-
-                # Render content
-                content = template.render(**variables)
-
-                # Send SMS (synchronously, we're already in a background job)
+                content = template.compiled().render(lead.template_variables())
+
+                # Queue SMS on the high priority lane
                 try:
                     message = sms_service.send_sms(
                         db=db,
@@ -60,10 +50,10 @@ def process_new_lead_triggers(lead_id: int):
                         lead=lead,
                         content=content,
                         template=template,
-                        async_send=False,
+                        origin=MessageOrigin.NEW_LEAD,
                     )
                     logger.info(
-                        f"NEW_LEAD trigger {trigger.id} sent message {message.id} to lead {lead.id}"
+                        f"NEW_LEAD trigger {trigger.id} queued message {message.id} to lead {lead.id}"
                     )
                 except ValueError as e:
                     logger.error(
@@ -75,11 +65,71 @@ def process_new_lead_triggers(lead_id: int):
         db.close()
 
 
+def process_imported_lead_triggers(
+    client_id: int, first_id: int, last_id: int, imported_at: datetime
+):
+    """
+    Process NEW_LEAD triggers for the leads of a bulk import.
+    Each trigger sends one batch on the bulk lane instead of a message per
+    lead on the high priority one, so an import can't hold up live signups.
+    """
+    db = SessionLocal()
+    try:
+        triggers = (
+            db.query(Trigger)
+            .filter(
+                Trigger.client_id == client_id,
+                Trigger.trigger_type == TriggerType.NEW_LEAD,
+                Trigger.is_active == True,
+            )
+            .all()
+        )
+
+        # Leads of concurrent inserts may have ids in the range too
+        leads = (
+            select(Lead)
+            .where(
+                Lead.client_id == client_id,
+                Lead.id.between(first_id, last_id),
+                Lead.created_at == imported_at,
+            )
+            .order_by(Lead.id)
+        )
+
+        for trigger in triggers:
+            template = (
+                db.query(Template).filter(Template.id == trigger.template_id).first()
+            )
+            if not template or not template.is_active:
+                continue
+
+            try:
+                batch = sms_service.send_batch(
+                    db=db,
+                    client=template.client,
+                    template=template,
+                    leads=leads,
+                    origin=MessageOrigin.IMPORT,
+                )
+                logger.info(
+                    f"NEW_LEAD trigger {trigger.id} queued batch {batch.id} of {batch.total_messages} imported leads"
+                )
+            except ValueError as e:
+                logger.error(
+                    f"NEW_LEAD trigger {trigger.id} failed for imported leads {first_id}-{last_id}: {e}",
+                    exc_info=True,
+                )
+
+    finally:
+        db.close()
+
+
 def process_lead_age_triggers():
     """
     Process LEAD_AGE triggers.
     This should be run periodically (e.g., daily via cron).
-    Finds leads that match the age criteria and sends messages.
+    Finds leads that match the age criteria and sends them one batch per
+    trigger.
     """
     db = SessionLocal()
     try:
@@ -103,57 +153,55 @@ def process_lead_age_triggers():
             date_start = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
             date_end = date_start + timedelta(days=1)
 
+            template = (
+                db.query(Template).filter(Template.id == trigger.template_id).first()
+            )
+
+            if not template or not template.is_active:
+                continue
+
             # Find leads created on that specific day for this client
             leads = (
-                db.query(Lead)
-                .filter(
+                select(Lead)
+                .where(
                     Lead.client_id == trigger.client_id,
                     Lead.created_at >= date_start,
                     Lead.created_at < date_end,
                 )
-                .all()
+                .order_by(Lead.id)
             )
-
-            template = (
-                db.query(Template).filter(Template.id == trigger.template_id).first()
-            )
-
-            if not template or not template.is_active:
+            if not db.scalar(select(leads.exists())):
                 continue
 
-            for lead in leads:
-                # Prepare variables
-                variables = {
-                    "first_name": lead.first_name or "",
-                    "last_name": lead.last_name or "",
-                    "full_name": lead.full_name,
-                    "phone_number": lead.phone_number,
-                    "email": lead.email or "",
-                    "days_since_signup": days,
-                }
-                if lead.custom_fields:
-                    variables.update(lead.custom_fields)
-
-                content = template.render(**variables)
-
-                # Send SMS (synchronously, we're already in a background job)
+            # One batch on the bulk lane so it can't delay transactional sends;
+            # leads are rendered a chunk at a time. A custom field named
+            # days_since_signup still wins over the trigger's value.
+            send = partial(
+                sms_service.send_batch,
+                db=db,
+                client=template.client,
+                template=template,
+                defaults={"days_since_signup": days},
+                origin=MessageOrigin.LEAD_AGE,
+            )
+            try:
                 try:
-                    message = sms_service.send_sms(
-                        db=db,
-                        client=lead.client,
-                        lead=lead,
-                        content=content,
-                        template=template,
-                        async_send=False,
-                    )
-                    logger.info(
-                        f"LEAD_AGE trigger {trigger.id} sent message {message.id} to lead {lead.id} ({days} days old)"
-                    )
-                except ValueError as e:
-                    logger.error(
-                        f"LEAD_AGE trigger {trigger.id} failed for lead {lead.id}: {e}",
-                        exc_info=True,
-                    )
+                    batch = send(leads=leads)
+                except InsufficientCredits:
+                    # Send to as many leads as the credits cover, in id order,
+                    # rather than skipping all of them
+                    available = credit_cache.balance(db, trigger.client_id)
+                    if available <= 0:
+                        raise
+                    batch = send(leads=leads.limit(available))
+                logger.info(
+                    f"LEAD_AGE trigger {trigger.id} queued batch {batch.id} of {batch.total_messages} leads ({days} days old)"
+                )
+            except ValueError as e:
+                logger.error(
+                    f"LEAD_AGE trigger {trigger.id} failed for leads {days} days old: {e}",
+                    exc_info=True,
+                )
 
     finally:
         db.close()
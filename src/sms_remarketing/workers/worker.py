@@ -6,6 +6,13 @@ Run this with: python -m sms_remarketing.workers.worker
 import time
 import logging
 import schedule
+from ..database import SessionLocal
+from ..services.idempotency_service import idempotency_service
+from ..config import settings
+from ..metrics import registry
+from ..services.credit_service import credit_service
+from ..services.credit_cache import credit_cache
+from ..services.partition_service import partition_service
 from .trigger_processor import process_lead_age_triggers
 
 # Configure logging
@@ -26,22 +33,88 @@ def run_lead_age_triggers():
         logger.error(f"Error processing lead age triggers: {e}", exc_info=True)
 
 
+def purge_idempotency_keys():
+    """Delete idempotency keys older than their TTL"""
+    db = SessionLocal()
+    try:
+        deleted = idempotency_service.purge_expired(db)
+        logger.info(f"Purged {deleted} expired idempotency keys")
+    except Exception as e:
+        logger.error(f"Error purging idempotency keys: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+def rollup_credit_snapshots():
+    """Fold new credit ledger entries into balance snapshots"""
+    db = SessionLocal()
+    try:
+        updated = credit_service.rollup(db)
+        logger.info(f"Rolled up credit snapshots for {updated} clients")
+    except Exception as e:
+        logger.error(f"Error rolling up credit snapshots: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+def reconcile_credit_cache():
+    """Flush Redis credit reservations to the ledger and check for drift"""
+    db = SessionLocal()
+    try:
+        result = credit_cache.reconcile(db)
+        if result["flushed"] or result["drift"]:
+            logger.info(
+                f"Flushed {result['flushed']} reserved credits for "
+                f"{result['clients']} clients (drift {result['drift']})"
+            )
+    except Exception as e:
+        logger.error(f"Error reconciling credit cache: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+def maintain_message_partitions():
+    """Create upcoming message partitions and archive expired ones"""
+    db = SessionLocal()
+    try:
+        created = partition_service.create_partitions(db)
+        archived = partition_service.archive_partitions(db)
+        logger.info(
+            f"Message partitions: created {created or 'none'}, "
+            f"archived {archived or 'none'}"
+        )
+    except Exception as e:
+        logger.error(f"Error maintaining message partitions: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
 def main():
     """Main worker loop"""
     logger.info("Starting SMS Remarketing Worker...")
+    registry.start_flushing(settings.metrics_flush_interval_seconds)
     logger.info("Scheduling tasks...")
 
     # Schedule lead age triggers to run daily at 9 AM
     schedule.every().day.at("09:00").do(run_lead_age_triggers)
+    schedule.every().hour.do(purge_idempotency_keys)
+    schedule.every(5).minutes.do(rollup_credit_snapshots)
+    schedule.every().day.at("03:00").do(maintain_message_partitions)
+    if settings.credit_cache_enabled:
+        schedule.every(settings.credit_reconcile_seconds).seconds.do(
+            reconcile_credit_cache
+        )
 
     # Also run immediately on startup for testing
     run_lead_age_triggers()
+    # Inserts fail once no partition covers the current month
+    maintain_message_partitions()
 
     logger.info("Worker running. Press Ctrl+C to stop.")
 
     while True:
         schedule.run_pending()
-        time.sleep(60)  # Check every minute
+        time.sleep(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+import sys
+import threading
+import uuid
+import pytest
+from redis.exceptions import RedisError
+from sms_remarketing.services.credit_service import credit_service
+from sms_remarketing.services.credit_cache import (
+    CreditCache,
+    DIRTY_KEY,
+    balance_key,
+    pending_key,
+)
+
+TTL = 60
+
+
+@pytest.fixture
+def cache():
+    cache = CreditCache()
+    try:
+        cache.redis_conn.ping()
+    except RedisError:
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    return cache
+
+
+@pytest.fixture
+def client_id(cache):
+    # Far outside real ids, cleaned up afterwards
+    client_id = 10**12 + uuid.uuid4().int % 10**9
+    yield client_id
+    cache.redis_conn.delete(balance_key(client_id), pending_key(client_id))
+    cache.redis_conn.srem(DIRTY_KEY, client_id)
+
+
+def keys(client_id):
+    return [balance_key(client_id), pending_key(client_id), DIRTY_KEY]
+
+
+def test_reserve_needs_a_cached_balance(cache, client_id):
+    assert cache._reserve(keys=keys(client_id), args=[1, client_id]) == [0, 0]
+
+
+def test_reserve_checks_the_floor(cache, client_id):
+    cache.redis_conn.set(balance_key(client_id), 5)
+
+    assert cache._reserve(keys=keys(client_id), args=[3, client_id]) == [1, 2]
+    assert cache._reserve(keys=keys(client_id), args=[3, client_id]) == [-1, 2]
+    assert cache.redis_conn.get(pending_key(client_id)) == "3"
+    assert cache.redis_conn.sismember(DIRTY_KEY, client_id)
+
+
+def test_refund_gives_credits_back(cache, client_id):
+    cache.redis_conn.set(balance_key(client_id), 5)
+    cache._reserve(keys=keys(client_id), args=[3, client_id])
+
+    cache._refund(keys=keys(client_id), args=[2, client_id])
+
+    assert cache.redis_conn.get(balance_key(client_id)) == "4"
+    assert cache.redis_conn.get(pending_key(client_id)) == "1"
+
+
+def test_sync_subtracts_pending_and_reports_drift(cache, client_id):
+    cache.redis_conn.set(pending_key(client_id), 3)
+
+    assert cache._sync(keys=keys(client_id)[:2], args=[10, TTL, 1]) == [7, 0]
+    # Only seeded if missing
+    assert cache._sync(keys=keys(client_id)[:2], args=[20, TTL, 1]) == [7, 0]
+    # A forced sync corrects and reports the difference
+    assert cache._sync(keys=keys(client_id)[:2], args=[9, TTL, 0]) == [6, 1]
+
+
+def test_take_pending_empties_the_counter(cache, client_id):
+    cache.redis_conn.set(balance_key(client_id), 5)
+    cache._reserve(keys=keys(client_id), args=[2, client_id])
+
+    taken = cache._take_pending(
+        keys=[pending_key(client_id), DIRTY_KEY], args=[client_id]
+    )
+
+    assert taken == 2
+    assert cache.redis_conn.get(pending_key(client_id)) == "0"
+    assert not cache.redis_conn.sismember(DIRTY_KEY, client_id)
+
+
+def test_load_seeds_under_the_ledger_lock(cache, client_id, monkeypatch):
+    events = []
+    db = SimpleNamespace(
+        commit=lambda: events.append("commit"),
+        rollback=lambda: events.append("rollback"),
+    )
+    monkeypatch.setattr(
+        credit_service, "lock", lambda db, client_id: events.append("lock")
+    )
+    monkeypatch.setattr(credit_service, "balance", lambda db, client_id: 10)
+    cache.redis_conn.set(pending_key(client_id), 4)
+
+    assert cache._load(db, client_id) == 6
+    assert events == ["lock", "commit"]
+
+
+@pytest.mark.asyncio
+async def test_async_calls_run_in_a_thread_with_their_own_session(monkeypatch):
+    # The services package re-exports the singleton under the module's name
+    cache_module = sys.modules["sms_remarketing.services.credit_cache"]
+    sessions = []
+
+    class Session:
+        closed = False
+
+        def __init__(self):
+            sessions.append(self)
+
+        def close(self):
+            self.closed = True
+
+    def reserve(db, client_id, count):
+        assert threading.current_thread() is not threading.main_thread()
+        assert db is sessions[-1]
+        return 10 - count
+
+    cache = CreditCache()
+    monkeypatch.setattr(cache_module, "SessionLocal", Session)
+    monkeypatch.setattr(cache, "reserve", reserve)
+
+    assert await cache.reserve_async(7, 3) == 7
+    assert [db.closed for db in sessions] == [True]
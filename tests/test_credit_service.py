@@ -0,0 +1,163 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.dml import Insert
+from sms_remarketing.models import CreditSnapshot
+from sms_remarketing.models.credit import CreditEntryKind, credit_balance
+from sms_remarketing.services.credit_service import (
+    CREDIT_LOCK_NAMESPACE,
+    CreditService,
+    InsufficientCredits,
+)
+
+
+class FakeLedger:
+    """Plays Postgres for CreditService: locks, ledger inserts, balance reads"""
+
+    def __init__(self, balance=0):
+        self.entries = [{"kind": CreditEntryKind.GRANT, "amount": balance}]
+        self.calls = []
+
+    def execute(self, statement):
+        sql = str(statement)
+        if isinstance(statement, Insert):
+            self.calls.append("insert")
+            self.entries.append(statement.compile().params)
+        elif "pg_advisory_xact_lock" in sql:
+            self.calls.append(("lock", *statement.compile().params.values()))
+        else:
+            self.calls.append("balance")
+        return self
+
+    def scalar_one(self):
+        return sum(entry["amount"] for entry in self.entries)
+
+
+def test_reserve_takes_credits_under_the_client_lock():
+    db = FakeLedger(balance=10)
+
+    assert CreditService.reserve(db, 7, 3, batch_id=2) == 7
+
+    assert db.calls == [("lock", CREDIT_LOCK_NAMESPACE, 7), "balance", "insert"]
+    assert db.entries[-1] == {
+        "client_id": 7,
+        "kind": CreditEntryKind.RESERVATION,
+        "amount": -3,
+        "batch_id": 2,
+        "message_id": None,
+    }
+
+
+def test_reserve_never_overdraws():
+    db = FakeLedger(balance=2)
+
+    with pytest.raises(InsufficientCredits, match="Insufficient credits"):
+        CreditService.reserve(db, 7, 3)
+
+    assert "insert" not in db.calls
+    assert CreditService.reserve(db, 7, 2) == 0
+    assert isinstance(InsufficientCredits(), ValueError)
+
+
+def test_refund_and_add_return_the_new_balance():
+    db = FakeLedger(balance=5)
+
+    assert CreditService.reserve(db, 7, 5) == 0
+    assert CreditService.refund(db, 7, 2, message_id=9) == 2
+    assert CreditService.add(db, 7, 10) == 12
+
+    assert [(entry["kind"], entry["amount"]) for entry in db.entries[1:]] == [
+        (CreditEntryKind.RESERVATION, -5),
+        (CreditEntryKind.REFUND, 2),
+        (CreditEntryKind.GRANT, 10),
+    ]
+    assert db.calls.count(("lock", CREDIT_LOCK_NAMESPACE, 7)) == 3
+
+
+def test_record_cached_writes_the_net_change():
+    db = FakeLedger(balance=10)
+
+    CreditService.record_cached(db, 7, -4)
+    CreditService.record_cached(db, 7, 1)
+
+    assert [(entry["kind"], entry["amount"]) for entry in db.entries[1:]] == [
+        (CreditEntryKind.RESERVATION, -4),
+        (CreditEntryKind.REFUND, 1),
+    ]
+
+
+def test_balance_is_the_snapshot_plus_later_entries():
+    sql = str(
+        select(credit_balance(7)).compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+    sql = " ".join(sql.split())
+
+    assert sql.startswith(
+        "SELECT coalesce((SELECT credit_snapshots.balance FROM credit_snapshots "
+        "WHERE credit_snapshots.client_id = 7), 0) + "
+        "(SELECT coalesce(sum(credit_ledger.amount), 0)"
+    )
+    assert (
+        "WHERE credit_ledger.client_id = 7 AND credit_ledger.id > "
+        "coalesce((SELECT credit_snapshots.last_entry_id" in sql
+    )
+
+
+class RollupSession:
+    """Plays Postgres for CreditService.rollup"""
+
+    def __init__(self, snapshots, new_entries):
+        # client id -> (sum, max id) of its entries after the snapshot
+        self.new_entries = new_entries
+        self.snapshots = snapshots
+        self.client_id = None
+        self.commits = self.rollbacks = 0
+
+    def execute(self, statement):
+        sql = str(statement)
+        if "pg_advisory_xact_lock" in sql:
+            _, self.client_id = statement.compile().params.values()
+            return None
+        if "max(credit_ledger.id)" in sql:
+            return SimpleNamespace(
+                one=lambda: self.new_entries.get(self.client_id, (0, None))
+            )
+        return SimpleNamespace(
+            scalars=lambda: SimpleNamespace(all=lambda: list(self.new_entries))
+        )
+
+    def get(self, model, client_id):
+        return self.snapshots.get(client_id)
+
+    def add(self, snapshot):
+        self.snapshots[snapshot.client_id] = snapshot
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_rollup_folds_new_entries_into_snapshots():
+    existing = CreditSnapshot(client_id=1, balance=50, last_entry_id=10)
+    db = RollupSession({1: existing}, {1: (-5, 14), 2: (20, 12)})
+
+    assert CreditService.rollup(db) == 2
+
+    assert (existing.balance, existing.last_entry_id) == (45, 14)
+    assert (db.snapshots[2].balance, db.snapshots[2].last_entry_id) == (20, 12)
+    assert db.commits == 2
+
+
+def test_rollup_skips_clients_rolled_up_meanwhile():
+    existing = CreditSnapshot(client_id=1, balance=50, last_entry_id=10)
+    db = RollupSession({1: existing}, {1: (0, None)})
+
+    CreditService.rollup(db)
+
+    assert (existing.balance, existing.last_entry_id) == (50, 10)
+    assert (db.commits, db.rollbacks) == (0, 1)
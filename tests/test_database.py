@@ -0,0 +1,173 @@
+from collections import Counter
+from types import SimpleNamespace
+import asyncio
+import sqlite3
+import pytest
+from sqlalchemy import exc
+from sms_remarketing import database
+from sms_remarketing.config import settings
+from sms_remarketing.database import (
+    InstrumentedQueuePool,
+    ReplicaRouter,
+    pool_options,
+    sample_pool_metrics,
+)
+
+
+def test_pool_options_apply_role_overrides(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_size", 5)
+    monkeypatch.setattr(
+        settings,
+        "db_pool_roles",
+        {"api": {"pool_size": 20, "pool_timeout": 2}, "relay": {"pool_pre_ping": 0}},
+    )
+
+    api = pool_options("api")
+    assert (api["pool_size"], api["pool_timeout"]) == (20, 2.0)
+    assert isinstance(api["pool_timeout"], float)
+    assert pool_options("relay")["pool_pre_ping"] is False
+    assert pool_options("cron")["pool_size"] == 5
+
+
+def test_pool_options_reject_unknown_options(monkeypatch):
+    monkeypatch.setattr(settings, "db_pool_roles", {"api": {"pool_sise": 20}})
+
+    with pytest.raises(ValueError, match="Unknown pool option 'pool_sise'"):
+        pool_options("api")
+
+
+class Recorder:
+    """Stands in for a metric, counting what it was given by label set"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        self.counts[tuple(sorted(labels.items()))] += amount
+
+    def observe(self, value, **labels):
+        self.inc(**labels)
+
+    def set(self, value, **labels):
+        self.values[labels["pool"]] = value
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = {}
+    for name in (
+        "pool_wait",
+        "pool_overflows",
+        "pool_timeouts",
+        "pool_checked_out",
+        "pool_overflow",
+        "pool_size",
+    ):
+        metrics[name] = Recorder()
+        monkeypatch.setattr(database, name, metrics[name])
+    monkeypatch.setattr(settings, "process_role", "rq_worker")
+    return metrics
+
+
+def test_pool_counts_checkouts_overflow_and_timeouts(metrics):
+    pool = InstrumentedQueuePool(
+        lambda: sqlite3.connect(":memory:"),
+        pool_size=1,
+        max_overflow=1,
+        timeout=0.01,
+        logging_name="sync",
+    )
+    labels = (("pool", "sync"), ("role", "rq_worker"))
+
+    first, second = pool.connect(), pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    first.close()
+    pool.connect()
+
+    assert metrics["pool_wait"].counts == {labels: 4}
+    assert metrics["pool_overflows"].counts == {labels: 1}
+    assert metrics["pool_timeouts"].counts == {labels: 1}
+
+
+def test_pool_usage_is_sampled_per_pool(metrics):
+    sample_pool_metrics()
+
+    assert metrics["pool_checked_out"].values["sync"] == 0
+    assert metrics["pool_size"].values == {
+        "sync": database.engine.pool.size(),
+        "async": database.async_engine.pool.size(),
+        **{
+            f"replica{i}": replica.pool.size()
+            for i, replica in enumerate(database.replica_engines)
+        },
+    }
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """ReplicaRouter over two replicas whose lag is read from `lags`"""
+    monkeypatch.setattr(settings, "replica_max_lag_seconds", 5.0)
+    monkeypatch.setattr(settings, "replica_lag_check_seconds", 60.0)
+    monkeypatch.setattr(settings, "replica_lag_check_timeout_seconds", 0.05)
+    engines = [SimpleNamespace(name="replica0"), SimpleNamespace(name="replica1")]
+    router = ReplicaRouter(engines)
+    router.lags = {"replica0": 0.0, "replica1": 0.0}
+    router.checks = Counter()
+
+    async def query_lag(engine):
+        router.checks[engine.name] += 1
+        lag = router.lags[engine.name]
+        if isinstance(lag, Exception):
+            raise lag
+        if lag == "hang":
+            await asyncio.sleep(1)
+        return lag
+
+    monkeypatch.setattr(router, "_query_lag", query_lag)
+    return router
+
+
+async def route(router, times=1):
+    """Where the next `times` read sessions go, after lag checks finish"""
+    makers = [await router.sessionmaker() for _ in range(times)]
+    await asyncio.gather(*router._checks.values())
+    names = {maker: name for name, _, maker in router.replicas}
+    return [names.get(maker, "primary") for maker in makers]
+
+
+@pytest.mark.asyncio
+async def test_reads_alternate_between_caught_up_replicas(router):
+    # Nothing is known about the replicas before their first lag check
+    assert await route(router) == ["primary"]
+
+    assert await route(router, 4) == ["replica0", "replica1"] * 2
+    assert router.checks == {"replica0": 1, "replica1": 1}
+
+
+@pytest.mark.asyncio
+async def test_lagging_replica_is_skipped(router):
+    router.lags["replica1"] = 30.0
+    await route(router)
+
+    assert await route(router, 3) == ["replica0"] * 3
+
+    router.lags["replica0"] = 6.0
+    router.checked_at.clear()
+    await route(router)
+    assert await route(router, 2) == ["primary"] * 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", ["hang", OSError("connection refused")])
+async def test_unreachable_replica_is_marked_down(router, failure):
+    await route(router)
+    router.lags["replica0"] = failure
+    router.checked_at.clear()
+
+    await route(router)
+
+    assert router.lag["replica0"] is None
+    assert await route(router, 2) == ["replica1"] * 2
+    assert 'sms_db_replica_up{replica="replica0"} 0' in router.collect_metrics()
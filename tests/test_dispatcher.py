@@ -0,0 +1,129 @@
+from collections import Counter
+import uuid
+import pytest
+from redis.exceptions import RedisError
+from rq import Queue
+from sms_remarketing.config import settings
+from sms_remarketing.services.queue_service import (
+    TENANT_QUEUE_PREFIX,
+    active_tenants_key,
+    queue_service,
+    tenant_queue_key,
+)
+from sms_remarketing.workers.dispatcher import FairDispatcher
+
+
+@pytest.fixture
+def lane(monkeypatch):
+    redis_conn = queue_service.redis_conn
+    try:
+        redis_conn.ping()
+    except (AttributeError, RedisError):
+        pytest.skip("Redis is not reachable at REDIS_URL")
+
+    # A lane of its own so real queues are left alone
+    name = f"test:{uuid.uuid4().hex}"
+    queue = Queue(name, connection=redis_conn)
+    monkeypatch.setitem(queue_service.queues, name, queue)
+    monkeypatch.setattr(settings, "fair_queue_quantum", 100)
+    monkeypatch.setattr(settings, "fair_queue_target_depth", 1000)
+    yield queue
+    queue.delete(delete_jobs=True)
+    redis_conn.delete(
+        *redis_conn.keys(f"{TENANT_QUEUE_PREFIX}{name}:*"),
+        f"sms:dispatcher:{name}:lock",
+    )
+
+
+@pytest.fixture
+def weights(monkeypatch):
+    weights = {}
+
+    def load(self, client_ids):
+        self.weights = {
+            client_id: weights.get(client_id, 1) for client_id in client_ids
+        }
+
+    monkeypatch.setattr(FairDispatcher, "_load_weights", load)
+    return weights
+
+
+def push(queue, client_id, chunks, size):
+    """Queue `chunks` chunks of `size` messages for a client"""
+    messages = [(client_id * 1000 + i, 1700000000.0) for i in range(size)]
+    queue_service._push_tenant_chunks(queue, client_id, [messages] * chunks)
+
+
+def jobs_by_client(queue):
+    return Counter(job.meta["client_id"] for job in queue.get_jobs())
+
+
+def test_round_serves_clients_by_weight(lane, weights):
+    weights.update({1: 2, 2: 1})
+    push(lane, 1, chunks=10, size=50)
+    push(lane, 2, chunks=10, size=50)
+    dispatcher = FairDispatcher(lane.name)
+
+    assert dispatcher.run_once() == 6
+    assert jobs_by_client(lane) == {1: 4, 2: 2}
+
+    dispatcher.run_once()
+    assert jobs_by_client(lane) == {1: 8, 2: 4}
+    assert lane.connection.llen(tenant_queue_key(lane.name, 1)) == 2
+
+
+def test_jobs_carry_the_chunk(lane, weights):
+    push(lane, 7, chunks=1, size=3)
+
+    FairDispatcher(lane.name).run_once()
+
+    [job] = lane.get_jobs()
+    assert job.args == ([7000, 7001, 7002], [1700000000.0] * 3)
+    assert job.meta["client_id"] == 7
+
+
+def test_large_campaign_does_not_fill_the_lane(lane, weights, monkeypatch):
+    monkeypatch.setattr(settings, "fair_queue_target_depth", 3)
+    weights[1] = 10
+    push(lane, 1, chunks=100, size=50)
+    dispatcher = FairDispatcher(lane.name)
+
+    assert dispatcher.run_once() == 3
+    assert dispatcher.run_once() == 0
+    assert lane.connection.llen(tenant_queue_key(lane.name, 1)) == 97
+
+    # A client arriving later waits for at most one turn of the campaign
+    push(lane, 2, chunks=1, size=50)
+    for _ in range(2):
+        lane.get_jobs()[0].delete()
+        assert dispatcher.run_once() == 1
+    assert jobs_by_client(lane) == {1: 2, 2: 1}
+
+
+def test_big_chunk_waits_for_enough_credit(lane, weights):
+    push(lane, 1, chunks=1, size=250)
+    dispatcher = FairDispatcher(lane.name)
+
+    assert [dispatcher.run_once() for _ in range(3)] == [0, 0, 1]
+    assert jobs_by_client(lane) == {1: 1}
+
+
+def test_drained_client_is_deactivated_without_credit(lane, weights):
+    push(lane, 1, chunks=1, size=50)
+    dispatcher = FairDispatcher(lane.name)
+
+    assert dispatcher.run_once() == 1
+    assert dispatcher.deficits[1] == 0
+    assert lane.connection.smembers(active_tenants_key(lane.name)) == set()
+
+    dispatcher.run_once()
+    assert 1 not in dispatcher.order and 1 not in dispatcher.deficits
+
+
+def test_one_dispatcher_per_lane(lane):
+    first, second = FairDispatcher(lane.name), FairDispatcher(lane.name)
+    second.lock_token += ":other"
+
+    assert first.acquire_lock()
+    assert not second.acquire_lock()
+    assert first.acquire_lock()
@@ -0,0 +1,114 @@
+import asyncio
+import httpx
+import pytest
+from sms_remarketing.config import settings
+from sms_remarketing.services.fake_provider import (
+    RATE_LIMITED_ERROR,
+    SEND_FAILED_ERROR,
+    FakeSMSProvider,
+    fake_twilio_app,
+)
+from sms_remarketing.services.sms_provider import get_sms_provider
+from sms_remarketing.services.twilio_service import TwilioService
+
+
+@pytest.fixture(autouse=True)
+def instant(monkeypatch):
+    monkeypatch.setattr(settings, "fake_sms_latency_ms", 0)
+    monkeypatch.setattr(settings, "fake_sms_latency_jitter_ms", 0)
+    monkeypatch.setattr(settings, "fake_sms_error_rate", 0)
+    monkeypatch.setattr(settings, "fake_sms_rate_limit_rate", 0)
+    monkeypatch.setattr(settings, "fake_sms_callback_url", None)
+
+
+@pytest.fixture
+def provider_setting(monkeypatch):
+    def select(name):
+        monkeypatch.setattr(settings, "sms_provider", name)
+        get_sms_provider.cache_clear()
+
+    yield select
+    get_sms_provider.cache_clear()
+
+
+def test_provider_is_selected_by_setting(provider_setting):
+    provider_setting("fake")
+    assert isinstance(get_sms_provider(), FakeSMSProvider)
+    assert get_sms_provider() is get_sms_provider()
+
+    provider_setting("twilio")
+    assert isinstance(get_sms_provider(), TwilioService)
+
+    provider_setting("carrier-pigeon")
+    with pytest.raises(ValueError, match="Unknown SMS provider"):
+        get_sms_provider()
+
+
+def test_fake_provider_sends():
+    provider = FakeSMSProvider()
+
+    success, sid, error = provider.send_sms("+15551230000", "Hi")
+    results = provider.send_many([("+15551230000", "Hi")] * 10)
+
+    assert success and sid.startswith("SM") and error is None
+    assert all(success for success, _, _ in results)
+    assert len({sid for _, sid, _ in results}) == 10
+
+
+@pytest.mark.parametrize(
+    "setting, error",
+    [
+        ("fake_sms_rate_limit_rate", RATE_LIMITED_ERROR),
+        ("fake_sms_error_rate", SEND_FAILED_ERROR),
+    ],
+)
+def test_fake_provider_simulates_errors(monkeypatch, setting, error):
+    monkeypatch.setattr(settings, setting, 1.0)
+
+    results = FakeSMSProvider().send_many([("+15551230000", "Hi")] * 3)
+
+    assert results == [(False, None, error)] * 3
+
+
+@pytest.mark.asyncio
+async def test_fake_provider_posts_status_callbacks(monkeypatch):
+    callbacks = []
+
+    def handler(request):
+        callbacks.append((str(request.url), request.content.decode()))
+        return httpx.Response(200)
+
+    monkeypatch.setattr(settings, "fake_sms_callback_url", "http://api/status")
+    monkeypatch.setattr(settings, "fake_sms_callback_delay_ms", 0)
+    provider = FakeSMSProvider()
+    provider._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    _, sid, _ = await provider.send_sms_async("+15551230000", "Hi")
+    await asyncio.gather(*provider._callbacks)
+
+    assert callbacks == [
+        ("http://api/status", f"MessageSid={sid}&MessageStatus=delivered")
+    ]
+
+
+class FakeTwilio(TwilioService):
+    """TwilioService talking to the fake Twilio API in-process"""
+
+    async def _on_loop_start(self):
+        await super()._on_loop_start()
+        await self._http.aclose()
+        self._http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake_twilio_app)
+        )
+
+
+def test_fake_twilio_api_answers_like_twilio(monkeypatch):
+    service = FakeTwilio()
+
+    [(success, sid, error)] = service.send_many([("+15551230000", "Hi")])
+    assert success and sid.startswith("SM") and error is None
+
+    monkeypatch.setattr(settings, "fake_sms_rate_limit_rate", 1.0)
+    assert service.send_many([("+15551230000", "Hi")]) == [
+        (False, None, f"Twilio error: {RATE_LIMITED_ERROR}")
+    ]
@@ -0,0 +1,174 @@
+from types import SimpleNamespace
+import uuid
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from redis import Redis as SyncRedis
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError
+from sms_remarketing.config import settings
+from sms_remarketing.middleware import IdempotencyMiddleware
+from sms_remarketing.services.idempotency_service import (
+    IdempotencyService,
+    idempotency_service,
+)
+
+
+class FakeSession:
+    """Session whose flush hits the unique key when `taken`"""
+
+    def __init__(self, taken=False):
+        self.taken = taken
+        self.added = []
+        self.rolled_back = False
+
+    def add(self, record):
+        self.added.append(record)
+
+    def flush(self):
+        if self.taken:
+            raise IntegrityError("INSERT", {}, Exception("duplicate key"))
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+MESSAGE = SimpleNamespace(id=5, created_at=None)
+
+
+def test_claim_records_the_key():
+    db = FakeSession()
+
+    assert IdempotencyService.claim(db, 1, "key", MESSAGE) is None
+
+    [record] = db.added
+    assert (record.client_id, record.key, record.message_id) == (1, "key", 5)
+    assert not db.rolled_back
+
+
+def test_claim_lost_to_a_concurrent_request_replays_its_message(monkeypatch):
+    winner = SimpleNamespace(id=4)
+    monkeypatch.setattr(
+        IdempotencyService, "find_message", staticmethod(lambda db, c, k: winner)
+    )
+    db = FakeSession(taken=True)
+
+    assert IdempotencyService.claim(db, 1, "key", MESSAGE) is winner
+    assert db.rolled_back
+
+
+def test_claim_reraises_if_the_key_holder_is_gone(monkeypatch):
+    monkeypatch.setattr(
+        IdempotencyService, "find_message", staticmethod(lambda db, c, k: None)
+    )
+
+    with pytest.raises(IntegrityError):
+        IdempotencyService.claim(FakeSession(taken=True), 1, "key", MESSAGE)
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, paths=[r"/send"])
+    app.state.calls = 0
+
+    @app.post("/send")
+    async def send(body: dict):
+        app.state.calls += 1
+        if body.get("fail"):
+            raise HTTPException(status_code=402, detail="Insufficient credits")
+        return {"call": app.state.calls}
+
+    return app
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    """A scope of its own in a reachable Redis, cleaned up afterwards"""
+    redis_conn = SyncRedis.from_url(settings.redis_url)
+    try:
+        redis_conn.ping()
+    except RedisError:
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    monkeypatch.setattr(
+        idempotency_service,
+        "redis_conn",
+        Redis.from_url(settings.redis_url, decode_responses=True),
+    )
+    api_key = uuid.uuid4().hex
+    yield api_key
+    for key in ("a", "b"):
+        cache_key = idempotency_service.cache_key(f"/send:{api_key}", key)
+        redis_conn.delete(cache_key, f"{cache_key}:lock")
+
+
+def client(app):
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+def headers(api_key, key="a"):
+    return {"X-API-Key": api_key, "Idempotency-Key": key}
+
+
+@pytest.mark.asyncio
+async def test_retries_replay_the_first_response(api_key):
+    app = make_app()
+    async with client(app) as http:
+        first = await http.post("/send", json={"to": 1}, headers=headers(api_key))
+        retry = await http.post("/send", json={"to": 1}, headers=headers(api_key))
+        other = await http.post("/send", json={"to": 1}, headers=headers(api_key, "b"))
+
+    assert first.json() == retry.json() == {"call": 1}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert other.json() == {"call": 2}
+    assert app.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_key_reused_with_another_body_is_rejected(api_key):
+    app = make_app()
+    async with client(app) as http:
+        await http.post("/send", json={"to": 1}, headers=headers(api_key))
+        response = await http.post("/send", json={"to": 2}, headers=headers(api_key))
+
+    assert response.status_code == 422
+    assert app.state.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_request_in_flight_conflicts(api_key):
+    cache_key = idempotency_service.cache_key(f"/send:{api_key}", "a")
+    assert await idempotency_service.lock(cache_key)
+
+    app = make_app()
+    async with client(app) as http:
+        response = await http.post("/send", json={}, headers=headers(api_key))
+
+    assert response.status_code == 409
+    assert app.state.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_can_be_retried(api_key):
+    app = make_app()
+    async with client(app) as http:
+        failed = await http.post("/send", json={"fail": 1}, headers=headers(api_key))
+        retry = await http.post("/send", json={"fail": 1}, headers=headers(api_key))
+
+    assert failed.status_code == retry.status_code == 402
+    assert app.state.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_requests_pass_through_when_redis_is_down(monkeypatch):
+    monkeypatch.setattr(
+        idempotency_service, "redis_conn", Redis.from_url("redis://localhost:1")
+    )
+    app = make_app()
+    async with client(app) as http:
+        for _ in range(2):
+            response = await http.post("/send", json={}, headers=headers("x"))
+
+    assert response.json() == {"call": 2}
@@ -0,0 +1,109 @@
+from types import SimpleNamespace
+import asyncio
+import pytest
+from sms_remarketing.services.sms_provider import SMSProvider
+from sms_remarketing.workers import jobs
+
+
+class Provider(SMSProvider):
+    from_number = "+15550000000"
+
+    def send_sms(self, to, body):
+        return True, f"SM{body}", None
+
+    async def send_sms_async(self, to, body):
+        await asyncio.sleep(0)
+        return True, f"SM{body}", None
+
+
+class FakeDatabase:
+    """Stands in for the claim, record and release queries of the send jobs"""
+
+    def __init__(self, message_ids):
+        self.queued = set(message_ids)
+        self.sending = set()
+        self.sent = set()
+        self.failed = set()
+
+    def claim(self, db, message_ids, created_at):
+        claimed = [
+            message_id for message_id in message_ids if message_id in self.queued
+        ]
+        self.queued.difference_update(claimed)
+        self.sending.update(claimed)
+        return [
+            SimpleNamespace(
+                id=message_id,
+                created_at=None,
+                client_id=1,
+                to_number="+15551230000",
+                content=str(message_id),
+            )
+            for message_id in claimed
+        ]
+
+    def record(self, db, results):
+        for message, (success, _, _) in results:
+            self.sending.remove(message.id)
+            (self.sent if success else self.failed).add(message.id)
+
+    def release(self, db, unsent, unknown, error):
+        for message in unsent:
+            self.sending.remove(message.id)
+            self.queued.add(message.id)
+        for message in unknown:
+            self.sending.remove(message.id)
+            self.failed.add(message.id)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase(range(1, 11))
+    provider = Provider()
+    session = SimpleNamespace(close=lambda: None)
+    monkeypatch.setattr(jobs, "SessionLocal", lambda: session)
+    monkeypatch.setattr(jobs, "_claim", database.claim)
+    monkeypatch.setattr(jobs, "_record", database.record)
+    monkeypatch.setattr(jobs, "_release", database.release)
+    monkeypatch.setattr(jobs, "get_sms_provider", lambda: provider)
+    monkeypatch.setattr(jobs.rate_limiter, "wait", lambda *args: None)
+    return database
+
+
+def test_batch_job_sends_each_claimed_message(database):
+    result = jobs.send_sms_batch_job(list(range(1, 11)))
+
+    assert result == {"status": "success", "sent": 10, "failed": 0, "skipped": 0}
+    assert database.sent == set(range(1, 11))
+
+
+def test_duplicate_batch_job_skips_claimed_messages(database):
+    jobs.send_sms_batch_job(list(range(1, 11)))
+
+    result = jobs.send_sms_batch_job(list(range(1, 11)))
+
+    assert result["status"] == "skipped"
+    assert result["skipped"] == 10
+
+
+def test_failed_batch_job_requeues_only_undispatched_messages(database, monkeypatch):
+    calls = []
+
+    def wait(sender, client_id):
+        calls.append(client_id)
+        if len(calls) == 4:
+            raise RuntimeError("rate limiter unavailable")
+
+    monkeypatch.setattr(jobs.rate_limiter, "wait", wait)
+    with pytest.raises(RuntimeError):
+        jobs.send_sms_batch_job(list(range(1, 11)))
+
+    assert database.sent == {1, 2, 3}
+    assert database.queued == set(range(4, 11))
+    assert not database.sending
+
+    # The retry only sends what never went out
+    monkeypatch.setattr(jobs.rate_limiter, "wait", lambda *args: None)
+    result = jobs.send_sms_batch_job(list(range(1, 11)))
+    assert result["sent"] == 7
+    assert database.sent == set(range(1, 11))
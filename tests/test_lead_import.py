@@ -0,0 +1,111 @@
+import pytest
+from sms_remarketing.services.lead_import import (
+    MAX_REPORTED_ERRORS,
+    LeadImportResult,
+    _csv_rows,
+    _lines,
+)
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(rows):
+    return [row async for row in rows]
+
+
+async def csv_rows(*chunks):
+    return await collect(_csv_rows(_lines(stream(*chunks))))
+
+
+@pytest.mark.asyncio
+async def test_lines_joins_split_chunks_and_strips_bom():
+    text = "\ufeffphone_number,name\r\n+15551230000,Zoë\n+15551230001,Ann"
+    data = text.encode()
+    # Split inside the BOM, the CRLF and the two-byte "ë"
+    chunks = [data[:2], data[2:21], data[21:38], data[38:]]
+
+    assert await collect(_lines(stream(*chunks))) == [
+        "phone_number,name",
+        "+15551230000,Zoë",
+        "+15551230001,Ann",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_map_lead_columns_and_custom_fields():
+    rows = await csv_rows(
+        b"phone_number, first_name ,plan,email\n",
+        b"+15551230000,Ann,gold,\n",
+        b"\n",
+        b"+15551230001,,,bob@example.com\n",
+    )
+
+    assert rows == [
+        (
+            2,
+            {
+                "custom_fields": {"plan": "gold"},
+                "phone_number": "+15551230000",
+                "first_name": "Ann",
+                "email": None,
+            },
+        ),
+        (
+            4,
+            {
+                "custom_fields": {},
+                "phone_number": "+15551230001",
+                "first_name": None,
+                "email": "bob@example.com",
+            },
+        ),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_quoted_field_spans_lines_and_chunks():
+    rows = await csv_rows(
+        b'phone_number,note\n+15551230000,"first\nsec',
+        b'ond, with ""quotes""\nthird"\n+155512',
+        b"30001,plain\n",
+    )
+
+    assert rows == [
+        (
+            2,
+            {
+                "custom_fields": {"note": 'first\nsecond, with "quotes"\nthird'},
+                "phone_number": "+15551230000",
+            },
+        ),
+        (5, {"custom_fields": {"note": "plain"}, "phone_number": "+15551230001"}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_csv_rows_report_column_count_and_unterminated_quote():
+    rows = await csv_rows(
+        b"phone_number,first_name\n",
+        b"+15551230000\n",
+        b'+15551230001,"Ann\n',
+        b"+15551230002,Bob\n",
+    )
+
+    assert rows == [
+        (2, "Expected 2 columns, got 1"),
+        (3, "Unterminated quoted field"),
+    ]
+
+
+def test_reject_counts_every_row_but_caps_reported_errors():
+    result = LeadImportResult()
+
+    for line in range(MAX_REPORTED_ERRORS + 5):
+        result.reject(line, "Invalid phone number")
+
+    assert result.invalid == MAX_REPORTED_ERRORS + 5
+    assert len(result.errors) == MAX_REPORTED_ERRORS
+    assert result.errors[0] == {"line": 0, "error": "Invalid phone number"}
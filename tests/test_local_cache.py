@@ -0,0 +1,218 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import time
+import pytest
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import inspect
+from sms_remarketing.models import Client, Template, Trigger
+from sms_remarketing.models.trigger import TriggerType
+from sms_remarketing.services.auth_cache import AuthCache
+from sms_remarketing.services.local_cache import LocalCache
+from sms_remarketing.services.webhook_cache import WebhookCache
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Invalidations published by caches using `recorder`"""
+    # Nor do they subscribe to invalidations from Redis
+    monkeypatch.setattr(LocalCache, "_ensure_listener", lambda self: None)
+    return []
+
+
+def recorder(published):
+    return SimpleNamespace(
+        publish=lambda channel, message: published.append((channel, message))
+    )
+
+
+@pytest.fixture
+def make_cache(published):
+    def make(size=10, ttl_seconds=60, **kwargs):
+        cache = LocalCache("test", size, ttl_seconds, **kwargs)
+        cache.redis_conn = recorder(published)
+        return cache
+
+    return make
+
+
+def test_hit_and_miss(make_cache):
+    cache = make_cache()
+    hits = cache.requests.value(result="hit")
+
+    assert cache.get("a") is None
+    cache.put("a", {"id": 1})
+
+    assert cache.get("a") == {"id": 1}
+    assert cache.requests.value(result="hit") == hits + 1
+
+
+def test_entries_expire(make_cache):
+    cache = make_cache(ttl_seconds=0)
+    cache.put("a", 1, tags=["client:1"])
+
+    assert cache.get("a") is None
+    assert cache._keys_by_tag == {}
+
+
+def test_least_recently_used_is_evicted(make_cache):
+    cache = make_cache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+
+    cache.put("c", 3)
+
+    assert [cache.get(key) for key in ("a", "b", "c")] == [1, None, 3]
+
+
+def test_invalidating_a_tag_drops_its_entries(make_cache, published):
+    cache = make_cache()
+    cache.put("a", 1, tags=["client:1"])
+    cache.put("b", 2, tags=["client:1", "trigger:5"])
+    cache.put("c", 3, tags=["client:2"])
+    # Re-caching a key replaces its tags
+    cache.put("c", 3, tags=["client:3"])
+
+    cache.invalidate("trigger:5", "client:2")
+    assert [cache.get(key) for key in ("a", "b", "c")] == [1, None, 3]
+
+    cache.invalidate("client:1")
+    assert [cache.get(key) for key in ("a", "b", "c")] == [None, None, 3]
+    assert cache._keys_by_tag == {"client:3": {"c"}}
+    assert published == [
+        ("test:invalidate", "trigger:5 client:2"),
+        ("test:invalidate", "client:1"),
+    ]
+
+
+def test_invalidations_from_other_processes(make_cache):
+    cache = make_cache()
+    cache.put("a", 1, tags=["client:1"])
+    cache.put("b", 2, tags=["client:2"])
+
+    cache._on_message({"data": b"client:1 client:9"})
+
+    assert [cache.get(key) for key in ("a", "b")] == [None, 2]
+
+
+def test_broken_subscription_clears_the_cache(make_cache):
+    class Thread:
+        stopped = False
+
+        def stop(self):
+            self.stopped = True
+
+    cache = make_cache()
+    cache.put("a", 1)
+    listener = cache._listener = Thread()
+
+    cache._on_listener_error(RedisError("connection lost"), None, listener)
+
+    assert listener.stopped and cache._listener is None
+    assert cache.get("a") is None
+
+
+def test_disabled_cache_stores_nothing(make_cache):
+    cache = make_cache(enabled=False)
+    cache.put("a", 1)
+
+    assert cache.get("a") is None
+
+
+def test_invalidate_works_locally_when_redis_is_down(make_cache):
+    cache = make_cache()
+    cache.redis_conn = Redis.from_url("redis://localhost:1")
+    cache.put("a", 1, tags=["client:1"])
+
+    cache.invalidate("client:1")
+
+    assert cache.get("a") is None
+
+
+def test_invalidation_reaches_other_processes():
+    publisher, subscriber = LocalCache("test", 10, 60), LocalCache("test", 10, 60)
+    try:
+        publisher.redis_conn.ping()
+    except RedisError:
+        pytest.skip("Redis is not reachable at REDIS_URL")
+
+    # Wait for the subscription, which clears the cache once it is set up
+    subscriber.get("a")
+    deadline = time.monotonic() + 5
+    while not hasattr(subscriber._listener, "stop"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    subscriber.put("a", 1, tags=["client:1"])
+
+    publisher.invalidate("client:1")
+
+    while subscriber.get("a") is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    subscriber._listener.stop()
+
+
+def test_auth_cache_returns_detached_clients(published):
+    cache = AuthCache()
+    cache._cache.redis_conn = recorder(published)
+    created_at = datetime(2026, 4, 2, tzinfo=timezone.utc)
+    cache.put(
+        Client(
+            id=3,
+            name="Acme",
+            email="ops@acme.test",
+            api_key="key-3",
+            is_active=True,
+            queue_weight=2,
+            created_at=created_at,
+            updated_at=None,
+        )
+    )
+
+    client = cache.get("key-3")
+
+    assert inspect(client).detached
+    assert (client.id, client.api_key, client.queue_weight) == (3, "key-3", 2)
+    assert client.created_at == created_at
+
+    cache.invalidate(3)
+    assert cache.get("key-3") is None
+    assert published == [("auth:invalidate", "client:3")]
+
+
+def test_webhook_cache_is_invalidated_by_any_of_its_rows(published):
+    cache = WebhookCache()
+    cache._cache.redis_conn = recorder(published)
+    trigger = Trigger(
+        id=5,
+        client_id=3,
+        template_id=8,
+        name="Signup",
+        trigger_type=TriggerType.WEBHOOK,
+        is_active=True,
+        config={"variables": {"name": "first_name"}},
+        webhook_key="wh-5",
+    )
+    template = Template(id=8, client_id=3, name="Hi", content="Hi {{name}}")
+    client = Client(id=3, name="Acme", api_key="key-3", is_active=True)
+
+    for invalidate, row_id in [
+        (cache.invalidate_trigger, 5),
+        (cache.invalidate_template, 8),
+        (cache.invalidate_client, 3),
+    ]:
+        cache.put(trigger, template, client)
+        cached_trigger, cached_template, cached_client = cache.get("wh-5")
+        assert all(
+            inspect(row).detached
+            for row in (cached_trigger, cached_template, cached_client)
+        )
+        assert cached_trigger.config == trigger.config
+        assert cached_template.content == "Hi {{name}}"
+        assert cached_client.api_key == "key-3"
+
+        invalidate(row_id)
+        assert cache.get("wh-5") is None
+
+    assert [tags for _, tags in published] == ["trigger:5", "template:8", "client:3"]
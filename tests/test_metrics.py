@@ -0,0 +1,77 @@
+from redis import Redis
+from redis.exceptions import RedisError
+import os
+import pytest
+import uuid
+from sms_remarketing.config import settings
+from sms_remarketing.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def redis_conn():
+    redis_conn = Redis.from_url(settings.redis_url)
+    try:
+        redis_conn.ping()
+    except RedisError:
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    return redis_conn
+
+
+@pytest.fixture
+def name(redis_conn):
+    name = f"test_{uuid.uuid4().hex}"
+    yield name
+    redis_conn.delete(f"metrics:{name}")
+
+
+def test_counter_sums_flushes_of_every_process(redis_conn, name):
+    worker, api = MetricsRegistry(), MetricsRegistry()
+    counter = worker.redis_counter(name, "Test", redis_conn, labels=("role",))
+    counter.inc(role="rq_worker")
+    counter.inc(2, role="rq_worker")
+
+    assert api.redis_counter(name, "Test", redis_conn, ("role",)).samples() == []
+
+    worker.flush()
+    counter.inc(role="rq_worker")
+    worker.flush()
+
+    assert api.redis_counter(name, "Test", redis_conn, ("role",)).samples() == [
+        f'{name}{{role="rq_worker"}} 4.0'
+    ]
+
+
+def test_forked_child_does_not_flush_parent_observations(redis_conn, name):
+    registry = MetricsRegistry()
+    histogram = registry.redis_histogram(
+        name, "Test", redis_conn, buckets=(1,), buffered=True
+    )
+    histogram.observe(0.5)
+    # As seen from a forked child
+    histogram._pending_pid = os.getpid() + 1
+    histogram.observe(2)
+    registry.flush()
+
+    assert histogram.samples() == [
+        f'{name}_bucket{{le="1"}} 0',
+        f'{name}_bucket{{le="+Inf"}} 1',
+        f"{name}_count 1",
+        f"{name}_sum 2.0",
+    ]
+
+
+def test_gauges_are_sampled_before_flush_and_expire(redis_conn, name):
+    registry = MetricsRegistry()
+    gauge = registry.redis_gauge(name, "Test", redis_conn, labels=("process",))
+    registry.register_sampler(lambda: gauge.set(3, process="a"))
+
+    registry.flush(sample=False)
+    assert gauge.samples() == []
+
+    registry.flush()
+    assert gauge.samples() == [f'{name}{{process="a"}} 3']
+
+    gauge.ttl_seconds = -1
+    registry.flush()
+    assert gauge.samples() == []
+    assert redis_conn.hlen(f"metrics:{name}") == 0
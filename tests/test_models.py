@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+from sms_remarketing.models import Lead, Message, Trigger
+from sms_remarketing.models.message import MessageStatus
+
+
+def indexes(model):
+    return {
+        index.name: (
+            [column.name for column in index.columns],
+            index.dialect_options["postgresql"]["where"],
+        )
+        for index in model.__table__.indexes
+    }
+
+
+def ddl(model, name):
+    [index] = [index for index in model.__table__.indexes if index.name == name]
+    return str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+
+
+def test_pending_messages_are_indexed_by_age_only():
+    assert "ix_messages_status" not in indexes(Message)
+    assert ddl(Message, "ix_messages_pending_created_at") == (
+        "CREATE INDEX ix_messages_pending_created_at ON messages (created_at) "
+        "WHERE status IN ('PENDING', 'QUEUED')"
+    )
+    # The enum is stored by member name
+    assert {"PENDING", "QUEUED"} <= MessageStatus.__members__.keys()
+
+
+def test_new_lead_trigger_lookup_has_a_partial_index():
+    assert ddl(Trigger, "ix_triggers_active_client_id_trigger_type") == (
+        "CREATE INDEX ix_triggers_active_client_id_trigger_type "
+        "ON triggers (client_id, trigger_type) WHERE is_active"
+    )
+
+
+@pytest.mark.parametrize("model", [Lead, Message])
+def test_client_lists_and_lead_age_scans_use_one_index(model):
+    table = model.__tablename__
+
+    assert indexes(model)[f"ix_{table}_client_id_created_at_id"] == (
+        ["client_id", "created_at", "id"],
+        None,
+    )
+
+
+@pytest.mark.parametrize("model", [Lead, Message])
+def test_no_index_duplicates_another(model):
+    """No full index covers the primary key or a prefix of another index"""
+    table = model.__table__
+    primary_key = [column.name for column in table.primary_key.columns]
+    full = [
+        [column.name for column in index.columns]
+        for index in table.indexes
+        if not index.unique and index.dialect_options["postgresql"]["where"] is None
+    ]
+    keys = [[column.name for column in index.columns] for index in table.indexes]
+
+    for columns in full:
+        assert columns != primary_key[: len(columns)], (table.name, columns)
+        for other in keys + [primary_key]:
+            if other != columns:
+                assert other[: len(columns)] != columns, (table.name, columns)
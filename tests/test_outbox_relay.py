@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.dialects import postgresql
+from sms_remarketing.models.message import MessageOrigin
+from sms_remarketing.services.queue_service import queue_service
+from sms_remarketing.workers import outbox_relay
+
+
+class FakeSession:
+    """Returns the given outbox rows to the claim and records the rest"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self.committed = self.rolled_back = self.closed = False
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(all=lambda: self.rows)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+def entry(id, client_id, origin=MessageOrigin.CAMPAIGN, send_at=None):
+    return SimpleNamespace(
+        id=id,
+        message_id=100 + id,
+        message_created_at=datetime(2026, 4, 2, tzinfo=timezone.utc),
+        client_id=client_id,
+        origin=origin,
+        send_at=send_at,
+    )
+
+
+@pytest.fixture
+def relay(monkeypatch):
+    """Runs relay_once against a fake session, recording what was queued"""
+    queued, scheduled = [], []
+    monkeypatch.setattr(
+        queue_service,
+        "enqueue_sms_many",
+        lambda messages, origin, client_id: queued.append(
+            (origin, client_id, messages)
+        ),
+    )
+    monkeypatch.setattr(
+        queue_service,
+        "schedule_sms_many",
+        lambda messages, origin, client_id: scheduled.append(
+            (origin, client_id, messages)
+        ),
+    )
+
+    def run(rows):
+        run.session = FakeSession(rows)
+        monkeypatch.setattr(outbox_relay, "SessionLocal", lambda: run.session)
+        return outbox_relay.relay_once(10), run.session
+
+    run.queued, run.scheduled = queued, scheduled
+    return run
+
+
+def sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_claims_entries_skipping_locked_ones(relay):
+    _, session = relay([entry(1, 5)])
+
+    claim = sql(session.statements[0])
+    assert "ORDER BY sms_outbox.id" in claim
+    assert claim.endswith("FOR UPDATE SKIP LOCKED")
+
+
+def test_enqueues_per_lane_and_client_then_deletes(relay):
+    created_at = datetime(2026, 4, 2, tzinfo=timezone.utc).timestamp()
+    rows = [
+        entry(1, 5),
+        entry(2, 6),
+        entry(3, 5),
+        entry(4, 5, origin=MessageOrigin.API),
+    ]
+
+    relayed, session = relay(rows)
+
+    assert relayed == 4
+    assert relay.queued == [
+        (MessageOrigin.CAMPAIGN, 5, [(101, created_at), (103, created_at)]),
+        (MessageOrigin.CAMPAIGN, 6, [(102, created_at)]),
+        (MessageOrigin.API, 5, [(104, created_at)]),
+    ]
+    delete = sql(session.statements[1])
+    assert delete.startswith("DELETE FROM sms_outbox WHERE sms_outbox.id IN")
+    assert session.statements[1].compile().params["id_1"] == [1, 2, 3, 4]
+    assert session.committed and session.closed
+
+
+def test_future_sends_go_to_the_scheduler(relay):
+    send_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    past = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+    relay([entry(1, 5, send_at=send_at), entry(2, 5, send_at=past)])
+
+    [(_, _, [(message, scheduled_for)])] = relay.scheduled
+    assert message[0] == 101
+    assert scheduled_for == send_at.timestamp()
+    assert [messages for _, _, messages in relay.queued] == [[(102, message[1])]]
+
+
+def test_nothing_pending(relay):
+    relayed, session = relay([])
+
+    assert relayed == 0
+    assert len(session.statements) == 1
+    assert not session.committed and session.closed
+
+
+def test_entries_stay_when_enqueueing_fails(relay, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("Redis is down")
+
+    monkeypatch.setattr(queue_service, "enqueue_sms_many", unavailable)
+
+    with pytest.raises(ConnectionError):
+        relay([entry(1, 5)])
+
+    session = relay.session
+    assert len(session.statements) == 1
+    assert session.rolled_back and not session.committed and session.closed
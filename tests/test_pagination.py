@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sms_remarketing.api.pagination import (
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+from sms_remarketing.models import Lead
+
+CREATED_AT = datetime(2026, 4, 2, 12, 30, tzinfo=timezone.utc)
+
+
+class FakeSession:
+    """Returns `rows` for any query, keeping the statement it was given"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statement = None
+
+    async def scalars(self, statement):
+        self.statement = statement
+        return SimpleNamespace(all=lambda: self.rows)
+
+    @property
+    def sql(self):
+        compiled = self.statement.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        return " ".join(str(compiled).split())
+
+
+def rows(count):
+    return [SimpleNamespace(created_at=CREATED_AT, id=i) for i in range(1, count + 1)]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(SimpleNamespace(created_at=CREATED_AT, id=42))
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (CREATED_AT, 42)
+
+
+# Not base64, not JSON, too few values, not a date
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", "WzFd", "WyJ4IiwxXQ"])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_full_page_links_to_the_next():
+    db, response = FakeSession(rows(3)), Response()
+
+    page = await paginate(db, select(Lead), Lead, response, limit=2)
+
+    assert [row.id for row in page] == [1, 2]
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == (CREATED_AT, 2)
+    assert db.sql.endswith("ORDER BY leads.created_at, leads.id LIMIT 3")
+
+
+@pytest.mark.asyncio
+async def test_last_page_has_no_cursor():
+    response = Response()
+
+    page = await paginate(FakeSession(rows(2)), select(Lead), Lead, response, limit=2)
+
+    assert len(page) == 2
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_cursor_continues_after_the_row_instead_of_skipping():
+    db = FakeSession([])
+    after = encode_cursor(SimpleNamespace(created_at=CREATED_AT, id=7))
+
+    await paginate(db, select(Lead), Lead, Response(), after=after, skip=50)
+
+    assert (
+        "WHERE (leads.created_at, leads.id) > ('2026-04-02 12:30:00+00:00', 7) "
+        "AND leads.created_at >= '2026-04-02 12:30:00+00:00'" in db.sql
+    )
+    assert "OFFSET" not in db.sql
+
+
+@pytest.mark.asyncio
+async def test_skip_without_cursor():
+    db = FakeSession([])
+
+    await paginate(db, select(Lead), Lead, Response(), skip=50)
+
+    assert db.sql.endswith("LIMIT 101 OFFSET 50")
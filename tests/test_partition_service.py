@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.dialects import postgresql
+from types import SimpleNamespace
+from sms_remarketing.config import settings
+from sms_remarketing.services.partition_service import (
+    Partition,
+    PartitionService,
+    _parse_bound,
+    month_start,
+)
+from sms_remarketing.workers.jobs import _created_between, _from_epoch
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_month_start_converts_to_utc():
+    moment = datetime(2026, 3, 31, 22, tzinfo=timezone(timedelta(hours=-5)))
+
+    assert month_start(moment) == utc(2026, 4, 1)
+
+
+def test_month_start_rolls_over_years():
+    assert month_start(utc(2026, 12, 15), 1) == utc(2027, 1, 1)
+    assert month_start(utc(2026, 1, 15), -1) == utc(2025, 12, 1)
+    assert month_start(utc(2026, 5, 1), -17) == utc(2024, 12, 1)
+
+
+def test_parse_bound():
+    assert _parse_bound("MINVALUE") is None
+    assert _parse_bound("MAXVALUE") is None
+    assert _parse_bound("'2026-04-01 00:00:00+00'") == utc(2026, 4, 1)
+
+
+def test_partition_covers():
+    april = Partition("messages_2026_04", utc(2026, 4, 1), utc(2026, 5, 1))
+    legacy = Partition("messages_legacy", None, utc(2026, 4, 1))
+
+    assert april.covers(utc(2026, 4, 1), utc(2026, 5, 1))
+    assert not april.covers(utc(2026, 3, 31), utc(2026, 5, 1))
+    assert not april.covers(utc(2026, 4, 1), utc(2026, 5, 2))
+    assert legacy.covers(utc(2000, 1, 1), utc(2026, 4, 1))
+    assert not legacy.covers(utc(2000, 1, 1), utc(2026, 4, 2))
+
+
+def test_from_epoch():
+    moment = utc(2026, 4, 2, 12)
+
+    assert _from_epoch(None, 2) == [None, None]
+    assert _from_epoch([moment.timestamp(), None], 2) == [moment, None]
+
+
+def test_created_between_bounds_to_the_job_messages():
+    created_at = [utc(2026, 4, 2), utc(2026, 2, 10), utc(2026, 3, 5)]
+    clause = _created_between(created_at).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+
+    assert "BETWEEN '2026-02-10 00:00:00+00:00' AND '2026-04-02" in str(clause)
+
+
+def test_created_between_is_unbounded_when_unknown():
+    assert str(_created_between([utc(2026, 4, 2), None])) == "true"
+    assert str(_created_between([])) == "true"
+
+
+class FakeCatalog:
+    """Plays the catalog for archive_partitions, recording statements"""
+
+    FOREIGN_KEYS = ["messages_client_id_fkey", "messages_lead_id_fkey"]
+
+    def __init__(self, archived=()):
+        # Foreign keys of the tables in the archive schema
+        self.foreign_keys = {name: list(self.FOREIGN_KEYS) for name in archived}
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if "SET SCHEMA" in sql:
+            self.foreign_keys[sql.split()[2]] = list(self.FOREIGN_KEYS)
+        elif "DROP CONSTRAINT" in sql:
+            table = sql.split()[2].split(".")[1]
+            self.foreign_keys[table].remove(sql.split()[-1].strip('"'))
+        rows = [
+            (table, name)
+            for table, names in self.foreign_keys.items()
+            for name in names
+        ]
+        return SimpleNamespace(all=lambda: rows)
+
+    def commit(self):
+        self.statements.append("COMMIT")
+
+
+def test_archive_partitions_drops_foreign_keys_with_the_detach(monkeypatch):
+    monkeypatch.setattr(settings, "message_retention_months", 6)
+    monkeypatch.setattr(settings, "message_archive_schema", "archive")
+    monkeypatch.setattr(settings, "message_archive_dir", None)
+    monkeypatch.setattr(
+        PartitionService,
+        "partitions",
+        staticmethod(
+            lambda db: [
+                Partition("messages_legacy", None, utc(2025, 9, 1)),
+                Partition("messages_2025_10", utc(2025, 10, 1), utc(2025, 11, 1)),
+            ]
+        ),
+    )
+    db = FakeCatalog(archived=["messages_2025_08"])
+
+    detached = PartitionService.archive_partitions(db, utc(2026, 4, 15))
+
+    assert detached == ["messages_legacy"]
+    assert db.foreign_keys == {"messages_2025_08": [], "messages_legacy": []}
+    # In the same transaction as the detach
+    detach = db.statements.index(
+        "ALTER TABLE messages DETACH PARTITION messages_legacy"
+    )
+    committed = db.statements.index("COMMIT", detach)
+    assert db.statements[committed - 1] == (
+        'ALTER TABLE archive.messages_legacy DROP CONSTRAINT "messages_lead_id_fkey"'
+    )
@@ -0,0 +1,45 @@
+from pydantic import ValidationError
+import pytest
+from sms_remarketing.config import settings
+from sms_remarketing.phone import normalize_phone
+from sms_remarketing.schemas.lead import LeadCreate, LeadUpdate
+
+
+@pytest.fixture(autouse=True)
+def us_region(monkeypatch):
+    monkeypatch.setattr(settings, "default_phone_region", "US")
+
+
+@pytest.mark.parametrize(
+    "value",
+    ["+1 (415) 555-0100", "415-555-0100", "(415) 555 0100", "+14155550100"],
+)
+def test_normalize_phone_to_e164(value):
+    assert normalize_phone(value) == "+14155550100"
+
+
+def test_normalize_phone_region():
+    assert normalize_phone("020 7946 0018", "GB") == "+442079460018"
+    # An explicit country code wins over the region
+    assert normalize_phone("+1 415 555 0100", "GB") == "+14155550100"
+
+
+def test_normalize_phone_default_region(monkeypatch):
+    monkeypatch.setattr(settings, "default_phone_region", "GB")
+
+    assert normalize_phone("020 7946 0018") == "+442079460018"
+
+
+@pytest.mark.parametrize("value", ["", "not a number", "555-01", "+1 415 555 01000"])
+def test_normalize_phone_rejects_invalid(value):
+    with pytest.raises(ValueError, match="Invalid phone number"):
+        normalize_phone(value)
+
+
+def test_lead_schemas_normalize_phone_number():
+    assert LeadCreate(phone_number="415.555.0100").phone_number == "+14155550100"
+    assert LeadUpdate(phone_number="415 555 0100").phone_number == "+14155550100"
+    assert LeadUpdate().phone_number is None
+
+    with pytest.raises(ValidationError):
+        LeadCreate(phone_number="12")
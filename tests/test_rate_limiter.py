@@ -0,0 +1,108 @@
+import uuid
+import pytest
+from redis.exceptions import RedisError
+from sms_remarketing.config import settings
+from sms_remarketing.services.rate_limiter import (
+    BUCKET_PREFIX,
+    STATS_KEY,
+    RateLimiter,
+)
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    def configure(sender_mps, client_mps, burst_seconds=1.0):
+        monkeypatch.setattr(settings, "rate_limit_enabled", True)
+        monkeypatch.setattr(settings, "rate_limit_sender_mps", sender_mps)
+        monkeypatch.setattr(settings, "rate_limit_client_mps", client_mps)
+        monkeypatch.setattr(settings, "rate_limit_burst_seconds", burst_seconds)
+
+    return configure
+
+
+@pytest.fixture
+def limiter():
+    limiter = RateLimiter()
+    try:
+        limiter.redis_conn.ping()
+    except RedisError:
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    return limiter
+
+
+@pytest.fixture
+def sender(limiter):
+    # Far outside real numbers and client ids, cleaned up afterwards
+    sender = f"+1999{uuid.uuid4().int % 10**7:07d}"
+    client_id = 10**12 + uuid.uuid4().int % 10**9
+    yield sender, client_id
+    buckets = [f"{BUCKET_PREFIX}sender:{sender}", f"{BUCKET_PREFIX}client:{client_id}"]
+    limiter.redis_conn.delete(*buckets)
+    stats = [
+        f"{bucket}:{stat}" for bucket in buckets for stat in ("granted", "throttled")
+    ]
+    limiter.redis_conn.hdel(STATS_KEY, *stats, f"sender:{sender}:wait_seconds")
+
+
+def tokens(limiter, bucket):
+    return float(limiter.redis_conn.hget(f"{BUCKET_PREFIX}{bucket}", "tokens"))
+
+
+def test_burst_then_throttle(limiter, limits, sender):
+    number, _ = sender
+    limits(sender_mps=10, client_mps=0, burst_seconds=0.5)
+
+    assert [limiter.try_acquire(number) for _ in range(5)] == [0] * 5
+    delay = limiter.try_acquire(number)
+
+    # A token refills every 100ms
+    assert 0 < delay <= 0.1
+
+
+def test_takes_from_every_bucket_or_none(limiter, limits, sender):
+    number, client_id = sender
+    limits(sender_mps=10, client_mps=1)
+
+    assert limiter.try_acquire(number, client_id) == 0
+    assert limiter.try_acquire(number, client_id) > 0.9
+
+    # The client bucket refused, so the sender bucket wasn't charged again
+    assert 9 <= tokens(limiter, f"sender:{number}") < 9.5
+    assert tokens(limiter, f"client:{client_id}") < 0.1
+    stats = limiter.redis_conn.hgetall(STATS_KEY)
+    assert stats[f"{BUCKET_PREFIX}sender:{number}:granted"] == "1"
+    assert stats[f"{BUCKET_PREFIX}client:{client_id}:granted"] == "1"
+    assert stats[f"{BUCKET_PREFIX}client:{client_id}:throttled"] == "1"
+    assert f"{BUCKET_PREFIX}sender:{number}:throttled" not in stats
+
+
+def test_wait_blocks_until_granted(limiter, limits, sender):
+    number, _ = sender
+    limits(sender_mps=20, client_mps=0, burst_seconds=0.05)
+
+    assert limiter.wait(number) == 0
+    waited = limiter.wait(number)
+
+    assert 0 < waited <= 0.1
+    assert float(
+        limiter.redis_conn.hget(STATS_KEY, f"sender:{number}:wait_seconds")
+    ) == pytest.approx(waited)
+
+
+def test_disabled_limits_grant_without_redis(limits, monkeypatch):
+    monkeypatch.setattr(settings, "redis_url", "redis://localhost:1")
+    limiter = RateLimiter()
+
+    limits(sender_mps=0, client_mps=0)
+    assert limiter.try_acquire("+15551230000", 1) == 0
+
+    limits(sender_mps=10, client_mps=10)
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    assert limiter.try_acquire("+15551230000", 1) == 0
+
+
+def test_wait_fails_open_when_redis_is_down(limits, monkeypatch):
+    monkeypatch.setattr(settings, "redis_url", "redis://localhost:1")
+    limits(sender_mps=10, client_mps=10)
+
+    assert RateLimiter().wait("+15551230000", 1) == 0
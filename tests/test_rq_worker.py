@@ -0,0 +1,69 @@
+from collections import Counter
+from types import SimpleNamespace
+import pytest
+from rq import Worker
+from sms_remarketing.models.message import MessageOrigin
+from sms_remarketing.services.queue_service import (
+    BULK_QUEUE,
+    HIGH_PRIORITY_QUEUE,
+    LEGACY_QUEUE,
+    ORIGIN_QUEUES,
+)
+from sms_remarketing.workers.rq_worker import WeightedWorker
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    def init(self, queues, **kwargs):
+        self.queues = [SimpleNamespace(name=name) for name in queues]
+
+    monkeypatch.setattr(Worker, "__init__", init)
+
+
+def drain(worker, picks, busy=lambda step, name: True):
+    """Lanes a worker dequeues from, taking the first lane with work each time"""
+    taken = []
+    for step in range(picks):
+        queue = next(
+            queue for queue in worker._ordered_queues if busy(step, queue.name)
+        )
+        taken.append(queue.name)
+        worker.reorder_queues(reference_queue=queue)
+    return taken
+
+
+def test_weights_default_to_one():
+    worker = WeightedWorker(["a", "b", "c"], weights={"a": 3, "b": 0})
+
+    assert worker.weights == {"a": 3, "b": 1, "c": 1}
+    assert [queue.name for queue in worker._ordered_queues] == ["a", "b", "c"]
+
+
+def test_busy_lanes_share_by_weight():
+    worker = WeightedWorker(["high", "bulk", "legacy"], weights={"high": 3})
+
+    taken = drain(worker, 50)
+
+    assert Counter(taken) == {"high": 30, "bulk": 10, "legacy": 10}
+    # Interleaved rather than in runs of a lane's whole share
+    assert "high,high,high,high" not in ",".join(taken)
+
+
+def test_idle_lane_does_not_bank_credit():
+    worker = WeightedWorker(["high", "bulk"], weights={"high": 3})
+
+    # Bulk has no work for a while, then a backlog arrives
+    taken = drain(worker, 40, busy=lambda step, name: name == "high" or step >= 20)
+
+    assert taken[:20] == ["high"] * 20
+    assert Counter(taken[20:]) == {"high": 15, "bulk": 5}
+    assert "bulk,bulk" not in ",".join(taken[20:])
+
+
+def test_origins_map_to_lanes():
+    transactional = {MessageOrigin.API, MessageOrigin.WEBHOOK, MessageOrigin.NEW_LEAD}
+
+    for origin in MessageOrigin:
+        expected = HIGH_PRIORITY_QUEUE if origin in transactional else BULK_QUEUE
+        assert ORIGIN_QUEUES.get(origin, BULK_QUEUE) == expected
+    assert LEGACY_QUEUE not in ORIGIN_QUEUES.values()
@@ -0,0 +1,110 @@
+import sys
+import time
+import uuid
+import pytest
+from redis.exceptions import RedisError
+from sms_remarketing.models.message import MessageOrigin
+from sms_remarketing.services.queue_service import queue_service
+from sms_remarketing.workers import scheduler
+
+# The services package re-exports the singleton under the module's name
+queue_module = sys.modules["sms_remarketing.services.queue_service"]
+
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    """A scheduled set of its own, with enqueued messages recorded"""
+    redis_conn = queue_service.redis_conn
+    try:
+        redis_conn.ping()
+    except (AttributeError, RedisError):
+        pytest.skip("Redis is not reachable at REDIS_URL")
+
+    key = f"test:scheduled:{uuid.uuid4().hex}"
+    monkeypatch.setattr(queue_module, "SCHEDULED_KEY", key)
+    enqueued = []
+    monkeypatch.setattr(
+        queue_service,
+        "enqueue_sms_many",
+        lambda messages, origin, client_id: enqueued.append(
+            (origin, client_id, messages)
+        ),
+    )
+    yield key, enqueued
+    redis_conn.delete(key, f"{key}:lock")
+
+
+def test_releases_due_messages_per_lane_and_client(scheduled):
+    key, enqueued = scheduled
+    now = time.time()
+    queue_service.schedule_sms_many(
+        [((1, 1700000000.0), now - 5), ((2, None), now - 3), ((3, None), now + 60)],
+        origin=MessageOrigin.CAMPAIGN,
+        client_id=7,
+    )
+    queue_service.schedule_sms_many(
+        [((4, 1700000000.0), now - 4)], origin=MessageOrigin.API, client_id=8
+    )
+
+    assert queue_service.release_due_sms(limit=10) == 3
+
+    assert enqueued == [
+        (MessageOrigin.CAMPAIGN, 7, [(1, 1700000000.0), (2, None)]),
+        (MessageOrigin.API, 8, [(4, 1700000000.0)]),
+    ]
+    assert queue_service.redis_conn.zrange(key, 0, -1) == [b"3:7:campaign:"]
+    assert queue_service.next_scheduled_at() == pytest.approx(now + 60)
+
+
+def test_releases_earliest_first_in_batches(scheduled):
+    _, enqueued = scheduled
+    now = time.time()
+    queue_service.schedule_sms_many(
+        [((id, None), now - id) for id in range(1, 6)],
+        origin=MessageOrigin.CAMPAIGN,
+        client_id=7,
+    )
+
+    assert queue_service.release_due_sms(limit=2) == 2
+    assert queue_service.release_due_sms(limit=2) == 2
+    assert queue_service.release_due_sms(limit=2) == 1
+    assert queue_service.release_due_sms(limit=2) == 0
+
+    released = [message_id for *_, messages in enqueued for message_id, _ in messages]
+    assert released == [5, 4, 3, 2, 1]
+    assert queue_service.next_scheduled_at() is None
+
+
+def test_reads_members_without_created_at(scheduled):
+    key, enqueued = scheduled
+    queue_service.redis_conn.zadd(key, {"9:7:lead_age": time.time() - 1})
+
+    queue_service.release_due_sms(limit=10)
+
+    assert enqueued == [(MessageOrigin.LEAD_AGE, 7, [(9, None)])]
+
+
+def test_messages_stay_scheduled_until_enqueued(scheduled, monkeypatch):
+    key, _ = scheduled
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("Redis is down")
+
+    monkeypatch.setattr(queue_service, "enqueue_sms_many", unavailable)
+    queue_service.schedule_sms_many(
+        [((1, None), time.time() - 1)], origin=MessageOrigin.API, client_id=7
+    )
+
+    with pytest.raises(ConnectionError):
+        queue_service.release_due_sms(limit=10)
+
+    assert queue_service.redis_conn.zcard(key) == 1
+
+
+def test_one_scheduler_at_a_time(scheduled, monkeypatch):
+    key, _ = scheduled
+    monkeypatch.setattr(scheduler, "LOCK_KEY", f"{key}:lock")
+
+    assert scheduler.acquire_lock("a")
+    assert not scheduler.acquire_lock("b")
+    assert scheduler.acquire_lock("a")
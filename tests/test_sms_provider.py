@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from sms_remarketing.services.sms_provider import SMSProvider
+
+
+class RecordingProvider(SMSProvider):
+    """Answers every send after a short delay, failing bodies starting with "x" """
+
+    from_number = "+15550000000"
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def send_sms(self, to, body):
+        raise NotImplementedError
+
+    async def send_sms_async(self, to, body):
+        await asyncio.sleep(0.01)
+        self.sent.append(body)
+        if body.startswith("x"):
+            return False, None, "rejected"
+        return True, f"SM{body}", None
+
+
+def test_send_many_returns_results_in_input_order():
+    provider = RecordingProvider()
+    messages = [("+15551230000", str(i)) for i in range(20)] + [("+1", "x")]
+
+    results = provider.send_many(messages)
+
+    assert results[:20] == [(True, f"SM{i}", None) for i in range(20)]
+    assert results[20] == (False, None, "rejected")
+
+
+def test_send_many_reports_each_result_once():
+    provider = RecordingProvider()
+    reported = []
+
+    provider.send_many(
+        [("+15551230000", str(i)) for i in range(50)], on_results=reported.extend
+    )
+
+    assert sorted(index for index, _ in reported) == list(range(50))
+
+
+def test_send_many_reports_dispatched_sends_when_dispatch_fails():
+    provider = RecordingProvider()
+    reported = []
+
+    def before_send(index):
+        if index == 3:
+            raise RuntimeError("rate limiter unavailable")
+
+    with pytest.raises(RuntimeError):
+        provider.send_many(
+            [("+15551230000", str(i)) for i in range(10)],
+            before_send=before_send,
+            on_results=reported.extend,
+        )
+
+    # The three sends already handed to the provider still get their results
+    assert sorted(index for index, _ in reported) == [0, 1, 2]
+    assert sorted(provider.sent) == ["0", "1", "2"]
@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+import threading
+import pytest
+from fastapi import HTTPException
+from sms_remarketing.middleware.auth import get_current_client
+from sms_remarketing.models import Client
+from sms_remarketing.services.auth_cache import auth_cache
+from sms_remarketing.services.credit_cache import credit_cache
+from sms_remarketing.services.sms_service import SMSService
+
+SYNC_SESSION = object()
+
+
+class FakeAsyncSession:
+    """Runs `run_sync` callables inline with a stand-in sync session"""
+
+    def __init__(self, client=None):
+        self.client = client
+        self.queries = 0
+        self.merged = []
+
+    async def run_sync(self, fn, *args):
+        return fn(SYNC_SESSION, *args)
+
+    async def scalar(self, statement):
+        self.queries += 1
+        return self.client
+
+    async def merge(self, instance, load=True):
+        self.merged.append((instance, load))
+        return instance
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    """Records the steps of a send, with `_create_message` returning `created`"""
+    message = SimpleNamespace(id=1, to_number="+15551230000", content="Hi")
+    steps = SimpleNamespace(log=[], created=(message, False, False))
+
+    async def reserve(client_id, count=1):
+        steps.log.append(("reserve", client_id, count))
+
+    async def refund(client_id, count):
+        steps.log.append(("refund", client_id, count))
+
+    def create(db, *args):
+        assert db is SYNC_SESSION
+        steps.log.append("create")
+        if isinstance(steps.created, Exception):
+            raise steps.created
+        return steps.created
+
+    def deliver(to, body, client_id):
+        on_loop = threading.current_thread() is threading.main_thread()
+        steps.log.append(("deliver", on_loop))
+        return True, "SM1", None
+
+    monkeypatch.setattr(credit_cache, "reserve_async", reserve)
+    monkeypatch.setattr(credit_cache, "refund_async", refund)
+    monkeypatch.setattr(SMSService, "_check_send", staticmethod(lambda *a: None))
+    monkeypatch.setattr(SMSService, "_create_message", staticmethod(create))
+    monkeypatch.setattr(SMSService, "_deliver", staticmethod(deliver))
+    monkeypatch.setattr(
+        SMSService,
+        "_record_result",
+        staticmethod(lambda db, _, *result: steps.log.append(("record", *result))),
+    )
+    return steps
+
+
+async def send(**kwargs):
+    client, lead = SimpleNamespace(id=7), SimpleNamespace(id=3)
+    return await SMSService.send_sms_async(
+        FakeAsyncSession(), client, lead, "Hi", **kwargs
+    )
+
+
+@pytest.mark.asyncio
+async def test_queued_send_reserves_one_credit(steps):
+    message = await send()
+
+    assert message is steps.created[0]
+    assert steps.log == [("reserve", 7, 1), "create"]
+
+
+@pytest.mark.asyncio
+async def test_sync_send_runs_the_provider_off_the_event_loop(steps):
+    steps.created = (steps.created[0], True, False)
+
+    await send(async_send=False)
+
+    assert steps.log[2:] == [("deliver", False), ("record", True, "SM1", None)]
+
+
+@pytest.mark.asyncio
+async def test_credit_is_refunded_when_the_message_is_not_created(steps):
+    steps.created = RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        await send()
+
+    assert steps.log == [("reserve", 7, 1), "create", ("refund", 7, 1)]
+
+
+@pytest.mark.asyncio
+async def test_credit_is_refunded_for_a_concurrent_duplicate(steps):
+    steps.created = (steps.created[0], False, True)
+
+    await send(idempotency_key="a")
+
+    assert steps.log == [("reserve", 7, 1), "create", ("refund", 7, 1)]
+
+
+@pytest.mark.asyncio
+async def test_replayed_key_reserves_nothing(steps, monkeypatch):
+    earlier = SimpleNamespace(id=9)
+    monkeypatch.setattr(SMSService, "_check_send", staticmethod(lambda *a: earlier))
+
+    assert await send(idempotency_key="a") is earlier
+    assert steps.log == []
+
+
+@pytest.fixture
+def cached_clients(monkeypatch):
+    cached = {}
+    monkeypatch.setattr(auth_cache, "get", cached.get)
+    monkeypatch.setattr(
+        auth_cache, "put", lambda client: cached.__setitem__(client.api_key, client)
+    )
+    return cached
+
+
+@pytest.mark.asyncio
+async def test_authentication_queries_once_per_api_key(cached_clients):
+    client = Client(id=7, api_key="key-7", is_active=True)
+    db = FakeAsyncSession(client)
+
+    assert await get_current_client("key-7", db) is client
+    assert await get_current_client("key-7", db) is client
+
+    assert db.queries == 1
+    assert db.merged == [(client, False)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "api_key, client, status_code",
+    [
+        (None, None, 401),
+        ("key-7", None, 401),
+        ("key-7", Client(id=7, api_key="key-7", is_active=False), 403),
+    ],
+)
+async def test_authentication_failures(cached_clients, api_key, client, status_code):
+    with pytest.raises(HTTPException) as error:
+        await get_current_client(api_key, FakeAsyncSession(client))
+
+    assert error.value.status_code == status_code
@@ -0,0 +1,164 @@
+from datetime import datetime
+import pytest
+from sms_remarketing.models.lead import Lead
+from sms_remarketing.templating import (
+    GSM7,
+    MISSING,
+    UCS2,
+    CompiledTemplate,
+    TemplateCache,
+)
+
+
+def test_render_substitutes_variables():
+    template = CompiledTemplate("Hi {{first_name}}, {{first_name}}! Code {{code}}.")
+
+    assert template.render({"first_name": "Ann", "code": 42}) == (
+        "Hi Ann, Ann! Code 42."
+    )
+
+
+def test_render_keeps_unknown_placeholders():
+    template = CompiledTemplate("Hi {{first_name}}, see {{ link }}")
+
+    assert template.render({}) == "Hi {{first_name}}, see {{ link }}"
+    assert template.render({"first_name": "Ann"}) == "Hi Ann, see {{ link }}"
+
+
+def test_render_fills_any_placeholder_name():
+    template = CompiledTemplate("{{plan.name}} for {{first name}}")
+
+    assert template.render({"plan.name": "Gold", "first name": "Ann"}) == (
+        "Gold for Ann"
+    )
+
+
+def test_variables_lists_only_word_names():
+    template = CompiledTemplate(
+        "{{first_name}} {{ link }} {{plan.name}} {{code}} {{first_name}} {{{x}}}"
+    )
+
+    assert template.variables == ["first_name", "code", "first_name", "x"]
+
+
+def test_cache_reuses_compiled_template():
+    cache = TemplateCache(2)
+    updated_at = datetime(2026, 4, 1)
+
+    compiled = cache.get(1, updated_at, "Hi {{first_name}}")
+
+    assert cache.get(1, updated_at, "Hi {{first_name}}") is compiled
+    assert cache.get(1, datetime(2026, 4, 2), "Hi {{first_name}}") is not compiled
+
+
+def test_cache_recompiles_unflushed_edits():
+    cache = TemplateCache(2)
+    cache.get(1, None, "Hi {{first_name}}")
+
+    compiled = cache.get(1, None, "Hello {{first_name}}")
+
+    assert compiled.render({"first_name": "Ann"}) == "Hello Ann"
+    assert cache.get(1, None, "Hello {{first_name}}") is compiled
+
+
+def test_cache_skips_unsaved_templates_and_evicts_oldest():
+    cache = TemplateCache(2)
+
+    assert cache.get(None, None, "a") is not cache.get(None, None, "a")
+
+    first = cache.get(1, None, "a")
+    second = cache.get(2, None, "b")
+    cache.get(1, None, "a")
+    cache.get(3, None, "c")
+
+    assert cache.get(1, None, "a") is first
+    assert cache.get(2, None, "b") is not second
+
+
+@pytest.mark.parametrize(
+    "text, encoding, segments",
+    [
+        ("a" * 160, GSM7, 1),
+        ("a" * 161, GSM7, 2),
+        ("a" * 306, GSM7, 2),
+        ("a" * 307, GSM7, 3),
+        # Extension characters take an escape septet each
+        ("€" * 80, GSM7, 1),
+        ("a" + "€" * 80, GSM7, 2),
+        ("é" * 160, GSM7, 1),
+        ("ç" * 70, UCS2, 1),
+        ("ç" * 71, UCS2, 2),
+        # Outside the BMP, two UTF-16 code units
+        ("\U0001f600" * 35, UCS2, 1),
+        ("\U0001f600" * 36, UCS2, 2),
+    ],
+)
+def test_render_batch_measures_segments(text, encoding, segments):
+    rendered = CompiledTemplate("{{text}}").render_batch({"text": [text]}, 1)
+
+    assert rendered.contents == [text]
+    assert rendered.encodings == [encoding]
+    assert rendered.segments == [segments]
+
+
+def test_render_batch_measures_literal_and_variable_text_together():
+    template = CompiledTemplate("{{first_name}}: " + "a" * 152)
+
+    rendered = template.render_batch({"first_name": ["Ann", "Annabel", "Zoë"]}, 3)
+
+    assert rendered.segments == [1, 2, 3]
+    assert rendered.encodings == [GSM7, GSM7, UCS2]
+    assert rendered.total_segments == 6
+
+
+def test_render_batch_matches_render():
+    template = CompiledTemplate("Hi {{first_name}}, {{plan}} {{ link }}")
+    columns = {"first_name": ["Ann", "Bob"], "plan": ["gold", MISSING]}
+
+    rendered = template.render_batch(columns, 2)
+
+    assert rendered.contents == [
+        template.render({"first_name": "Ann", "plan": "gold"}),
+        template.render({"first_name": "Bob"}),
+    ]
+    assert rendered.contents[1] == "Hi Bob, {{plan}} {{ link }}"
+
+
+def test_render_batch_variables_win_over_columns():
+    template = CompiledTemplate("{{first_name}} {{code}}")
+
+    rendered = template.render_batch(
+        {"first_name": ["Ann", "Bob"], "code": [1, 2]}, 2, {"code": "X"}
+    )
+
+    assert rendered.contents == ["Ann X", "Bob X"]
+
+
+def test_render_batch_without_placeholders():
+    rendered = CompiledTemplate("Sale today").render_batch({}, 2)
+
+    assert rendered.contents == ["Sale today", "Sale today"]
+    assert rendered.segments == [1, 1]
+
+
+def test_template_columns_custom_fields_win_over_defaults():
+    leads = [
+        Lead(phone_number="+14155550100", first_name="Ann"),
+        Lead(
+            phone_number="+14155550101",
+            custom_fields={"days_since_signup": 3, "plan": "gold"},
+        ),
+    ]
+
+    columns = Lead.template_columns(leads, {"days_since_signup": 7})
+
+    assert columns["first_name"] == ["Ann", ""]
+    assert columns["days_since_signup"] == [7, 3]
+    assert columns["plan"] == [MISSING, "gold"]
+    for row, lead in enumerate(leads):
+        variables = lead.template_variables({"days_since_signup": 7})
+        assert {
+            name: column[row]
+            for name, column in columns.items()
+            if column[row] is not MISSING
+        } == variables
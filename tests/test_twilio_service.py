@@ -0,0 +1,81 @@
+from urllib.parse import parse_qs
+import asyncio
+import httpx
+from sms_remarketing.config import settings
+from sms_remarketing.services.twilio_service import TwilioService
+
+
+class MockedTwilio(TwilioService):
+    """TwilioService whose pooled client is answered by `handler`"""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+
+    async def _on_loop_start(self):
+        await super()._on_loop_start()
+        await self._http.aclose()
+        self._http = httpx.AsyncClient(
+            auth=(settings.twilio_account_sid, settings.twilio_auth_token),
+            transport=httpx.MockTransport(self.handler),
+        )
+
+
+def form(request: httpx.Request):
+    fields = parse_qs(request.content.decode())
+    return {name: values[0] for name, values in fields.items()}
+
+
+def test_send_many_posts_to_the_messages_endpoint():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        body = form(request)["Body"]
+        if body == "bad":
+            return httpx.Response(400, json={"code": 21211, "message": "Invalid 'To'"})
+        return httpx.Response(201, json={"sid": f"SM{body}", "status": "queued"})
+
+    service = MockedTwilio(handler)
+
+    results = service.send_many([("+15551230000", "1"), ("+1", "bad")])
+
+    assert results == [
+        (True, "SM1", None),
+        (False, None, "Twilio error: Invalid 'To'"),
+    ]
+    assert {str(request.url) for request in requests} == {service.messages_url}
+    assert form(requests[0]) == {
+        "To": "+15551230000",
+        "From": settings.twilio_phone_number,
+        "Body": "1",
+    }
+    assert requests[0].headers["authorization"].startswith("Basic ")
+
+
+def test_send_many_reports_transport_errors():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    results = MockedTwilio(handler).send_many([("+15551230000", "1")])
+
+    assert results == [(False, None, "Unexpected error: connection refused")]
+
+
+def test_sends_in_flight_are_capped(monkeypatch):
+    monkeypatch.setattr(settings, "twilio_max_concurrency", 3)
+    in_flight = peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(201, json={"sid": "SM1"})
+
+    results = MockedTwilio(handler).send_many([("+15551230000", "1")] * 20)
+
+    assert results == [(True, "SM1", None)] * 20
+    assert peak == 3
+